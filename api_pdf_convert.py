@@ -5,10 +5,31 @@ API Flask pour recevoir un PDF encodé en base64, extraire les informations de f
 et retourner le résultat en JSON.
 
 Fonctionnalités principales :
-- Décode le PDF reçu en base64 et le sauvegarde temporairement.
+- Décode le PDF reçu en base64 directement en mémoire (aucun fichier temporaire).
+- Accepte aussi le PDF brut (corps application/pdf) ou en formulaire multipart/form-data,
+  sans le surcoût du base64 (+33 %) ni du JSON.
 - Utilise InvoiceParser pour extraire les données structurées (items, objet, lieu, etc.).
 - Nettoie les champs numériques pour un format français cohérent.
-- Retourne un JSON structuré avec les items, l'objet, le lieu de livraison et les informations globales.
+- Retourne un JSON structuré avec les items, l'objet, le lieu de livraison et les informations globales,
+  ou un flux NDJSON page par page pour les longues commandes.
+- Traite des lots de PDF en parallèle dans un pool de processus (/upload/batch).
+- Extrait en parallèle le texte des longues commandes avec PARSER_PARALLEL=1 (pool de processus
+  de facture_to_excel, un par worker) ; sans effet quand PARSE_TIMEOUT_S isole l'analyse.
+- Met en cache les réponses par contenu de PDF (relances et doublons servis sans nouveau parsing).
+- Accepte des conversions asynchrones (/jobs) pour les gros PDF, avec file d'attente bornée ;
+  statuts partagés entre workers dans un fichier SQLite : JOBS_DB, par défaut
+  facture_jobs.sqlite3 dans le répertoire temporaire du système (/tmp/facture_jobs.sqlite3 sous
+  Linux, selon TMPDIR) ; JOBS_DB= (vide) garde les statuts en mémoire. Un traitement dont le
+  worker s'est arrêté passe en erreur à l'expiration de son bail (JOBS_LEASE_S, 60 s).
+- Expose des métriques Prometheus (/metrics) : durée par étape, pages, items, erreurs, caches.
+- Limite la taille des requêtes (MAX_UPLOAD_MB, erreur 413) ; servie en production par
+  gunicorn via wsgi.py et gunicorn.conf.py.
+- Borne la durée d'une analyse (PARSE_TIMEOUT_S, processus dédié tué à l'échéance, erreur 504
+  avec résultat partiel sur demande) et le nombre de pages (PARSER_MAX_PAGES, erreur 413) ;
+  un PDF illisible donne une erreur 422.
+- Profile une analyse à la demande (?profile=1 ou entête X-Profile: 1, activé par PROFILE_REQUESTS=1,
+  jeton PROFILE_TOKEN optionnel) : rapport cProfile ventilé par méthode de InvoiceParser, joint
+  à la réponse et écrit dans PROFILE_DIR.
 
 Auteur  : Lam Clément
 Date    : 2024-06
@@ -17,36 +38,582 @@ Licence : Usage interne VINCI Energies
 Dépendances :
 - Flask
 - facture_to_excel (InvoiceParser)
+- result_cache (ResultCache)
+- job_queue (JobQueue)
+- metrics (REGISTRY)
+- invoice_items (ItemTable, sérialisation JSON des items)
+- fr_numbers (normalisation des nombres au format français)
+- parse_guard (analyse isolée avec délai)
+- profiling (profilage cProfile à la demande)
 """
 
-from flask import Flask, request, jsonify
+from flask import Flask, Response, g, request, jsonify
+from flask.json.provider import DefaultJSONProvider
 import base64
+import binascii
+import hmac
+import io
+import logging
 import os
-from facture_to_excel import InvoiceParser
- 
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Iterator, List
+import metrics
+from facture_to_excel import PAGE_TEXT_CACHE, InvoiceParser, MemoryLimitError, PageLimitError, PageTextCache
+from fr_numbers import NUMERIC_TYPES, check_totals, clean_fr_number, normalize_amount, normalize_items  # noqa: F401 (clean_fr_number réexporté)
+from invoice_items import InvoiceItem, ItemTable, json_default
+from job_queue import JobQueue, QueueFullError
+from parse_guard import (ParseTimeoutError, extract_fields_isolated, iter_parse_pdf_isolated, parse_pdf_isolated,
+                         profile_pdf_isolated)
+from pdfplumber.utils.exceptions import PdfminerException
+from profiling import profile_call
+from result_cache import ResultCache
+from werkzeug.exceptions import HTTPException
+
+# Journalisation filtrée par niveau (LOG_LEVEL=DEBUG pour suivre l'analyse page par page)
+logging.basicConfig(level=os.environ.get("LOG_LEVEL", "WARNING").upper(),
+                    format="%(asctime)s %(levelname)s %(name)s %(message)s")
+logger = logging.getLogger(__name__)
+
+class InvoiceJSONProvider(DefaultJSONProvider):
+    """
+    Sérialiseur JSON de l'application : les items (InvoiceItem, ItemTable) sont écrits
+    directement, sans conversion préalable en liste de dicts.
+    """
+
+    @staticmethod
+    def default(obj):
+        if isinstance(obj, (InvoiceItem, ItemTable)):
+            return json_default(obj)
+        return DefaultJSONProvider.default(obj)
+
 app = Flask(__name__)
+app.json = InvoiceJSONProvider(app)
+# Taille maximale d'une requête (en Mo) : au-delà, réponse 413 sans lire le corps
+MAX_UPLOAD_MB = float(os.environ.get("MAX_UPLOAD_MB", 64))
+app.config["MAX_CONTENT_LENGTH"] = int(MAX_UPLOAD_MB * 1024 * 1024) if MAX_UPLOAD_MB > 0 else None
+
+# Cache des réponses, indexé par le hash du PDF décodé : une relance du même document
+# est servie sans réouvrir le PDF. Le niveau disque (SQLite) est activé par RESULT_CACHE_DB.
+RESULT_CACHE = ResultCache(
+    max_entries=int(os.environ.get("RESULT_CACHE_SIZE", 128)),
+    db_path=os.environ.get("RESULT_CACHE_DB") or None,
+    ttl=float(os.environ["RESULT_CACHE_TTL"]) if os.environ.get("RESULT_CACHE_TTL") else None,
+    max_disk_entries=int(os.environ.get("RESULT_CACHE_DISK_MAX", 10000)),
+)
+
+# Nombre de processus du pool /upload/batch (par défaut : un par cœur)
+BATCH_WORKERS = int(os.environ.get("BATCH_WORKERS", os.cpu_count() or 1))
+_batch_pool = None
+_batch_pool_lock = threading.Lock()
+
+# File des conversions asynchrones (/jobs) : taille de la file et nombre de threads configurables
+JOBS_QUEUE_SIZE = int(os.environ.get("JOBS_QUEUE_SIZE", 100))
+JOBS_WORKERS = int(os.environ.get("JOBS_WORKERS", BATCH_WORKERS))
+# Fichier SQLite des statuts /jobs, partagé par les workers gunicorn d'une même machine : le
+# suivi GET /jobs/<id> peut arriver sur un autre worker que la soumission. JOBS_DB= (vide)
+# garde les statuts en mémoire, à réserver à un processus unique (serveur de développement).
+# Par défaut : <répertoire temporaire>/facture_jobs.sqlite3 (/tmp sous Linux, ou TMPDIR) ; en
+# production, fixer JOBS_DB sur un disque local persistant, commun à tous les workers.
+JOBS_DB = os.environ.get("JOBS_DB", os.path.join(tempfile.gettempdir(), "facture_jobs.sqlite3")) or None
+# Bail des traitements /jobs, en secondes : renouvelé par le worker qui les exécute, un traitement
+# dont le worker s'est arrêté passe en erreur à son expiration au lieu de rester en cours.
+JOBS_LEASE_S = float(os.environ.get("JOBS_LEASE_S", 60))
+
+# Délai maximal d'une analyse, en secondes : au-delà de 0, chaque analyse tourne dans un processus
+# dédié, tué à l'échéance (voir parse_guard). 0 : analyse dans le worker, sans délai.
+PARSE_TIMEOUT_S = float(os.environ.get("PARSE_TIMEOUT_S", 0))
+
+# Profilage à la demande (?profile=1 ou X-Profile: 1), désactivé par défaut : une analyse profilée
+# est plus lente et contourne le cache. PROFILE_REQUESTS=1 l'active ; si PROFILE_TOKEN est défini,
+# la requête doit aussi porter l'entête X-Profile-Token correspondant.
+PROFILE_REQUESTS = os.environ.get("PROFILE_REQUESTS", "0") == "1"
+PROFILE_TOKEN = os.environ.get("PROFILE_TOKEN") or None
+
+# Types de contenu d'un corps de requête contenant directement le PDF (sans base64 ni JSON)
+RAW_PDF_MIMETYPES = ("application/pdf", "application/octet-stream")
+
+# Au-delà de cette taille (en caractères base64), le décodage se fait par blocs
+BASE64_STREAM_THRESHOLD = 1 << 20
+# Taille d'un bloc décodé en une fois (multiple de 4 pour rester aligné sur les quadruplets base64)
+BASE64_CHUNK_SIZE = 1 << 16
+
+def decode_base64_pdf(data: str) -> io.BytesIO:
+    """
+    Décode un contenu base64 dans un tampon mémoire prêt à être passé à InvoiceParser.
+    Les gros contenus sont décodés par blocs dans un tampon préalloué à la taille finale,
+    ce qui évite de matérialiser une seconde copie complète du PDF.
+
+    Args:
+        data (str): Contenu du PDF encodé en base64.
+
+    Returns:
+        io.BytesIO: Tampon positionné au début, contenant le PDF décodé.
+    """
+    # Les contenus courts, ou contenant des retours à la ligne (base64 MIME), passent par le décodage classique
+    if (len(data) < BASE64_STREAM_THRESHOLD or len(data) % 4
+            or any(sep in data for sep in ("\n", "\r", " "))):
+        return io.BytesIO(base64.b64decode(data))
+    size = len(data) // 4 * 3 - data[-2:].count("=")
+    buffer = io.BytesIO()
+    # Préallocation : le tampon atteint sa taille finale avant le premier bloc
+    buffer.seek(size - 1)
+    buffer.write(b"\0")
+    buffer.seek(0)
+    try:
+        for start in range(0, len(data), BASE64_CHUNK_SIZE):
+            buffer.write(binascii.a2b_base64(data[start:start + BASE64_CHUNK_SIZE]))
+    except binascii.Error:
+        # Caractères parasites qui décalent les blocs : on revient au décodage complet
+        return io.BytesIO(base64.b64decode(data))
+    buffer.truncate(buffer.tell())
+    buffer.seek(0)
+    return buffer
+
+def clean_items(items: list, numeric: str = None) -> list:
+    """
+    Normalise sur place les champs numériques des items (étape partagée avec l'export Excel,
+    voir fr_numbers.normalize_items).
+
+    Args:
+        items (ItemTable|list[dict]): Items extraits par InvoiceParser.
+        numeric (str, optional): "decimal" ou "float" pour des valeurs typées (texte français par défaut).
+
+    Returns:
+        ItemTable|list[dict]: Les mêmes items, normalisés.
+    """
+    return normalize_items(items, numeric)
+
+def objet_json(objet_lines: list) -> list:
+    """
+    Met en forme les lignes de l'objet pour la réponse JSON.
+
+    Args:
+        objet_lines (list[str]): Lignes de l'objet extraites par parse_pdf.
+
+    Returns:
+        list[dict]: Une entrée {"objet": ligne} par ligne.
+    """
+    return [{"objet": line} for line in objet_lines]
+
+def lieu_livraison_json(lieu_livraison: str) -> list:
+    """
+    Découpe le lieu de livraison en lignes pour la réponse JSON.
+
+    Args:
+        lieu_livraison (str): Texte de la zone de livraison.
+
+    Returns:
+        list[dict]: Une entrée {"lieu_livraison": ligne} par ligne non vide.
+    """
+    lieu_livraison_lines = (lieu_livraison or "").replace('\r', '').split('\n')
+    lieu_livraison_lines = [line.strip() for line in lieu_livraison_lines if line.strip()]
+    return [{"lieu_livraison": line} for line in lieu_livraison_lines]
+
+def build_response(result: dict, numeric: str = None, check_total: bool = False) -> dict:
+    """
+    Construit la réponse JSON de l'API à partir du résultat de InvoiceParser.parse_pdf.
+    Les champs numériques sont nettoyés au format français, ou typés si numeric est fourni.
+
+    Args:
+        result (dict): Résultat de parse_pdf (modifié sur place).
+        numeric (str, optional): "decimal" (texte exact avec un point décimal) ou "float" (nombre JSON).
+        check_total (bool): Ajoute globalite.controle_total (somme des lignes comparée au total HT).
+
+    Returns:
+        dict: Réponse avec items, globalite, objet et lieu_livraison.
+    """
+    # Nettoyage des champs numériques pour garantir un format homogène côté client.
+    clean_items(result["items"], numeric)
+    result["total_ht"] = normalize_amount(result.get("total_ht"), numeric)
+
+    globalite = {
+        "numero_commande": result.get("numero_commande"),
+        "total_ht": result.get("total_ht"),
+    }
+    if check_total:
+        globalite["controle_total"] = check_totals(result["items"], result["total_ht"])
+    return {
+        "items": result["items"],
+        "globalite": globalite,
+        # Lignes de l'objet déjà extraites par parse_pdf (pas de réouverture du PDF)
+        "objet": objet_json(result.get("objet_lignes", [])),
+        "lieu_livraison": lieu_livraison_json(result.get("lieu_livraison", ""))
+    }
+
+def build_fields_response(result: dict, numeric: str = None, check_total: bool = False) -> dict:
+    """
+    Construit la réponse JSON d'une extraction sélective (InvoiceParser.extract_fields) :
+    même format que build_response, restreint aux champs extraits.
+
+    Args:
+        result (dict): Résultat de extract_fields (modifié sur place).
+        numeric (str, optional): Typage des nombres (voir build_response).
+        check_total (bool): Ajoute globalite.controle_total si les items et le total ont été extraits.
+
+    Returns:
+        dict: Réponse partielle (items, globalite, objet, lieu_livraison selon les champs).
+    """
+    custom_response = {}
+    if "items" in result:
+        custom_response["items"] = clean_items(result["items"], numeric)
+    globalite = {key: result[key] for key in ("numero_commande", "total_ht") if key in result}
+    if "total_ht" in globalite:
+        globalite["total_ht"] = normalize_amount(globalite["total_ht"], numeric)
+    if check_total and "items" in result and "total_ht" in globalite:
+        globalite["controle_total"] = check_totals(result["items"], globalite["total_ht"])
+    if globalite:
+        custom_response["globalite"] = globalite
+    if "objet_lignes" in result:
+        custom_response["objet"] = objet_json(result["objet_lignes"])
+    if "lieu_livraison" in result:
+        custom_response["lieu_livraison"] = lieu_livraison_json(result["lieu_livraison"])
+    return custom_response
+
+def convert_base64_pdf(filecontent_base64: str, fields: list = None, pages: tuple = None,
+                       numeric: str = None, check_total: bool = False) -> dict:
+    """
+    Décode un PDF base64, l'analyse et retourne la réponse de l'API.
+    La réponse est servie par RESULT_CACHE si le même PDF a déjà été converti.
+    Fonction de niveau module pour pouvoir être exécutée dans un processus du pool de batch.
+
+    Args:
+        filecontent_base64 (str): Contenu du PDF encodé en base64.
+        fields (list[str], optional): Champs voulus (extraction sélective, voir InvoiceParser.extract_fields).
+        pages (tuple(int, int), optional): Plage de pages analysée pour les items.
+        numeric (str, optional): Typage des nombres, "decimal" ou "float" (voir build_response).
+        check_total (bool): Ajoute le contrôle de cohérence des totaux.
+
+    Returns:
+        dict: Réponse construite par build_response (ou build_fields_response en extraction sélective).
+
+    Raises:
+        ParseTimeoutError: Si l'analyse dépasse PARSE_TIMEOUT_S (résultat partiel dans partial).
+    """
+    # Le PDF décodé reste en mémoire : le parser lit directement le tampon.
+    with metrics.time_stage("decodage_base64"):
+        pdf_buffer = decode_base64_pdf(filecontent_base64)
+    return convert_pdf_buffer(pdf_buffer, fields, pages, numeric, check_total)
+
+def convert_pdf_buffer(pdf_buffer: io.BytesIO, fields: list = None, pages: tuple = None,
+                       numeric: str = None, check_total: bool = False) -> dict:
+    """
+    Analyse un PDF déjà en mémoire et retourne la réponse de l'API (voir convert_base64_pdf).
+
+    Args:
+        pdf_buffer (io.BytesIO): Contenu du PDF.
+        fields, pages, numeric, check_total: Voir convert_base64_pdf.
+
+    Returns:
+        dict: Réponse construite par build_response (ou build_fields_response en extraction sélective).
+
+    Raises:
+        ParseTimeoutError: Si l'analyse dépasse PARSE_TIMEOUT_S (résultat partiel dans partial).
+    """
+    selective = bool(fields or pages)
+    namespace = "upload"
+    if selective:
+        namespace += f"|{','.join(fields or [])}|{pages}"
+    if numeric or check_total:
+        namespace += f"|nombres={numeric}|controle={check_total}"
+    cache_key = RESULT_CACHE.key_for(pdf_buffer, namespace)
+    custom_response = RESULT_CACHE.get(cache_key)
+    if custom_response is not None:
+        return custom_response
+    if selective:
+        if PARSE_TIMEOUT_S > 0:
+            result = extract_fields_isolated(pdf_buffer.getvalue(), PARSE_TIMEOUT_S, fields, pages)
+        else:
+            result = InvoiceParser().extract_fields(pdf_buffer, fields, pages)
+        with metrics.time_stage("nettoyage"):
+            custom_response = build_fields_response(result, numeric, check_total)
+    else:
+        if PARSE_TIMEOUT_S > 0:
+            result = parse_pdf_isolated(pdf_buffer.getvalue(), PARSE_TIMEOUT_S)
+        else:
+            result = InvoiceParser().parse_pdf(pdf_buffer)
+        with metrics.time_stage("nettoyage"):
+            custom_response = build_response(result, numeric, check_total)
+    RESULT_CACHE.set(cache_key, custom_response)
+    return custom_response
+
+def profile_pdf_buffer(pdf_buffer: io.BytesIO, filename: str = None, fields: list = None, pages: tuple = None,
+                       numeric: str = None, check_total: bool = False) -> dict:
+    """
+    Variante profilée de convert_pdf_buffer : l'analyse est faite sous cProfile, sans passer par
+    le cache de réponses, avec un cache de pages vide (le profil reflète une première analyse du
+    document). Avec PARSE_TIMEOUT_S, elle tourne dans le processus dédié de parse_guard et reste
+    soumise au délai. Seuls les noms des fichiers de profil écrits sont renvoyés au client.
+
+    Args:
+        pdf_buffer (io.BytesIO): Contenu du PDF.
+        filename (str, optional): Nom du document, repris dans le nom des fichiers de profil.
+        fields, pages, numeric, check_total: Voir convert_base64_pdf.
+
+    Returns:
+        dict: Réponse habituelle, avec le rapport de profilage dans la clé profil.
+
+    Raises:
+        ParseTimeoutError: Si l'analyse dépasse PARSE_TIMEOUT_S.
+    """
+    label = os.path.splitext(os.path.basename(filename or "document"))[0]
+    selective = bool(fields or pages)
+    if PARSE_TIMEOUT_S > 0:
+        result, report = profile_pdf_isolated(pdf_buffer.getvalue(), PARSE_TIMEOUT_S, label, fields, pages)
+    else:
+        parser = InvoiceParser(page_cache=PageTextCache())
+        if selective:
+            result, report = profile_call(parser.extract_fields, pdf_buffer, fields, pages, label=label)
+        else:
+            result, report = profile_call(parser.parse_pdf, pdf_buffer, label=label)
+    if selective:
+        custom_response = build_fields_response(result, numeric, check_total)
+    else:
+        custom_response = build_response(result, numeric, check_total)
+    for key in ("fichier_profil", "fichier_rapport"):
+        if key in report:
+            report[key] = os.path.basename(report[key])
+    custom_response["profil"] = report
+    return custom_response
+
+def wants_profile() -> bool:
+    """
+    Indique si le client demande le profilage de l'analyse (?profile=1 ou entête X-Profile: 1).
+    La demande est ignorée si le profilage n'est pas activé (PROFILE_REQUESTS).
+
+    Returns:
+        bool: True si le profilage est demandé et autorisé.
+
+    Raises:
+        PermissionError: Si PROFILE_TOKEN est défini et que l'entête X-Profile-Token ne correspond pas.
+    """
+    if not PROFILE_REQUESTS:
+        return False
+    flag = request.args.get('profile') or request.headers.get('X-Profile', '')
+    if flag.lower() not in ('1', 'true'):
+        return False
+    if PROFILE_TOKEN and not hmac.compare_digest(request.headers.get('X-Profile-Token', ''), PROFILE_TOKEN):
+        raise PermissionError("Profilage non autorisé : entête X-Profile-Token manquant ou invalide")
+    return True
+
+def parse_fields_args() -> tuple:
+    """
+    Lit les paramètres d'extraction sélective de la requête :
+    ?fields=numero_commande,total_ht,objet,lieu_livraison et ?pages=2-5 (ou ?pages=3).
+
+    Returns:
+        tuple: (liste des champs ou None, (première, dernière page) ou None).
+
+    Raises:
+        ValueError: Si la plage de pages est mal formée.
+    """
+    fields = [field.strip() for field in request.args.get('fields', '').split(',') if field.strip()] or None
+    pages = None
+    if request.args.get('pages'):
+        first, _, last = request.args['pages'].partition('-')
+        pages = (int(first), int(last or first))
+    return fields, pages
+
+def parse_number_args() -> tuple:
+    """
+    Lit les paramètres de typage des nombres : ?numeric=decimal|float et ?check_total=1.
+
+    Returns:
+        tuple: (type numérique ou None, contrôle des totaux demandé).
+
+    Raises:
+        ValueError: Si le type numérique est inconnu.
+    """
+    numeric = request.args.get('numeric') or None
+    if numeric is not None and numeric not in NUMERIC_TYPES:
+        raise ValueError(f"Type numérique inconnu : {numeric} (attendus : {', '.join(NUMERIC_TYPES)})")
+    return numeric, request.args.get('check_total', '').lower() in ('1', 'true')
+
+def wants_partial() -> bool:
+    """
+    Indique si le client accepte un résultat partiel en cas de délai dépassé (?partial=1).
 
-def clean_fr_number(val: str) -> str:
+    Returns:
+        bool: True si le résultat partiel est demandé.
     """
-    Nettoie un nombre au format français : enlève les points, garde la virgule.
+    return request.args.get('partial', '').lower() in ('1', 'true')
+
+def error_status(error: Exception) -> int:
+    """
+    Code HTTP d'une erreur de conversion :
+        - 504 : délai d'analyse dépassé ;
+        - 413 : document trop long (pages) ou plafond mémoire dépassé ;
+        - 422 : contenu illisible (base64 invalide, PDF corrompu ou non PDF) ;
+        - 403 : profilage demandé sans le jeton attendu ;
+        - 500 : processus d'analyse du pool arrêté brutalement, même après une nouvelle tentative ;
+        - 400 : autre erreur (requête mal formée, paramètre invalide...) ;
+        - code de l'erreur HTTP levée par Flask (corps trop grand, type de contenu non pris en charge...).
 
     Args:
-        val (str): Nombre à nettoyer.
-
-    Returns:
-        str: Nombre nettoyé.
-    """
-    if not isinstance(val, str):
-        return val
-    val = val.replace('.', '')  # Enlève les séparateurs de milliers
-    if ',' in val:
-        entier, dec = val.split(',')
-        dec = dec.rstrip('0')
-        if dec == '':
-            return entier
-        return f"{entier},{dec}"
-    return val
- 
+        error (Exception): Erreur levée pendant la conversion.
+
+    Returns:
+        int: Code HTTP.
+    """
+    if isinstance(error, HTTPException):
+        return error.code
+    if isinstance(error, ParseTimeoutError):
+        return 504
+    if isinstance(error, PermissionError):
+        return 403
+    if isinstance(error, (PageLimitError, MemoryLimitError)):
+        return 413
+    if isinstance(error, (binascii.Error, PdfminerException)):
+        return 422
+    if isinstance(error, BrokenProcessPool):
+        return 500
+    return 400
+
+def wants_stream() -> bool:
+    """
+    Indique si le client demande une réponse en flux NDJSON
+    (paramètre ?stream=1 ou entête Accept: application/x-ndjson).
+
+    Returns:
+        bool: True pour le mode flux.
+    """
+    if request.args.get('stream', '').lower() in ('1', 'true', 'ndjson'):
+        return True
+    return 'application/x-ndjson' in request.headers.get('Accept', '')
+
+def stream_base64_pdf(filecontent_base64: str) -> Iterator[str]:
+    """
+    Décode un PDF base64 et produit la réponse de l'API ligne par ligne (NDJSON) :
+        1. {"globalite": {"numero_commande"}, "objet": [...], "lieu_livraison": [...]}
+        2. {"page": n, "items": [...]} pour chaque page, dès qu'elle est analysée
+        3. {"globalite": {"numero_commande", "total_ht"}}
+    Le premier envoi ne dépend que de la page 1 : le délai avant le premier octet
+    ne croît plus avec le nombre de pages. Une erreur en cours d'analyse est
+    transmise dans une dernière ligne {"error": ..., "status": code HTTP de l'erreur} ;
+    avec PARSE_TIMEOUT_S, les pages déjà envoyées forment le résultat partiel.
+
+    L'entête est calculé avant le retour : un PDF illisible lève une exception
+    avant que la réponse ne commence.
+
+    Args:
+        filecontent_base64 (str): Contenu du PDF encodé en base64.
+
+    Returns:
+        Iterator[str]: Lignes JSON terminées par un retour à la ligne.
+    """
+    with metrics.time_stage("decodage_base64"):
+        pdf_buffer = decode_base64_pdf(filecontent_base64)
+    return stream_pdf_buffer(pdf_buffer)
+
+def stream_pdf_buffer(pdf_buffer: io.BytesIO) -> Iterator[str]:
+    """
+    Produit la réponse en flux NDJSON d'un PDF déjà en mémoire (voir stream_base64_pdf).
+    Un document déjà envoyé en flux est rejoué depuis le cache avec les mêmes lignes par page ;
+    un document converti seulement par /upload (découpage par page inconnu) est de nouveau analysé.
+
+    Args:
+        pdf_buffer (io.BytesIO): Contenu du PDF.
+
+    Returns:
+        Iterator[str]: Lignes JSON terminées par un retour à la ligne.
+    """
+    cache_key = RESULT_CACHE.key_for(pdf_buffer, "upload")
+    # Découpage par page (numéro, nombre d'items) : clé dérivée de celle de la réponse, sans
+    # relire le PDF ; la réponse classique /upload reste partagée avec le mode flux
+    pages_key = RESULT_CACHE.key_for(cache_key.encode(), "upload|pages")
+    cached = RESULT_CACHE.get(cache_key)
+    cached_pages = RESULT_CACHE.get(pages_key) if cached is not None else None
+    if cached_pages is not None and sum(count for _, count in cached_pages["pages"]) == len(cached["items"]):
+        # Document déjà converti en flux : la réponse est rejouée page par page, comme à l'origine
+        header = {"globalite": {"numero_commande": cached["globalite"]["numero_commande"]},
+                  "objet": cached["objet"], "lieu_livraison": cached["lieu_livraison"]}
+        lines = [header]
+        start = 0
+        for page, count in cached_pages["pages"]:
+            lines.append({"page": page, "items": cached["items"][start:start + count]})
+            start += count
+        lines.append({"globalite": cached["globalite"]})
+        return (app.json.dumps(line) + "\n" for line in lines)
+
+    if PARSE_TIMEOUT_S > 0:
+        events = iter_parse_pdf_isolated(pdf_buffer.getvalue(), PARSE_TIMEOUT_S)
+    else:
+        events = InvoiceParser().iter_parse_pdf(pdf_buffer)
+    entete = next(events)
+    header = {
+        "globalite": {"numero_commande": entete["numero_commande"]},
+        "objet": objet_json(entete["objet_lignes"]),
+        "lieu_livraison": lieu_livraison_json(entete["lieu_livraison"]),
+    }
+
+    def generate() -> Iterator[str]:
+        yield app.json.dumps(header) + "\n"
+        items = []
+        pages = []
+        try:
+            for event in events:
+                if event["type"] == "items":
+                    page_items = clean_items(event["items"])
+                    items.extend(page_items)
+                    pages.append([event["page"], len(page_items)])
+                    yield app.json.dumps({"page": event["page"], "items": page_items}) + "\n"
+                else:
+                    total_ht = normalize_amount(event["total_ht"])
+                    globalite = {"numero_commande": entete["numero_commande"], "total_ht": total_ht}
+                    yield app.json.dumps({"globalite": globalite}) + "\n"
+        except Exception as e:
+            metrics.ERRORS.inc(source="upload_flux")
+            logger.warning("Erreur pendant l'envoi en flux : %s", e)
+            # La réponse a déjà commencé (HTTP 200) : le code de l'erreur est donné dans la ligne
+            yield app.json.dumps({"error": str(e), "status": error_status(e)}) + "\n"
+            return
+        # Réponse complète : on la met en cache comme une réponse classique, avec son découpage par page
+        RESULT_CACHE.set(cache_key, {"items": items, "globalite": globalite,
+                                     "objet": header["objet"], "lieu_livraison": header["lieu_livraison"]})
+        RESULT_CACHE.set(pages_key, {"pages": pages})
+
+    return generate()
+
+def read_request_pdf() -> tuple:
+    """
+    Lit le PDF de la requête /upload selon son type de contenu :
+        - application/pdf (ou application/octet-stream) : le corps est le PDF brut, nom optionnel
+          dans ?filename= ;
+        - multipart/form-data : fichier du champ "file" (ou premier fichier du formulaire) ;
+        - sinon JSON {"filename", "filecontent"} avec le PDF en base64.
+
+    Le corps brut est lu en une fois et le tampon est construit sur ces octets sans les recopier ;
+    ni chaîne base64 ni document JSON ne sont matérialisés.
+
+    Returns:
+        tuple(io.BytesIO, str): Contenu du PDF et nom du fichier (ou None).
+
+    Raises:
+        ValueError: Si le corps ou le fichier attendu est absent.
+    """
+    if request.mimetype in RAW_PDF_MIMETYPES:
+        with metrics.time_stage("lecture_corps"):
+            content = request.get_data(cache=False)
+        if not content:
+            raise ValueError("Corps de requête vide : le PDF est attendu dans le corps")
+        return io.BytesIO(content), request.args.get('filename')
+    if request.mimetype == 'multipart/form-data':
+        with metrics.time_stage("lecture_corps"):
+            upload = request.files.get('file') or next(iter(request.files.values()), None)
+            if upload is None:
+                raise ValueError("Aucun fichier dans le formulaire (champ 'file' attendu)")
+            content = upload.read()
+        if not content:
+            raise ValueError(f"Fichier vide : {upload.filename}")
+        return io.BytesIO(content), upload.filename or request.form.get('filename')
+    data = request.get_json()
+    with metrics.time_stage("decodage_base64"):
+        pdf_buffer = decode_base64_pdf(data.get('filecontent'))
+    return pdf_buffer, data.get('filename')
+
 @app.route('/upload', methods=['POST'])
 def upload_file():
     """
@@ -54,66 +621,305 @@ def upload_file():
     Reçoit un PDF encodé en base64, l'analyse et retourne les informations extraites.
 
     Entrée attendue (JSON):
-        - filename: nom du fichier PDF (optionnel)
+        - filename: nom du fichier PDF (optionnel, informatif)
         - filecontent: contenu du PDF encodé en base64
 
+    Autres entrées acceptées (même réponse, voir read_request_pdf) :
+        - corps brut Content-Type: application/pdf (nom optionnel dans ?filename=) ;
+        - formulaire multipart/form-data avec le PDF dans le champ file.
+
+    Le PDF est analysé directement depuis la mémoire : aucun fichier n'est écrit sur le disque,
+    ce qui évite aussi les collisions entre envois simultanés portant le même nom.
+
+    Mode flux (?stream=1 ou Accept: application/x-ndjson) : la réponse est envoyée en NDJSON,
+    entête d'abord, puis les items page par page et enfin le total (voir stream_base64_pdf).
+
+    Extraction sélective (?fields=numero_commande,total_ht,objet,lieu_livraison et/ou ?pages=2-5) :
+    seules les pages utiles sont lues et la réponse ne contient que les champs demandés.
+    Une demande d'entête seul lit la page 1 et, pour total_ht, les pages à rebours depuis la dernière
+    jusqu'à celle qui porte le total : son coût ne dépend pas du nombre de pages du document.
+
+    Nombres typés (?numeric=decimal ou ?numeric=float) : quantités, prix unitaires et total HT
+    sont renvoyés en texte décimal exact ("1234.5") ou en nombres JSON. ?check_total=1 ajoute
+    globalite.controle_total (somme des lignes, écart avec le total HT, cohérence).
+
+    Profilage (?profile=1 ou entête X-Profile: 1, si PROFILE_REQUESTS=1 ; entête X-Profile-Token
+    exigé si PROFILE_TOKEN est défini) : l'analyse est refaite sous cProfile (sans cache, soumise
+    à PARSE_TIMEOUT_S) et la réponse contient un rapport profil ventilé par méthode de InvoiceParser ;
+    avec PROFILE_DIR, le profil brut (.prof) et le rapport texte y sont aussi écrits.
+
+    Résultat partiel (?partial=1) : si l'analyse dépasse PARSE_TIMEOUT_S, la réponse 504 contient
+    aussi l'entête et les items des pages analysées (partiel, pages_analysees).
+
     Retour:
         - 200: JSON structuré avec items, globalité, objet, lieu_livraison
-        - 400: JSON d'erreur en cas de problème
-
-    Exceptions:
-        - Retourne une erreur 400 si le décodage ou le parsing échoue.
+        - 400: JSON d'erreur si la requête est mal formée
+        - 403: JSON d'erreur si le profilage est demandé sans le jeton attendu
+        - 413: JSON d'erreur si le corps, le nombre de pages ou la mémoire dépasse la limite
+        - 422: JSON d'erreur si le contenu n'est pas un PDF lisible
+        - 504: JSON d'erreur si l'analyse dépasse le délai (résultat partiel sur demande)
     """
-    data = request.get_json()
-    filename = data.get('filename', 'fichier.pdf')
-    filecontent_base64 = data.get('filecontent')
-
+    numeric = None
     try:
-        # On sauvegarde le PDF décodé dans un fichier temporaire pour le parser.
-        pdf_path = f"/tmp/{filename}"
-        with open(pdf_path, 'wb') as f:
-            f.write(base64.b64decode(filecontent_base64))
-
-        parser = InvoiceParser()
-        result = parser.parse_pdf(pdf_path)
-
-        # Nettoyage des champs numériques pour garantir un format homogène côté client.
-        for item in result["items"]:
-            if "quantite" in item and item["quantite"]:
-                item["quantite"] = clean_fr_number(item["quantite"])
-            if "prix_unitaire" in item and item["prix_unitaire"]:
-                item["prix_unitaire"] = clean_fr_number(item["prix_unitaire"])
-            if "montant_total" in item and item.get("montant_total"):
-                item["montant_total"] = clean_fr_number(item["montant_total"])
-
-        if "total_ht" in result and result["total_ht"]:
-            result["total_ht"] = clean_fr_number(result["total_ht"])
-
-        # Extraction des lignes pour objet et lieu de livraison (pour affichage détaillé)
-        objet_lines = parser.extract_lines_after_objet(pdf_path)
-        objet_json = [{"objet": line} for line in objet_lines]
-
-        lieu_livraison_lines = result.get("lieu_livraison", "").replace('\r', '').split('\n')
-        lieu_livraison_lines = [line.strip() for line in lieu_livraison_lines if line.strip()]
-        lieu_livraison_json = [{"lieu_livraison": line} for line in lieu_livraison_lines]
-
-        custom_response = {
-            "items": result["items"],
-            "globalite": {
-                "numero_commande": result.get("numero_commande"),
-                "total_ht": result.get("total_ht"),
-            },
-            "objet": objet_json,
-            "lieu_livraison": lieu_livraison_json
-        }
-
-        return jsonify(custom_response), 200
+        fields, pages = parse_fields_args()
+        numeric, check_total = parse_number_args()
+        pdf_buffer, filename = read_request_pdf()
+        if wants_profile():
+            custom_response = profile_pdf_buffer(pdf_buffer, filename, fields, pages, numeric, check_total)
+            return jsonify(custom_response), 200
+        if wants_stream() and not (fields or pages or numeric or check_total):
+            return Response(stream_pdf_buffer(pdf_buffer), mimetype='application/x-ndjson',
+                            headers={'X-Accel-Buffering': 'no'})
+        custom_response = convert_pdf_buffer(pdf_buffer, fields, pages, numeric, check_total)
+        with metrics.time_stage("serialisation"):
+            response = jsonify(custom_response)
+        return response, 200
+
+    except ParseTimeoutError as e:
+        metrics.ERRORS.inc(source="upload")
+        error_response = {"error": str(e)}
+        if wants_partial() and e.partial is not None:
+            error_response.update(partiel=True, pages_analysees=e.pages_done,
+                                  **build_response(e.partial, numeric))
+        return jsonify(error_response), 504
 
     except Exception as e:
+        metrics.ERRORS.inc(source="upload")
+        logger.warning("Échec de la conversion /upload : %s", e)
         # On retourne l'erreur au client pour faciliter le debug côté front ou client API.
-        return jsonify({"error": str(e)}), 400
- 
+        return jsonify({"error": str(e)}), error_status(e)
+
+def get_batch_pool() -> ProcessPoolExecutor:
+    """
+    Retourne le pool de processus du traitement par lot, créé au premier appel.
+    Le parsing étant limité par le GIL, seuls des processus permettent d'exploiter tous les cœurs.
+
+    Returns:
+        ProcessPoolExecutor: Pool partagé par les requêtes /upload/batch.
+    """
+    global _batch_pool
+    with _batch_pool_lock:
+        if _batch_pool is None:
+            _batch_pool = ProcessPoolExecutor(max_workers=BATCH_WORKERS)
+        return _batch_pool
+
+def discard_batch_pool(pool: ProcessPoolExecutor) -> None:
+    """
+    Abandonne un pool cassé (processus tué : mémoire, signal...) : le prochain appel à
+    get_batch_pool en crée un neuf. Sans effet si le pool a déjà été remplacé.
+
+    Args:
+        pool (ProcessPoolExecutor): Pool dont un processus s'est arrêté brutalement.
+    """
+    global _batch_pool
+    with _batch_pool_lock:
+        if _batch_pool is pool:
+            _batch_pool = None
+            logger.warning("Pool de traitement par lot cassé : il sera recréé")
+    pool.shutdown(wait=False, cancel_futures=True)
+
+def run_in_batch_pool(func: Callable[[Any], Any], arguments: List[Any]) -> List[Any]:
+    """
+    Exécute func sur chaque argument dans le pool de traitement par lot. Si le pool casse
+    (BrokenProcessPool), il est remplacé et les appels concernés sont relancés une fois.
+
+    Args:
+        func (Callable): Fonction exécutée dans les processus (importable par le pool).
+        arguments (list): Un argument par appel.
+
+    Returns:
+        list: Résultat de chaque appel, ou l'exception qu'il a levée, dans l'ordre des arguments.
+    """
+    outcomes: List[Any] = [None] * len(arguments)
+    pending = list(range(len(arguments)))
+    for _ in range(2):
+        pool = get_batch_pool()
+        futures = {}
+        for index in pending:
+            try:
+                futures[index] = pool.submit(func, arguments[index])
+            except BrokenProcessPool as e:
+                outcomes[index] = e
+        for index, future in futures.items():
+            try:
+                outcomes[index] = future.result()
+            except Exception as e:
+                outcomes[index] = e
+        pending = [index for index in pending if isinstance(outcomes[index], BrokenProcessPool)]
+        if not pending:
+            break
+        discard_batch_pool(pool)
+    return outcomes
+
+@app.route('/upload/batch', methods=['POST'])
+def upload_batch():
+    """
+    Analyse plusieurs PDF en parallèle dans le pool de processus.
+
+    Entrée attendue (JSON): liste d'objets
+        - filename: nom du fichier PDF (optionnel, repris dans le résultat)
+        - filecontent: contenu du PDF encodé en base64
+
+    Retour:
+        - 200: {"results": [...]} dans l'ordre de la liste reçue. Chaque résultat contient
+          filename et soit la réponse habituelle de /upload, soit les clés error et status
+          (code HTTP qu'aurait renvoyé /upload) propres au document. Si un processus du pool
+          est tué, le pool est recréé et les documents touchés sont relancés une fois (500 au-delà).
+        - 400: JSON d'erreur si le corps n'est pas une liste.
+    """
+    documents = request.get_json()
+    if not isinstance(documents, list):
+        return jsonify({"error": "Le corps doit être une liste d'objets {filename, filecontent}"}), 400
+
+    outcomes = run_in_batch_pool(convert_base64_pdf, [document.get('filecontent') if isinstance(document, dict)
+                                                      else None for document in documents])
+
+    results = []
+    for document, outcome in zip(documents, outcomes):
+        filename = document.get('filename', 'fichier.pdf') if isinstance(document, dict) else None
+        if isinstance(outcome, Exception):
+            # Une erreur n'interrompt pas le lot : elle est rapportée pour ce document seulement
+            metrics.ERRORS.inc(source="batch")
+            results.append({"filename": filename, "error": str(outcome), "status": error_status(outcome)})
+        else:
+            results.append({"filename": filename, **outcome})
+
+    return jsonify({"results": results}), 200
+
+def run_job(filecontent_base64: str) -> dict:
+    """
+    Exécute une conversion de la file /jobs dans le pool de processus
+    (le thread de la file ne fait qu'attendre le résultat).
+
+    Args:
+        filecontent_base64 (str): Contenu du PDF encodé en base64.
+
+    Returns:
+        dict: Réponse construite par build_response.
+    """
+    outcome = run_in_batch_pool(convert_base64_pdf, [filecontent_base64])[0]
+    if isinstance(outcome, Exception):
+        raise outcome
+    return outcome
+
+JOB_QUEUE = JobQueue(run_job, workers=JOBS_WORKERS, max_queue=JOBS_QUEUE_SIZE, db_path=JOBS_DB,
+                     json_default=json_default, lease=JOBS_LEASE_S)
+
+@app.route('/jobs', methods=['POST'])
+def create_job():
+    """
+    Enregistre une conversion asynchrone et retourne immédiatement son identifiant.
+
+    Entrée attendue (JSON): identique à /upload (filename, filecontent).
+
+    Retour:
+        - 202: {"job_id", "status"} et entête Location vers /jobs/<job_id>
+        - 400: JSON d'erreur si filecontent est absent
+        - 429: JSON d'erreur si la file d'attente est pleine (réessayer plus tard)
+    """
+    data = request.get_json(silent=True) or {}
+    filecontent_base64 = data.get('filecontent')
+    if not filecontent_base64:
+        return jsonify({"error": "Champ filecontent manquant"}), 400
+    try:
+        job_id = JOB_QUEUE.submit(filecontent_base64)
+    except QueueFullError as e:
+        return jsonify({"error": str(e)}), 429, {'Retry-After': '5'}
+    return jsonify({"job_id": job_id, "status": JOB_QUEUE.get(job_id)["status"]}), 202, {'Location': f"/jobs/{job_id}"}
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id: str):
+    """
+    Retourne le statut d'une conversion asynchrone.
+
+    Retour:
+        - 200: {"job_id", "status", ...} avec "result" (réponse de /upload) une fois terminé,
+          ou "error" en cas d'échec
+        - 404: JSON d'erreur si l'identifiant est inconnu ou expiré
+    """
+    job = JOB_QUEUE.get(job_id)
+    if job is None:
+        return jsonify({"error": f"Traitement inconnu : {job_id}"}), 404
+    return jsonify(job), 200
+
+def _cache_samples(name: str, stats: dict, key: str) -> list:
+    """
+    Échantillon d'une métrique de cache (étiquette cache=name).
+    """
+    return [({"cache": name}, stats[key])]
+
+def _cache_hit_ratios() -> list:
+    """
+    Taux de succès des caches de pages et de réponses depuis le démarrage du processus.
+    """
+    ratios = []
+    for name, stats in (("pages", PAGE_TEXT_CACHE.stats()), ("reponses", RESULT_CACHE.stats())):
+        lookups = stats["hits"] + stats["misses"]
+        ratios.append(({"cache": name}, stats["hits"] / lookups if lookups else 0.0))
+    return ratios
+
+metrics.REGISTRY.register(metrics.CallbackMetric(
+    "facture_cache_hits_total", "Lectures servies par les caches",
+    lambda: _cache_samples("pages", PAGE_TEXT_CACHE.stats(), "hits")
+    + _cache_samples("reponses", RESULT_CACHE.stats(), "hits"),
+    metric_type="counter",
+))
+metrics.REGISTRY.register(metrics.CallbackMetric(
+    "facture_cache_misses_total", "Lectures manquées par les caches",
+    lambda: _cache_samples("pages", PAGE_TEXT_CACHE.stats(), "misses")
+    + _cache_samples("reponses", RESULT_CACHE.stats(), "misses"),
+    metric_type="counter",
+))
+metrics.REGISTRY.register(metrics.CallbackMetric(
+    "facture_cache_hit_ratio", "Taux de succès des caches", _cache_hit_ratios,
+))
+metrics.REGISTRY.register(metrics.CallbackMetric(
+    "facture_jobs_queued", "Conversions /jobs en attente", lambda: [({}, JOB_QUEUE.stats()["queued"])],
+))
+
+@app.before_request
+def start_request_timer():
+    """
+    Mémorise le début de la requête pour facture_http_request_seconds.
+    """
+    g.request_start = time.perf_counter()
+
+@app.after_request
+def record_request_metrics(response: Response) -> Response:
+    """
+    Compte la requête par route et code de statut et enregistre sa durée.
+    Pour une réponse en flux, la durée couvre l'envoi de l'entête seulement.
+    """
+    endpoint = request.url_rule.rule if request.url_rule is not None else "inconnue"
+    metrics.REQUESTS.inc(endpoint=endpoint, status=str(response.status_code))
+    if "request_start" in g:
+        metrics.REQUEST_SECONDS.observe(time.perf_counter() - g.request_start, endpoint=endpoint)
+    return response
+
+@app.errorhandler(413)
+def request_too_large(error):
+    """
+    Refuse une requête dont le corps dépasse MAX_CONTENT_LENGTH, avec une erreur JSON.
+
+    Retour:
+        - 413: JSON d'erreur indiquant la limite
+    """
+    metrics.ERRORS.inc(source="taille_requete")
+    return jsonify({"error": f"Requête trop volumineuse (limite : {MAX_UPLOAD_MB:g} Mo)"}), 413
+
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    """
+    Expose les métriques du processus au format texte Prometheus.
+
+    Retour:
+        - 200: texte au format d'exposition 0.0.4
+    """
+    return Response(metrics.REGISTRY.render(), mimetype='text/plain; version=0.0.4; charset=utf-8')
+
 if __name__ == '__main__':
-    # Permet de lancer l'API en local ou sur un port défini par la variable d'environnement PORT.
+    # Serveur de développement Flask, pour un usage local uniquement.
+    # En production : gunicorn -c gunicorn.conf.py wsgi:app (workers préchargés, voir wsgi.py).
+    # Le port est défini par la variable d'environnement PORT.
     port = int(os.environ.get("PORT", 3000))
     app.run(host='0.0.0.0', port=port)
\ No newline at end of file
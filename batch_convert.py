@@ -0,0 +1,353 @@
+"""
+batch_convert.py
+
+Conversion non interactive d'un lot de PDF (répertoire ou motif glob) vers Excel ou JSON.
+
+Fonctionnalités principales :
+- Convertit tous les PDF trouvés dans un pool de processus (--jobs).
+- Écrit un fichier Excel (export_to_excel) ou JSON (résultat de parse_pdf) par PDF (--format).
+- Avec --output-dir, reproduit sous le répertoire de sortie l'arborescence des PDF relative
+  à l'entrée qui les désigne (archives/2023/a/x.pdf -> sorties/a/x.json) ; deux PDF qui
+  produiraient la même sortie arrêtent le lot avant toute conversion.
+- Reprise (--resume) : ignore les PDF dont la sortie est à jour, par date de modification
+  ou par hash du contenu (--check). Les hash sont suivis dans un fichier placé dans chaque
+  répertoire de sortie, enregistré au fil du lot (écriture atomique) : un lot interrompu
+  conserve sa progression, quel que soit le répertoire courant.
+- Affiche la progression et un récapitulatif du débit.
+- Profilage (--profile) : chaque analyse est profilée (cProfile) et un profil .prof et un
+  rapport texte ventilé par méthode de InvoiceParser sont écrits par PDF (--profile-dir).
+- Extraction parallèle des pages de chaque PDF (--parallel, ou PARSER_PARALLEL=1) : utile pour
+  quelques très longues commandes, avec peu de processus (--jobs).
+
+Usage :
+    python batch_convert.py archives/2023 --format json --jobs 8 --resume
+    python batch_convert.py "archives/**/*.pdf" --output-dir sorties --check hash --resume
+    python batch_convert.py fournisseur_lent.pdf --format json --profile --profile-dir profils
+    python batch_convert.py commande_2000_pages.pdf --jobs 1 --parallel
+
+Auteur  : Lam Clément
+Date    : 2024-06
+Licence : Usage interne VINCI Energies
+
+Dépendances :
+- facture_to_excel (InvoiceParser)
+- result_cache (document_digest)
+- invoice_items (sérialisation JSON des items)
+- profiling (profilage cProfile, --profile)
+"""
+
+import argparse
+import glob
+import json
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, List, Tuple
+
+from facture_to_excel import InvoiceParser
+from invoice_items import json_default
+from profiling import PROFILE_DIR, profile_call
+from result_cache import document_digest
+
+# Extension du fichier produit pour chaque format
+OUTPUT_EXTENSIONS = {"excel": ".xlsx", "json": ".json"}
+# Fichier de suivi des hash des PDF convertis (mode --check hash), placé dans chaque répertoire
+# de sortie et indexé par nom de fichier de sortie
+MANIFEST_NAME = ".batch_convert_manifest.json"
+# Répertoire des profils (--profile) quand ni --profile-dir ni PROFILE_DIR ne sont donnés
+DEFAULT_PROFILE_DIR = "profils"
+# Le fichier de suivi des hash est réenregistré toutes les N conversions réussies
+MANIFEST_SAVE_EVERY = 20
+
+# Caractères spéciaux d'un motif glob
+_GLOB_MAGIC = re.compile(r"[*?[]")
+
+def input_root(entry: str) -> str:
+    """
+    Répertoire de référence d'une entrée : le répertoire lui-même, le répertoire d'un fichier,
+    ou la partie fixe d'un motif glob (archives/**/*.pdf -> archives).
+
+    Args:
+        entry (str): Répertoire, fichier ou motif glob.
+
+    Returns:
+        str: Répertoire à partir duquel les chemins des PDF sont reproduits en sortie.
+    """
+    if os.path.isdir(entry):
+        return entry
+    if not _GLOB_MAGIC.search(entry):
+        return os.path.dirname(entry)
+    parts = []
+    for part in entry.replace("\\", "/").split("/"):
+        if _GLOB_MAGIC.search(part):
+            break
+        parts.append(part)
+    return "/".join(parts) or "."
+
+def find_pdfs_with_roots(inputs: List[str], recursive: bool = False) -> List[Tuple[str, str]]:
+    """
+    Liste les PDF désignés par des répertoires et/ou des motifs glob, avec le répertoire de
+    référence de l'entrée qui les désigne (la première, si plusieurs entrées désignent le même PDF).
+
+    Args:
+        inputs (list[str]): Répertoires, fichiers ou motifs glob.
+        recursive (bool): Parcourt aussi les sous-répertoires des répertoires donnés.
+
+    Returns:
+        list[tuple(str, str)]: (chemin du PDF, répertoire de référence), triés par chemin, sans doublon.
+    """
+    found: Dict[str, str] = {}
+    for entry in inputs:
+        if os.path.isdir(entry):
+            pattern = os.path.join(entry, "**", "*.pdf") if recursive else os.path.join(entry, "*.pdf")
+            matches = glob.glob(pattern, recursive=recursive)
+        else:
+            matches = glob.glob(entry, recursive=True)
+        root = input_root(entry)
+        for path in matches:
+            if path.lower().endswith(".pdf") and os.path.isfile(path):
+                found.setdefault(path, root)
+    return sorted(found.items())
+
+def find_pdfs(inputs: List[str], recursive: bool = False) -> List[str]:
+    """
+    Liste les PDF désignés par des répertoires et/ou des motifs glob.
+
+    Args:
+        inputs (list[str]): Répertoires, fichiers ou motifs glob.
+        recursive (bool): Parcourt aussi les sous-répertoires des répertoires donnés.
+
+    Returns:
+        list[str]: Chemins des PDF, triés et sans doublon.
+    """
+    return [path for path, _ in find_pdfs_with_roots(inputs, recursive)]
+
+def output_path_for(pdf_path: str, output_dir: str, fmt: str, root: str = None) -> str:
+    """
+    Calcule le chemin du fichier produit pour un PDF.
+
+    Args:
+        pdf_path (str): Chemin du PDF.
+        output_dir (str|None): Répertoire de sortie (None : à côté du PDF).
+        fmt (str): Format de sortie ("excel" ou "json").
+        root (str, optional): Répertoire de référence du PDF : son chemin relatif à ce répertoire
+            est reproduit sous output_dir (sans root, seul le nom du fichier est conservé).
+
+    Returns:
+        str: Chemin du fichier de sortie.
+    """
+    if output_dir and root is not None:
+        relative = os.path.relpath(pdf_path, root or ".")
+        return os.path.join(output_dir, os.path.splitext(relative)[0] + OUTPUT_EXTENSIONS[fmt])
+    base = os.path.splitext(os.path.basename(pdf_path))[0] + OUTPUT_EXTENSIONS[fmt]
+    return os.path.join(output_dir or os.path.dirname(pdf_path), base)
+
+def find_collisions(outputs: List[Tuple[str, str]]) -> Dict[str, List[str]]:
+    """
+    Repère les sorties produites par plusieurs PDF (l'une écraserait l'autre).
+
+    Args:
+        outputs (list[tuple(str, str)]): (chemin du PDF, chemin de sortie).
+
+    Returns:
+        dict: PDF concernés par chemin de sortie en collision (vide s'il n'y en a aucune).
+    """
+    by_output: Dict[str, List[str]] = {}
+    for pdf_path, output_path in outputs:
+        by_output.setdefault(os.path.normcase(os.path.abspath(output_path)), []).append(pdf_path)
+    return {output: pdfs for output, pdfs in by_output.items() if len(pdfs) > 1}
+
+def is_up_to_date(pdf_path: str, output_path: str, check: str, manifest: Dict[str, str]) -> bool:
+    """
+    Indique si la sortie d'un PDF peut être conservée.
+
+    Args:
+        pdf_path (str): Chemin du PDF.
+        output_path (str): Chemin du fichier de sortie.
+        check (str): "mtime" (sortie plus récente que le PDF) ou "hash" (contenu inchangé).
+        manifest (dict): Hash des PDF déjà convertis du répertoire de la sortie, par nom de fichier
+            de sortie (voir manifest_path_for).
+
+    Returns:
+        bool: True si la conversion peut être ignorée.
+    """
+    if not os.path.exists(output_path):
+        return False
+    if check == "hash":
+        return manifest.get(os.path.basename(output_path)) == document_digest(pdf_path, "batch")
+    return os.path.getmtime(output_path) >= os.path.getmtime(pdf_path)
+
+def convert_one(pdf_path: str, output_path: str, fmt: str, profile_dir: str = None,
+                parallel: bool = None) -> Tuple[int, str, str]:
+    """
+    Convertit un PDF (exécuté dans un processus du pool).
+
+    Args:
+        pdf_path (str): Chemin du PDF.
+        output_path (str): Chemin du fichier à produire.
+        fmt (str): Format de sortie ("excel" ou "json").
+        profile_dir (str, optional): Répertoire des profils ; l'analyse est profilée s'il est donné.
+        parallel (bool, optional): Extraction parallèle des pages (PARSER_PARALLEL par défaut).
+
+    Returns:
+        tuple(int, str, str): Nombre d'items extraits, hash du PDF converti et chemin du rapport
+            de profilage (None sans profilage).
+    """
+    parser = InvoiceParser()
+    report_path = None
+    if profile_dir:
+        label = os.path.splitext(os.path.basename(pdf_path))[0]
+        result, report = profile_call(parser.parse_pdf, pdf_path, parallel=parallel, label=label,
+                                      output_dir=profile_dir)
+        report_path = report["fichier_rapport"]
+    else:
+        result = parser.parse_pdf(pdf_path, parallel=parallel)
+    if fmt == "excel":
+        parser.export_to_excel(output_path)
+    else:
+        with open(output_path, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, indent=2, default=json_default)
+    return len(result["items"]), document_digest(pdf_path, "batch"), report_path
+
+def manifest_path_for(output_path: str) -> str:
+    """
+    Chemin du fichier de suivi des hash d'une sortie : dans le répertoire de la sortie, qu'elle
+    soit sous --output-dir ou à côté de son PDF.
+
+    Args:
+        output_path (str): Chemin du fichier de sortie.
+
+    Returns:
+        str: Chemin du fichier de suivi.
+    """
+    return os.path.join(os.path.dirname(output_path), MANIFEST_NAME)
+
+def load_manifest(path: str) -> Dict[str, str]:
+    """
+    Charge le fichier de suivi des hash (vide s'il n'existe pas ou est illisible).
+    """
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def save_manifest(path: str, manifest: Dict[str, str]) -> None:
+    """
+    Enregistre le fichier de suivi des hash de façon atomique (fichier temporaire puis
+    renommage) : une interruption pendant l'écriture laisse la version précédente intacte.
+    """
+    temporary_path = f"{path}.{os.getpid()}.tmp"
+    with open(temporary_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(temporary_path, path)
+
+def main(argv: List[str] = None) -> int:
+    """
+    Point d'entrée de la ligne de commande.
+
+    Args:
+        argv (list[str], optional): Arguments (sys.argv[1:] par défaut).
+
+    Returns:
+        int: Code de sortie (1 si au moins une conversion a échoué, 2 si des sorties sont en collision).
+    """
+    arg_parser = argparse.ArgumentParser(description="Conversion par lot de bons de commande PDF vers Excel ou JSON")
+    arg_parser.add_argument("inputs", nargs="+", help="Répertoires, fichiers ou motifs glob (ex. 'archives/**/*.pdf')")
+    arg_parser.add_argument("--format", choices=sorted(OUTPUT_EXTENSIONS), default="excel", help="Format de sortie")
+    arg_parser.add_argument("--output-dir", help="Répertoire de sortie (par défaut : à côté de chaque PDF)")
+    arg_parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1, help="Nombre de processus")
+    arg_parser.add_argument("--resume", action="store_true", help="Ignore les PDF dont la sortie est à jour")
+    arg_parser.add_argument("--check", choices=["mtime", "hash"], default="mtime",
+                            help="Critère de mise à jour utilisé par --resume")
+    arg_parser.add_argument("--recursive", action="store_true", help="Parcourt les sous-répertoires")
+    arg_parser.add_argument("--profile", action="store_true",
+                            help="Profile chaque analyse (cProfile) et écrit un rapport par PDF")
+    arg_parser.add_argument("--profile-dir",
+                            help=f"Répertoire des profils (par défaut : PROFILE_DIR ou '{DEFAULT_PROFILE_DIR}')")
+    arg_parser.add_argument("--parallel", action="store_true", default=None,
+                            help="Extrait les pages de chaque PDF en parallèle (par défaut : PARSER_PARALLEL)")
+    args = arg_parser.parse_args(argv)
+    profile_dir = (args.profile_dir or PROFILE_DIR or DEFAULT_PROFILE_DIR) if args.profile else None
+
+    if args.output_dir:
+        os.makedirs(args.output_dir, exist_ok=True)
+    pdf_roots = find_pdfs_with_roots(args.inputs, args.recursive)
+
+    outputs = [(pdf_path, output_path_for(pdf_path, args.output_dir, args.format, root))
+               for pdf_path, root in pdf_roots]
+    collisions = find_collisions(outputs)
+    if collisions:
+        for output_path, pdfs in sorted(collisions.items()):
+            print(f"ERREUR : {', '.join(pdfs)} produiraient tous {output_path}")
+        print("Lot interrompu avant toute conversion : renommer les PDF ou les convertir séparément")
+        return 2
+
+    # Fichiers de suivi des hash, par chemin (un par répertoire de sortie)
+    manifests: Dict[str, Dict[str, str]] = {}
+    if args.check == "hash":
+        for _, output_path in outputs:
+            manifest_path = manifest_path_for(output_path)
+            if manifest_path not in manifests:
+                manifests[manifest_path] = load_manifest(manifest_path)
+
+    tasks = []
+    skipped = 0
+    for pdf_path, output_path in outputs:
+        manifest = manifests.get(manifest_path_for(output_path), {})
+        if args.resume and is_up_to_date(pdf_path, output_path, args.check, manifest):
+            skipped += 1
+            continue
+        tasks.append((pdf_path, output_path))
+    for output_dir in {os.path.dirname(output_path) for _, output_path in tasks}:
+        if output_dir:
+            os.makedirs(output_dir, exist_ok=True)
+    print(f"{len(pdf_roots)} PDF trouvés, {skipped} déjà à jour, {len(tasks)} à convertir ({args.jobs} processus)")
+
+    start = time.perf_counter()
+    done = errors = total_items = 0
+    unsaved = 0
+    # Fichiers de suivi modifiés depuis leur dernier enregistrement
+    changed = set()
+    try:
+        with ProcessPoolExecutor(max_workers=max(1, args.jobs)) as pool:
+            futures = {pool.submit(convert_one, pdf_path, output_path, args.format, profile_dir, args.parallel):
+                       (pdf_path, output_path)
+                       for pdf_path, output_path in tasks}
+            for future in as_completed(futures):
+                pdf_path, output_path = futures[future]
+                done += 1
+                try:
+                    items, digest, report_path = future.result()
+                    total_items += items
+                    if args.check == "hash":
+                        manifest_path = manifest_path_for(output_path)
+                        manifests[manifest_path][os.path.basename(output_path)] = digest
+                        changed.add(manifest_path)
+                        unsaved += 1
+                    status = f"{items} items" + (f", profil {report_path}" if report_path else "")
+                except Exception as e:
+                    errors += 1
+                    status = f"ERREUR : {e}"
+                elapsed = time.perf_counter() - start
+                print(f"[{done}/{len(tasks)}] {pdf_path} -> {status} ({done / elapsed:.1f} PDF/s)")
+                if unsaved >= MANIFEST_SAVE_EVERY:
+                    for manifest_path in changed:
+                        save_manifest(manifest_path, manifests[manifest_path])
+                    changed.clear()
+                    unsaved = 0
+    finally:
+        # Enregistrés aussi en cas d'interruption (Ctrl+C, erreur) : les conversions faites ne sont pas perdues
+        for manifest_path in changed:
+            save_manifest(manifest_path, manifests[manifest_path])
+
+    elapsed = time.perf_counter() - start
+    rate = len(tasks) / elapsed if elapsed > 0 else 0.0
+    print(f"\nTerminé : {len(tasks) - errors} convertis, {errors} en erreur, {skipped} ignorés, "
+          f"{total_items} items en {elapsed:.1f} s ({rate:.1f} PDF/s)")
+    return 1 if errors else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
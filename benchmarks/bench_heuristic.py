@@ -0,0 +1,101 @@
+"""
+bench_heuristic.py
+
+Micro-benchmark des heuristiques d'extraction sur des pages de texte synthétiques.
+
+Mesure le temps de InvoiceParser._heuristic_parse et de InvoiceParser._extract_total
+sur des pages de plusieurs milliers de lignes, sans PDF ni pdfplumber : seule la partie
+regex/heuristique est chronométrée. Lancer le script sur deux révisions permet de comparer
+leurs performances.
+
+Usage :
+    python benchmarks/bench_heuristic.py --lines 5000 --repeat 5 [--json resultats.json]
+
+Auteur  : Lam Clément
+Date    : 2024-06
+Licence : Usage interne VINCI Energies
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from facture_to_excel import InvoiceParser
+
+def synthetic_page_text(n_lines: int, seed: int = 0) -> str:
+    """
+    Génère le texte d'une page de commande : lignes d'items, désignations,
+    mentions de livraison et ligne de total.
+
+    Args:
+        n_lines (int): Nombre approximatif de lignes.
+        seed (int): Graine du générateur aléatoire.
+
+    Returns:
+        str: Texte de la page.
+    """
+    rnd = random.Random(seed)
+    lines = ["Pos. Article Quantité Unité Prix unitaire Montant HT"]
+    position = 10
+    while len(lines) < n_lines:
+        quantity = rnd.randint(1, 500)
+        price = rnd.randint(100, 250000)
+        unit_price = f"{price // 100:,}".replace(",", ".") + f",{price % 100:02d}"
+        line = f"{position} {100000 + position} {quantity} PCE {unit_price}"
+        if rnd.random() < 0.2:
+            line += f" {rnd.randint(10, 28)}.0{rnd.randint(1, 9)}.2024"
+        lines.append(line)
+        lines.append(f"Produit {position} cable rigide U1000")
+        if rnd.random() < 0.15:
+            lines.append(f"Date de livraison {rnd.randint(10, 28)}.05.2024")
+        position += 10
+    lines.append("Montant total HT 1.234.567,89 EUR")
+    lines.append("Page 1 / 2")
+    return "\n".join(lines)
+
+def _best_time(func, repeat: int) -> float:
+    """
+    Retourne le meilleur temps d'exécution (en secondes) sur plusieurs répétitions.
+    """
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def main() -> None:
+    arg_parser = argparse.ArgumentParser(description="Micro-benchmark de _heuristic_parse et _extract_total")
+    arg_parser.add_argument("--lines", type=int, nargs="+", default=[1000, 5000, 20000],
+                            help="Tailles de page (en lignes) à mesurer")
+    arg_parser.add_argument("--repeat", type=int, default=5, help="Nombre de répétitions par mesure")
+    arg_parser.add_argument("--json", help="Fichier où écrire les résultats au format JSON")
+    args = arg_parser.parse_args()
+
+    parser = InvoiceParser()
+    results = []
+    for n_lines in args.lines:
+        text = synthetic_page_text(n_lines)
+        next_text = "Pos. Article Quantité Unité Prix unitaire Montant HT\nProduit reporté"
+        heuristic = _best_time(lambda: parser._heuristic_parse(text, next_text), args.repeat)
+        total = _best_time(lambda: parser._extract_total(text), args.repeat)
+        results.append({
+            "lines": n_lines,
+            "heuristic_parse_s": heuristic,
+            "heuristic_lines_per_s": n_lines / heuristic,
+            "extract_total_s": total,
+        })
+        print(f"{n_lines:>7} lignes : _heuristic_parse {heuristic * 1000:9.2f} ms "
+              f"({n_lines / heuristic:,.0f} lignes/s), _extract_total {total * 1000:7.2f} ms")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"benchmark": "heuristic", "results": results}, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+bench_memory.py
+
+Benchmark de la mémoire de pointe (pic de RSS) de parse_pdf selon le nombre de pages.
+
+Chaque mesure est faite dans un interpréteur neuf : le PDF synthétique (synthetic_pdf.py) est
+généré, puis analysé en mémoire comme par l'API. Deux modes sont comparés :
+- "borne" : mode mémoire bornée forcé (pages libérées, textes retirés du cache au fil de l'analyse) ;
+- "cache" : mode mémoire bornée désactivé (pages libérées, textes conservés dans le cache de pages).
+
+En mode borné, le pic de RSS doit rester à peu près constant quand le nombre de pages augmente :
+seuls les items extraits grandissent avec le document. --max-growth-mb fait échouer le script
+(code 1) si l'écart entre la plus petite et la plus grande taille dépasse le seuil.
+
+Usage :
+    python benchmarks/bench_memory.py --pages 50 100 200 400 [--max-growth-mb 25] [--json memoire.json]
+
+Auteur  : Lam Clément
+Date    : 2024-06
+Licence : Usage interne VINCI Energies
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MODES = {"borne": True, "cache": False}
+
+# Script exécuté dans l'interpréteur neuf : affiche ses mesures en JSON sur la dernière ligne
+_CHILD_SCRIPT = r"""
+import io, json, resource, sys, time
+
+sys.path.insert(0, "benchmarks")
+from synthetic_pdf import make_invoice_pdf
+from facture_to_excel import InvoiceParser
+
+n_pages, bounded = int(sys.argv[1]), sys.argv[2] == "1"
+pdf_bytes = make_invoice_pdf(n_pages)
+rss_before_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+start = time.perf_counter()
+result = InvoiceParser(bounded_memory=bounded).parse_pdf(io.BytesIO(pdf_bytes))
+print(json.dumps({
+    "pages": n_pages,
+    "items": len(result["items"]),
+    "parse_s": time.perf_counter() - start,
+    "rss_before_mb": rss_before_mb,
+    "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+}))
+"""
+
+def measure(n_pages: int, bounded: bool) -> dict:
+    """
+    Analyse un document de n_pages pages dans un interpréteur neuf et retourne ses mesures.
+
+    Args:
+        n_pages (int): Nombre de pages du document synthétique.
+        bounded (bool): Mode mémoire bornée.
+
+    Returns:
+        dict: pages, items, parse_s, rss_before_mb, peak_rss_mb.
+    """
+    output = subprocess.run([sys.executable, "-c", _CHILD_SCRIPT, str(n_pages), "1" if bounded else "0"],
+                            cwd=REPO_DIR, check=True, capture_output=True, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+def main() -> int:
+    arg_parser = argparse.ArgumentParser(description="Pic de RSS de parse_pdf selon le nombre de pages")
+    arg_parser.add_argument("--pages", type=int, nargs="+", default=[50, 100, 200, 400],
+                            help="Tailles de document (en pages) à mesurer")
+    arg_parser.add_argument("--modes", nargs="+", choices=sorted(MODES), default=sorted(MODES),
+                            help="Modes mesurés")
+    arg_parser.add_argument("--max-growth-mb", type=float,
+                            help="Écart maximal de pic de RSS en mode borné entre la plus petite et la plus grande taille")
+    arg_parser.add_argument("--json", help="Fichier où écrire les résultats au format JSON")
+    args = arg_parser.parse_args()
+
+    results = {mode: [] for mode in args.modes}
+    for mode in args.modes:
+        for n_pages in sorted(args.pages):
+            entry = measure(n_pages, MODES[mode])
+            results[mode].append(entry)
+            print(f"{mode:>6} {n_pages:>5} pages ({entry['items']:>6} items) : pic RSS {entry['peak_rss_mb']:7.1f} Mo "
+                  f"(avant analyse {entry['rss_before_mb']:.1f} Mo), parse_pdf {entry['parse_s']:.2f} s")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"benchmark": "memoire", "results": results}, f, indent=2)
+
+    if args.max_growth_mb is not None and "borne" in results:
+        bounded = results["borne"]
+        growth = bounded[-1]["peak_rss_mb"] - bounded[0]["peak_rss_mb"]
+        print(f"Croissance du pic de RSS en mode borné ({bounded[0]['pages']} -> {bounded[-1]['pages']} pages) : "
+              f"{growth:.1f} Mo")
+        if growth > args.max_growth_mb:
+            print(f"RÉGRESSION : croissance {growth:.1f} Mo > {args.max_growth_mb:.1f} Mo")
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,118 @@
+"""
+bench_startup.py
+
+Benchmark du démarrage de l'API : temps d'import et mémoire (RSS) d'un worker.
+
+Chaque mesure est faite dans un interpréteur neuf, comme un worker gunicorn ou un conteneur
+qui démarre :
+1. temps d'import de api_pdf_convert et RSS juste après ;
+2. RSS après avoir servi une requête /upload (PDF synthétique, via le client de test Flask) ;
+3. vérification que pandas et openpyxl ne sont pas chargés par le chemin /upload.
+
+Les seuils --max-import-ms et --max-rss-mb font échouer le script (code 1) en cas de régression.
+
+Usage :
+    python benchmarks/bench_startup.py --runs 5 [--max-import-ms 400] [--max-rss-mb 120] [--json startup.json]
+
+Auteur  : Lam Clément
+Date    : 2024-06
+Licence : Usage interne VINCI Energies
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Script exécuté dans l'interpréteur neuf : affiche ses mesures en JSON sur la dernière ligne
+_CHILD_SCRIPT = r"""
+import base64, contextlib, io, json, sys, time
+
+def rss_mb():
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+start = time.perf_counter()
+import api_pdf_convert
+import_ms = (time.perf_counter() - start) * 1000
+rss_after_import = rss_mb()
+
+sys.path.insert(0, "benchmarks")
+from synthetic_pdf import make_invoice_pdf
+payload = {"filename": "bench.pdf", "filecontent": base64.b64encode(make_invoice_pdf(2)).decode()}
+client = api_pdf_convert.app.test_client()
+start = time.perf_counter()
+with contextlib.redirect_stdout(io.StringIO()):
+    response = client.post("/upload", json=payload)
+first_request_ms = (time.perf_counter() - start) * 1000
+print(json.dumps({
+    "import_ms": import_ms,
+    "rss_after_import_mb": rss_after_import,
+    "first_request_ms": first_request_ms,
+    "rss_after_request_mb": rss_mb(),
+    "status": response.status_code,
+    "pandas_loaded": "pandas" in sys.modules,
+    "openpyxl_loaded": "openpyxl" in sys.modules,
+}))
+"""
+
+def measure_once() -> dict:
+    """
+    Lance un interpréteur neuf et retourne ses mesures.
+    """
+    output = subprocess.run([sys.executable, "-c", _CHILD_SCRIPT], cwd=REPO_DIR, check=True,
+                            capture_output=True, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+def main() -> int:
+    arg_parser = argparse.ArgumentParser(description="Temps d'import et RSS d'un worker de l'API")
+    arg_parser.add_argument("--runs", type=int, default=5, help="Nombre d'interpréteurs lancés")
+    arg_parser.add_argument("--max-import-ms", type=float, help="Seuil de temps d'import (médiane)")
+    arg_parser.add_argument("--max-rss-mb", type=float, help="Seuil de RSS après une requête (médiane)")
+    arg_parser.add_argument("--json", help="Fichier où écrire les résultats au format JSON")
+    args = arg_parser.parse_args()
+
+    runs = [measure_once() for _ in range(args.runs)]
+    summary = {key: statistics.median(run[key] for run in runs)
+               for key in ("import_ms", "rss_after_import_mb", "first_request_ms", "rss_after_request_mb")}
+    summary["pandas_loaded"] = any(run["pandas_loaded"] for run in runs)
+    summary["openpyxl_loaded"] = any(run["openpyxl_loaded"] for run in runs)
+    summary["status"] = runs[0]["status"]
+
+    print(f"Import api_pdf_convert  : {summary['import_ms']:.0f} ms (médiane sur {args.runs})")
+    print(f"RSS après import        : {summary['rss_after_import_mb']:.1f} Mo")
+    print(f"Première requête        : {summary['first_request_ms']:.0f} ms (HTTP {summary['status']})")
+    print(f"RSS après une requête   : {summary['rss_after_request_mb']:.1f} Mo")
+    print(f"pandas chargé           : {summary['pandas_loaded']}")
+    print(f"openpyxl chargé         : {summary['openpyxl_loaded']}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"benchmark": "startup", "summary": summary, "runs": runs}, f, indent=2)
+
+    failures = []
+    if summary["status"] != 200:
+        failures.append(f"la requête /upload a échoué (HTTP {summary['status']})")
+    if summary["pandas_loaded"] or summary["openpyxl_loaded"]:
+        failures.append("pandas/openpyxl chargés par le chemin /upload")
+    if args.max_import_ms is not None and summary["import_ms"] > args.max_import_ms:
+        failures.append(f"import {summary['import_ms']:.0f} ms > {args.max_import_ms:.0f} ms")
+    if args.max_rss_mb is not None and summary["rss_after_request_mb"] > args.max_rss_mb:
+        failures.append(f"RSS {summary['rss_after_request_mb']:.1f} Mo > {args.max_rss_mb:.1f} Mo")
+    for failure in failures:
+        print(f"RÉGRESSION : {failure}")
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,179 @@
+"""
+bench_suite.py
+
+Suite de benchmarks de bout en bout sur des bons de commande PDF synthétiques (synthetic_pdf.py).
+
+Pour chaque taille de document (1 à 200 pages par défaut), mesure :
+- InvoiceParser.parse_pdf (cache de pages vidé avant chaque mesure) ;
+- InvoiceParser.export_to_excel (fichier temporaire) ;
+- POST /upload de bout en bout via le client de test Flask (base64, parsing, nettoyage,
+  sérialisation JSON), caches de pages et de réponses vidés avant chaque mesure.
+
+Les résultats (médiane et minimum par mesure, révision git, version de Python) sont écrits
+en JSON : --compare affiche l'écart avec un fichier produit sur une autre révision.
+
+Usage :
+    python benchmarks/bench_suite.py --pages 1 10 50 100 200 --repeat 3 --json bench_$(git rev-parse --short HEAD).json
+    python benchmarks/bench_suite.py --compare bench_ancien.json --json bench_nouveau.json
+
+Auteur  : Lam Clément
+Date    : 2024-06
+Licence : Usage interne VINCI Energies
+"""
+
+import argparse
+import base64
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, List
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+import api_pdf_convert
+from facture_to_excel import PAGE_TEXT_CACHE, InvoiceParser
+from synthetic_pdf import make_invoice_pdf
+
+def _measure(func: Callable[[], object], repeat: int, before: Callable[[], None] = None) -> Dict[str, float]:
+    """
+    Exécute une fonction plusieurs fois et retourne la médiane et le minimum (en secondes).
+
+    Args:
+        func (Callable): Fonction chronométrée.
+        repeat (int): Nombre de répétitions.
+        before (Callable, optional): Préparation non chronométrée (vidage des caches...).
+
+    Returns:
+        dict: {"median_s", "min_s"}.
+    """
+    timings = []
+    for _ in range(repeat):
+        if before is not None:
+            before()
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return {"median_s": statistics.median(timings), "min_s": min(timings)}
+
+def _clear_caches() -> None:
+    """
+    Vide les caches de pages et de réponses : chaque mesure repart d'un document jamais vu.
+    """
+    PAGE_TEXT_CACHE.clear()
+    api_pdf_convert.RESULT_CACHE.clear()
+
+def _git_revision() -> str:
+    """
+    Retourne la révision git courante (ou "inconnue" hors dépôt).
+    """
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_DIR, check=True,
+                              capture_output=True, text=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "inconnue"
+
+def bench_size(n_pages: int, repeat: int, workdir: str) -> Dict[str, object]:
+    """
+    Mesure parse_pdf, export_to_excel et /upload pour un document de n_pages pages.
+
+    Args:
+        n_pages (int): Nombre de pages du document synthétique.
+        repeat (int): Nombre de répétitions par mesure.
+        workdir (str): Répertoire des fichiers temporaires.
+
+    Returns:
+        dict: Mesures pour cette taille.
+    """
+    pdf_bytes = make_invoice_pdf(n_pages)
+    pdf_path = os.path.join(workdir, f"commande_{n_pages}.pdf")
+    with open(pdf_path, "wb") as f:
+        f.write(pdf_bytes)
+    excel_path = os.path.join(workdir, f"commande_{n_pages}.xlsx")
+
+    parser = InvoiceParser()
+    parse = _measure(lambda: parser.parse_pdf(pdf_path), repeat, before=_clear_caches)
+    items = len(parser.last_result["items"])
+    export = _measure(lambda: parser.export_to_excel(excel_path), repeat)
+
+    client = api_pdf_convert.app.test_client()
+    payload = {"filename": os.path.basename(pdf_path), "filecontent": base64.b64encode(pdf_bytes).decode()}
+    statuses = []
+    upload = _measure(lambda: statuses.append(client.post("/upload", json=payload).status_code),
+                      repeat, before=_clear_caches)
+    if set(statuses) != {200}:
+        raise RuntimeError(f"/upload a échoué pour {n_pages} pages : statuts {sorted(set(statuses))}")
+
+    return {
+        "pages": n_pages,
+        "items": items,
+        "pdf_bytes": len(pdf_bytes),
+        "parse_pdf": parse,
+        "export_to_excel": export,
+        "upload": upload,
+        "pages_per_s": n_pages / parse["median_s"],
+    }
+
+def print_comparison(results: List[Dict[str, object]], reference_path: str) -> None:
+    """
+    Affiche le rapport des médianes entre les résultats courants et un fichier de référence.
+
+    Args:
+        results (list[dict]): Résultats de la révision courante.
+        reference_path (str): Fichier JSON produit par une exécution précédente.
+    """
+    with open(reference_path) as f:
+        reference = json.load(f)
+    by_pages = {entry["pages"]: entry for entry in reference["results"]}
+    print(f"\nComparaison avec {reference_path} (révision {reference.get('revision', '?')}) : "
+          "temps courant / temps de référence")
+    for entry in results:
+        old = by_pages.get(entry["pages"])
+        if old is None:
+            continue
+        ratios = "  ".join(f"{name} x{entry[name]['median_s'] / old[name]['median_s']:.2f}"
+                           for name in ("parse_pdf", "export_to_excel", "upload"))
+        print(f"{entry['pages']:>5} pages : {ratios}")
+
+def main() -> None:
+    arg_parser = argparse.ArgumentParser(description="Benchmarks parse_pdf, export_to_excel et /upload")
+    arg_parser.add_argument("--pages", type=int, nargs="+", default=[1, 10, 50, 100, 200],
+                            help="Tailles de document (en pages) à mesurer")
+    arg_parser.add_argument("--repeat", type=int, default=3, help="Nombre de répétitions par mesure")
+    arg_parser.add_argument("--json", help="Fichier où écrire les résultats au format JSON")
+    arg_parser.add_argument("--compare", help="Fichier JSON d'une exécution précédente à comparer")
+    args = arg_parser.parse_args()
+
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        # Préchauffage : les imports différés (openpyxl) ne sont pas comptés dans la première mesure
+        bench_size(1, 1, workdir)
+        for n_pages in args.pages:
+            entry = bench_size(n_pages, args.repeat, workdir)
+            results.append(entry)
+            print(f"{n_pages:>5} pages ({entry['items']:>5} items) : "
+                  f"parse_pdf {entry['parse_pdf']['median_s'] * 1000:9.1f} ms, "
+                  f"export_to_excel {entry['export_to_excel']['median_s'] * 1000:8.1f} ms, "
+                  f"/upload {entry['upload']['median_s'] * 1000:9.1f} ms "
+                  f"({entry['pages_per_s']:.1f} pages/s)")
+
+    if args.compare:
+        print_comparison(results, args.compare)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({
+                "benchmark": "suite",
+                "revision": _git_revision(),
+                "python": platform.python_version(),
+                "date": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "repeat": args.repeat,
+                "results": results,
+            }, f, indent=2)
+
+if __name__ == "__main__":
+    main()
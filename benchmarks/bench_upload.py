@@ -0,0 +1,164 @@
+"""
+bench_upload.py
+
+Benchmark des modes d'envoi de /upload : JSON base64, corps PDF brut (application/pdf) et
+formulaire multipart/form-data. Mesure la latence d'une requête et la mémoire de pointe
+allouée pendant son traitement.
+
+Fonctionnalités principales :
+- Bon de commande synthétique (synthetic_pdf.py) complété par un flux binaire (--filler-mb)
+  pour simuler un document scanné lourd, ou PDF fourni (--pdf).
+- Corps de requête préparés une fois, hors mesure : seul le traitement côté serveur est mesuré
+  (client de test Flask, pile WSGI complète).
+- Cache de réponses désactivé (RESULT_CACHE_SIZE=0) : chaque requête refait l'analyse.
+- Latence : médiane et p90 sur --runs requêtes par mode, modes alternés ; mémoire : pic
+  tracemalloc d'une requête (allocations Python, mesuré à part pour ne pas fausser les latences).
+- Vérifie que les trois modes renvoient exactement la même réponse.
+
+Usage :
+    python benchmarks/bench_upload.py --pages 5 --filler-mb 8 --runs 10 [--json envoi.json]
+
+Auteur  : Lam Clément
+Date    : 2024-06
+Licence : Usage interne VINCI Energies
+"""
+
+import argparse
+import base64
+import json
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+from typing import Dict, Tuple
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+# Chaque requête doit refaire l'analyse : cache de réponses désactivé avant l'import de l'API
+os.environ["RESULT_CACHE_SIZE"] = "0"
+os.environ.pop("RESULT_CACHE_DB", None)
+
+import api_pdf_convert
+from synthetic_pdf import make_invoice_pdf
+
+# Délimiteur du formulaire multipart construit par le benchmark
+_BOUNDARY = "----bench-upload-boundary"
+
+def build_requests(pdf_bytes: bytes, filename: str) -> Dict[str, Tuple[bytes, str]]:
+    """
+    Prépare le corps et le type de contenu de la requête de chaque mode.
+
+    Args:
+        pdf_bytes (bytes): Contenu du PDF.
+        filename (str): Nom du document.
+
+    Returns:
+        dict: (corps, Content-Type) par mode (base64, brut, multipart).
+    """
+    base64_body = json.dumps({"filename": filename, "filecontent": base64.b64encode(pdf_bytes).decode()}).encode()
+    multipart_body = (
+        f"--{_BOUNDARY}\r\nContent-Disposition: form-data; name=\"file\"; filename=\"{filename}\"\r\n"
+        f"Content-Type: application/pdf\r\n\r\n".encode()
+        + pdf_bytes + f"\r\n--{_BOUNDARY}--\r\n".encode()
+    )
+    return {
+        "base64": (base64_body, "application/json"),
+        "brut": (pdf_bytes, "application/pdf"),
+        "multipart": (multipart_body, f"multipart/form-data; boundary={_BOUNDARY}"),
+    }
+
+def post(client, body: bytes, content_type: str):
+    """
+    Envoie une requête /upload et vérifie son statut.
+    """
+    response = client.post("/upload", data=body, content_type=content_type)
+    if response.status_code != 200:
+        raise RuntimeError(f"Statut {response.status_code} : {response.get_data(as_text=True)[:200]}")
+    return response
+
+def measure(client, requests_by_mode: Dict[str, Tuple[bytes, str]], runs: int) -> Dict[str, Dict[str, object]]:
+    """
+    Mesure la latence et le pic mémoire de chaque mode d'envoi. Les modes sont alternés requête
+    par requête, pour que l'état du processus (ramasse-miettes, allocateur) ne favorise aucun mode.
+
+    Args:
+        client: Client de test Flask.
+        requests_by_mode (dict): (corps, Content-Type) par mode.
+        runs (int): Nombre de requêtes chronométrées par mode.
+
+    Returns:
+        dict: Par mode, taille du corps, latences (ms), pic mémoire (Mo) et réponse.
+    """
+    latencies = {mode: [] for mode in requests_by_mode}
+    for _ in range(runs):
+        for mode, (body, content_type) in requests_by_mode.items():
+            start = time.perf_counter()
+            post(client, body, content_type)
+            latencies[mode].append(time.perf_counter() - start)
+
+    results = {}
+    for mode, (body, content_type) in requests_by_mode.items():
+        tracemalloc.start()
+        tracemalloc.reset_peak()
+        response = post(client, body, content_type)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        values = sorted(latencies[mode])
+        results[mode] = {
+            "body_bytes": len(body),
+            "latency_ms": {
+                "p50": statistics.median(values) * 1000,
+                "p90": values[min(len(values) - 1, int(round(0.9 * len(values))) - 1)] * 1000,
+                "min": values[0] * 1000,
+            },
+            "peak_alloc_mb": peak / (1024 * 1024),
+            "response": response.get_data(),
+        }
+    return results
+
+def main() -> int:
+    arg_parser = argparse.ArgumentParser(description="Latence et mémoire de /upload selon le mode d'envoi")
+    arg_parser.add_argument("--pages", type=int, default=5, help="Pages du bon de commande synthétique")
+    arg_parser.add_argument("--filler-mb", type=float, default=8.0,
+                            help="Taille du flux binaire ajouté au document synthétique (Mo)")
+    arg_parser.add_argument("--pdf", help="PDF à envoyer à la place du document synthétique")
+    arg_parser.add_argument("--runs", type=int, default=10, help="Requêtes chronométrées par mode")
+    arg_parser.add_argument("--json", help="Fichier où écrire les résultats au format JSON")
+    args = arg_parser.parse_args()
+
+    if args.pdf:
+        with open(args.pdf, "rb") as f:
+            pdf_bytes = f.read()
+        filename = os.path.basename(args.pdf)
+    else:
+        pdf_bytes = make_invoice_pdf(args.pages, filler_bytes=int(args.filler_mb * 1024 * 1024))
+        filename = f"commande_{args.pages}.pdf"
+
+    client = api_pdf_convert.app.test_client()
+    requests_by_mode = build_requests(pdf_bytes, filename)
+    # Requête de préchauffage (imports paresseux, premiers appels)
+    client.post("/upload", data=pdf_bytes, content_type="application/pdf")
+
+    print(f"PDF : {len(pdf_bytes) / 1024 / 1024:.1f} Mo, {args.runs} requêtes par mode")
+    results = measure(client, requests_by_mode, args.runs)
+    for mode, entry in results.items():
+        latency = entry["latency_ms"]
+        print(f"{mode:>9} : corps {entry['body_bytes'] / 1024 / 1024:6.1f} Mo, latence p50 {latency['p50']:7.1f} ms, "
+              f"p90 {latency['p90']:7.1f} ms, pic mémoire {entry['peak_alloc_mb']:6.1f} Mo")
+
+    reference = results["base64"].pop("response")
+    identical = True
+    for mode in ("brut", "multipart"):
+        if results[mode].pop("response") != reference:
+            identical = False
+            print(f"ÉCART : la réponse du mode {mode} diffère de celle du mode base64")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"benchmark": "envoi", "pdf_bytes": len(pdf_bytes), "runs": args.runs,
+                       "identical": identical, "results": results}, f, indent=2)
+    return 0 if identical else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
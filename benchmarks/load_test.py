@@ -0,0 +1,234 @@
+"""
+load_test.py
+
+Test de charge de l'API sur une instance locale : débit (requêtes/s) et latences (p50, p90, p99).
+
+Fonctionnalités principales :
+- N clients concurrents (threads), chacun sur une connexion HTTP persistante (keep-alive),
+  qui enchaînent des POST /upload pendant une durée fixe.
+- Bon de commande synthétique (synthetic_pdf.py) ou PDF fourni. Chaque requête porte un
+  contenu distinct (commentaire ajouté après %%EOF) pour mesurer le parsing et non le cache
+  de réponses ; --cache-hits envoie au contraire toujours le même contenu.
+- Démarrage optionnel de l'instance (--start gunicorn ou --start flask), arrêtée en fin de test.
+- Résultats affichés et, avec --json, écrits au format JSON.
+
+Usage :
+    gunicorn -c gunicorn.conf.py wsgi:app &
+    python benchmarks/load_test.py --concurrency 8 --duration 30 --pages 5
+    python benchmarks/load_test.py --start gunicorn --concurrency 4 --json charge.json
+
+Auteur  : Lam Clément
+Date    : 2024-06
+Licence : Usage interne VINCI Energies
+"""
+
+import argparse
+import base64
+import http.client
+import json
+import os
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from typing import Dict, List
+from urllib.parse import urlsplit
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+from synthetic_pdf import make_invoice_pdf
+
+class PayloadFactory:
+    """
+    Produit les corps JSON des requêtes. Le PDF est complété par des espaces jusqu'à un multiple
+    de 3 octets : le base64 d'un suffixe s'ajoute alors tel quel au base64 du PDF, sans réencoder
+    tout le document à chaque requête.
+    """
+
+    def __init__(self, pdf_bytes: bytes, filename: str, unique: bool = True):
+        padded = pdf_bytes + b"\n" * (-len(pdf_bytes) % 3)
+        self.filename = filename
+        self.unique = unique
+        self._prefix = base64.b64encode(padded).decode()
+        self._counter = 0
+        self._lock = threading.Lock()
+
+    def next(self) -> bytes:
+        """
+        Retourne le corps JSON de la prochaine requête.
+        """
+        content = self._prefix
+        if self.unique:
+            with self._lock:
+                self._counter += 1
+                counter = self._counter
+            content += base64.b64encode(b"%%charge %012d\n" % counter).decode()
+        return json.dumps({"filename": self.filename, "filecontent": content}).encode()
+
+def _percentile(sorted_values: List[float], percent: float) -> float:
+    """
+    Percentile par la méthode du rang le plus proche.
+    """
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, int(round(percent / 100 * len(sorted_values))) - 1))
+    return sorted_values[rank]
+
+def _client(host: str, port: int, path: str, payloads: PayloadFactory, deadline: float,
+            latencies: List[float], statuses: Dict[int, int], lock: threading.Lock) -> None:
+    """
+    Boucle d'un client : POST successifs sur une connexion persistante jusqu'à l'échéance.
+    """
+    connection = http.client.HTTPConnection(host, port, timeout=300)
+    local_latencies = []
+    local_statuses: Dict[int, int] = {}
+    while time.perf_counter() < deadline:
+        body = payloads.next()
+        start = time.perf_counter()
+        try:
+            connection.request("POST", path, body=body, headers={"Content-Type": "application/json"})
+            response = connection.getresponse()
+            response.read()
+            status = response.status
+        except (OSError, http.client.HTTPException):
+            # Connexion fermée par le serveur (keep-alive expiré, worker recyclé) : on se reconnecte
+            connection.close()
+            connection = http.client.HTTPConnection(host, port, timeout=300)
+            status = 0
+        local_latencies.append(time.perf_counter() - start)
+        local_statuses[status] = local_statuses.get(status, 0) + 1
+    connection.close()
+    with lock:
+        latencies.extend(local_latencies)
+        for status, count in local_statuses.items():
+            statuses[status] = statuses.get(status, 0) + count
+
+def run_load(url: str, payloads: PayloadFactory, concurrency: int, duration: float) -> Dict[str, object]:
+    """
+    Lance la charge et calcule débit et latences.
+
+    Args:
+        url (str): URL de l'endpoint (ex. http://127.0.0.1:3000/upload).
+        payloads (PayloadFactory): Générateur des corps de requête.
+        concurrency (int): Nombre de clients simultanés.
+        duration (float): Durée de la charge, en secondes.
+
+    Returns:
+        dict: Requêtes, requêtes/s, latences (ms) et répartition des statuts.
+    """
+    parts = urlsplit(url)
+    path = parts.path or "/"
+    if parts.query:
+        path += "?" + parts.query
+    latencies: List[float] = []
+    statuses: Dict[int, int] = {}
+    lock = threading.Lock()
+    start = time.perf_counter()
+    deadline = start + duration
+    threads = [threading.Thread(target=_client, args=(parts.hostname, parts.port or 80, path, payloads,
+                                                      deadline, latencies, statuses, lock))
+               for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    ok = statuses.get(200, 0)
+    return {
+        "requests": len(latencies),
+        "ok": ok,
+        "statuses": {str(status): count for status, count in sorted(statuses.items())},
+        "elapsed_s": elapsed,
+        "requests_per_s": ok / elapsed if elapsed else 0.0,
+        "latency_ms": {
+            "mean": statistics.fmean(latencies) * 1000 if latencies else 0.0,
+            "p50": _percentile(latencies, 50) * 1000,
+            "p90": _percentile(latencies, 90) * 1000,
+            "p99": _percentile(latencies, 99) * 1000,
+            "max": latencies[-1] * 1000 if latencies else 0.0,
+        },
+    }
+
+def start_server(kind: str, port: int) -> subprocess.Popen:
+    """
+    Démarre une instance locale de l'API et attend qu'elle réponde sur /metrics.
+
+    Args:
+        kind (str): "gunicorn" (configuration de production) ou "flask" (serveur de développement).
+        port (int): Port d'écoute.
+
+    Returns:
+        subprocess.Popen: Processus du serveur.
+    """
+    env = dict(os.environ, PORT=str(port))
+    if kind == "gunicorn":
+        command = [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "wsgi:app"]
+    else:
+        command = [sys.executable, "api_pdf_convert.py"]
+    process = subprocess.Popen(command, cwd=REPO_DIR, env=env)
+    for _ in range(300):
+        if process.poll() is not None:
+            raise RuntimeError(f"Le serveur {kind} s'est arrêté au démarrage (code {process.returncode})")
+        try:
+            connection = http.client.HTTPConnection("127.0.0.1", port, timeout=1)
+            connection.request("GET", "/metrics")
+            connection.getresponse().read()
+            connection.close()
+            return process
+        except OSError:
+            time.sleep(0.1)
+    process.terminate()
+    raise RuntimeError(f"Le serveur {kind} ne répond pas sur le port {port}")
+
+def main() -> None:
+    arg_parser = argparse.ArgumentParser(description="Test de charge de POST /upload")
+    arg_parser.add_argument("--url", help="URL de l'endpoint (par défaut http://127.0.0.1:<port>/upload)")
+    arg_parser.add_argument("--port", type=int, default=int(os.environ.get("PORT", 3000)), help="Port de l'instance locale")
+    arg_parser.add_argument("--start", choices=("gunicorn", "flask"), help="Démarre l'instance locale avant la charge")
+    arg_parser.add_argument("--concurrency", type=int, default=4, help="Nombre de clients simultanés")
+    arg_parser.add_argument("--duration", type=float, default=20.0, help="Durée de la charge, en secondes")
+    arg_parser.add_argument("--pages", type=int, default=3, help="Pages du bon de commande synthétique")
+    arg_parser.add_argument("--pdf", help="PDF à envoyer à la place du document synthétique")
+    arg_parser.add_argument("--cache-hits", action="store_true", help="Envoie toujours le même contenu (cache de réponses)")
+    arg_parser.add_argument("--json", help="Fichier où écrire les résultats au format JSON")
+    args = arg_parser.parse_args()
+
+    if args.pdf:
+        with open(args.pdf, "rb") as f:
+            pdf_bytes = f.read()
+        filename = os.path.basename(args.pdf)
+    else:
+        pdf_bytes = make_invoice_pdf(args.pages)
+        filename = f"commande_{args.pages}.pdf"
+    payloads = PayloadFactory(pdf_bytes, filename, unique=not args.cache_hits)
+    url = args.url or f"http://127.0.0.1:{args.port}/upload"
+
+    server = start_server(args.start, args.port) if args.start else None
+    try:
+        results = run_load(url, payloads, args.concurrency, args.duration)
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    latency = results["latency_ms"]
+    print(f"{url} : {args.concurrency} clients, {results['elapsed_s']:.1f} s, statuts {results['statuses']}")
+    print(f"{results['requests_per_s']:.1f} requêtes/s ; latence p50 {latency['p50']:.1f} ms, "
+          f"p90 {latency['p90']:.1f} ms, p99 {latency['p99']:.1f} ms, max {latency['max']:.1f} ms")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({
+                "benchmark": "load_test",
+                "url": url,
+                "server": args.start,
+                "concurrency": args.concurrency,
+                "pdf_bytes": len(pdf_bytes),
+                "cache_hits": args.cache_hits,
+                "date": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                **results,
+            }, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""
+synthetic_pdf.py
+
+Générateur de bons de commande PDF synthétiques pour les benchmarks.
+
+Produit, sans dépendance externe (assemblage par pdf_builder.build_pdf), des PDF dont la
+mise en page correspond à ce qu'attend InvoiceParser :
+- entête avec numéro de commande et date de livraison ;
+- bloc OBJET ... CONTRAT N° ;
+- adresse de livraison dans la zone (20, 425, 228, 514) de la page 1 ;
+- lignes d'items numérotées suivies de leur désignation, avec dates de livraison ponctuelles ;
+- désignation reportée en haut de la page suivante pour le dernier item d'une page ;
+- pieds de page "Page n / N" et ligne "Montant total HT" sur la dernière page.
+
+Usage :
+    python benchmarks/synthetic_pdf.py 50 commande_50_pages.pdf
+
+Auteur  : Lam Clément
+Date    : 2024-06
+Licence : Usage interne VINCI Energies
+"""
+
+import os
+import random
+import sys
+from typing import List
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_DIR not in sys.path:
+    sys.path.insert(0, REPO_DIR)
+
+from pdf_builder import PAGE_HEIGHT, PAGE_WIDTH, TextLine, build_pdf  # noqa: E402,F401 (réexportés)
+
+# Ordonnée (depuis le haut) sous laquelle aucune ligne d'item n'est placée
+ITEMS_BOTTOM = 740
+
+def _fr_amount(cents: int) -> str:
+    """
+    Formate un montant en centimes au format français (1.234,56).
+    """
+    return f"{cents // 100:,}".replace(",", ".") + f",{cents % 100:02d}"
+
+def invoice_pages(n_pages: int, seed: int = 0) -> List[List[TextLine]]:
+    """
+    Génère les lignes positionnées d'un bon de commande de n_pages pages.
+
+    Args:
+        n_pages (int): Nombre de pages.
+        seed (int): Graine du générateur aléatoire (mêmes PDF d'une exécution à l'autre).
+
+    Returns:
+        list[list[TextLine]]: Lignes de chaque page.
+    """
+    rnd = random.Random(seed)
+    pages = []
+    position = 10
+    total = 0
+    for page in range(n_pages):
+        lines: List[TextLine] = []
+        top = 40
+        if page == 0:
+            lines += [
+                (40, 40, 14, "BON DE COMMANDE"),
+                (330, 70, 9, "Commande N° 4500791137/ROTI"),
+                (330, 85, 9, "Date : 02.01.2024"),
+                (330, 100, 9, "Date de livraison : 15.04.2024"),
+                (40, 160, 9, "OBJET :"),
+                (40, 175, 9, "Fourniture de matériel électrique"),
+                (40, 190, 9, "pour le chantier Tour Horizon lot 3"),
+                (40, 205, 9, "CONTRAT N° 88123"),
+                (22, 430, 8, "Adresse de livraison, lieu de"),
+                (22, 441, 8, "réception ou d'exécution :"),
+                (22, 455, 8, "VINCI ENERGIES CHANTIER"),
+                (22, 467, 8, "12 rue des Lilas"),
+                (22, 479, 8, "75012 PARIS"),
+            ]
+            top = 530
+        lines.append((40, top, 8, "Pos. Article Quantité Unité Prix unitaire Montant HT"))
+        top += 12
+        if page > 0:
+            # Désignation du dernier item de la page précédente
+            lines.append((40, top, 8, f"Produit reporté page {page + 1}"))
+            top += 16
+        while top <= ITEMS_BOTTOM:
+            quantity = rnd.randint(1, 500)
+            unit_price = rnd.randint(100, 250000)
+            amount = quantity * unit_price
+            total += amount
+            unit = rnd.choice(["PCE", "M", "KG", "UN"])
+            item_line = f"{position} {100000 + position} {quantity} {unit} {_fr_amount(unit_price)} {_fr_amount(amount)}"
+            if rnd.random() < 0.2:
+                item_line += f" 2{rnd.randint(0, 8)}.0{rnd.randint(1, 9)}.2024"
+            lines.append((40, top, 8, item_line))
+            position += 10
+            last_on_page = top + 26 > ITEMS_BOTTOM and page < n_pages - 1
+            if not last_on_page:
+                lines.append((40, top + 11, 8, f"Produit {position - 10} cable rigide {rnd.choice(['U1000', 'H07', 'R2V'])}"))
+                if rnd.random() < 0.15:
+                    lines.append((40, top + 22, 8, f"Date de livraison 1{rnd.randint(0, 9)}.05.2024"))
+                    top += 11
+            top += 26
+        if page == n_pages - 1:
+            lines.append((300, top + 10, 9, f"Montant total HT {_fr_amount(total)} EUR"))
+        lines.append((480, 810, 8, f"Page {page + 1} / {n_pages}"))
+        pages.append(lines)
+    return pages
+
+def make_invoice_pdf(n_pages: int, seed: int = 0, filler_bytes: int = 0) -> bytes:
+    """
+    Génère un bon de commande PDF synthétique.
+
+    Args:
+        n_pages (int): Nombre de pages (1 à plusieurs centaines).
+        seed (int): Graine du générateur aléatoire.
+        filler_bytes (int): Taille d'un flux binaire aléatoire ajouté au document (voir build_pdf).
+
+    Returns:
+        bytes: Contenu du PDF.
+    """
+    filler = random.Random(seed).randbytes(filler_bytes) if filler_bytes else b""
+    return build_pdf(invoice_pages(n_pages, seed), filler)
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        sys.exit("Usage : python benchmarks/synthetic_pdf.py <nombre de pages> <fichier de sortie>")
+    with open(sys.argv[2], "wb") as f:
+        f.write(make_invoice_pdf(int(sys.argv[1])))
@@ -7,6 +7,12 @@ et l'export de ces données vers un fichier Excel.
 Fonctionnalités principales :
 - Extraction des lignes d'items, des dates, des montants, de l'objet et du lieu de livraison depuis un PDF.
 - Export des résultats dans un fichier Excel structuré.
+- Mémoire bornée sur les très longues commandes : pages libérées au fil de l'analyse,
+  total HT recherché page par page, plafond de mémoire configurable.
+- Reconnaissance des mises en page connues (layout_templates) : leur plan d'extraction précompilé
+  remplace l'heuristique générique, conservée pour les documents inconnus.
+- Extraction parallèle du texte des longs documents (PARSER_PARALLEL=1) dans un pool de
+  processus partagé, textes servis dans l'ordre des pages au fil de l'analyse.
 
 Auteur  : Lam Clément
 Date    : 2024-06
@@ -14,18 +20,691 @@ Licence : Usage interne VINCI Energies
 
 Dépendances :
 - pdfplumber
-- geopy
-- pandas
-- openpyxl
+- page_layout (moteur de mise en page au niveau des mots)
+- layout_templates (modèles de mise en page des émetteurs récurrents)
+- metrics (durées par étape, pages et items par document)
+- invoice_items (InvoiceItem, ItemTable)
+- fr_numbers (normalisation des nombres, partagée avec l'API)
+- openpyxl (export Excel uniquement, importé au premier export)
+- pandas (export Excel en mode pandas uniquement, importé au premier usage)
 """
 
+import io
+import itertools
+import logging
 import os
-from typing import List, Dict, Any, Union
+import threading
+import time
+import weakref
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
+from typing import List, Dict, Any, Union, Iterator, Iterable, Callable, Hashable, Tuple, IO
 import pdfplumber
 import re
-import pandas as pd
 from datetime import datetime
 
+import metrics
+from fr_numbers import normalize_amount, normalize_column, strip_thousands
+from invoice_items import InvoiceItem, ItemTable
+from layout_templates import GENERIC_TEMPLATE, STANDARD_TEMPLATE, ExtractionPlan, PageFingerprint, TemplateRegistry
+from page_layout import PageLayout
+
+logger = logging.getLogger(__name__)
+
+def _priority_pattern(alternatives: Tuple[str, ...], flags: int = 0) -> "re.Pattern":
+    """
+    Combine des motifs classés par priorité en une seule expression parcourue en une passe.
+    Chaque motif doit contenir exactement un groupe capturant. L'alternance est placée dans
+    une assertion avant (?=...) : la recherche essaie les motifs à chaque position sans rien
+    consommer, ce qui permet à _search_by_priority de retrouver le résultat qu'aurait donné
+    une recherche motif par motif.
+
+    Args:
+        alternatives (tuple[str]): Motifs, du plus prioritaire au moins prioritaire.
+        flags (int): Options re communes.
+
+    Returns:
+        re.Pattern: Expression compilée.
+    """
+    return re.compile("(?=" + "|".join(alternatives) + ")", flags)
+
+def _search_by_priority(pattern: "re.Pattern", text: str) -> Union[Tuple[int, str], None]:
+    """
+    Retourne la première occurrence du motif le plus prioritaire d'une expression de _priority_pattern.
+
+    Args:
+        pattern (re.Pattern): Expression combinée.
+        text (str): Texte à analyser.
+
+    Returns:
+        tuple(int, str)|None: Indice du motif (à partir de 0) et texte capturé, ou None.
+    """
+    best = None
+    for match in pattern.finditer(text):
+        index = match.lastindex
+        if best is None or index < best[0]:
+            best = (index, match.group(index))
+            if index == 1:
+                break
+    if best is None:
+        return None
+    return best[0] - 1, best[1]
+
+# Registre des expressions régulières des heuristiques, compilées une seule fois au chargement
+# du module. Les variantes de dates et de montants sont fusionnées pour être lues en une passe.
+# Date jj.mm.aaaa ou jj/mm/aaaa (même séparateur des deux côtés)
+DATE_PATTERN = re.compile(r"(\d{2})([./])(\d{2})\2(\d{4})")
+# Date plus permissive recherchée autour d'un mot-clé
+CONTEXT_DATE_PATTERN = re.compile(r"\d{1,2}[\.\-/]\d{1,2}[\.\-/]\d{2,4}")
+LIVRAISON_PATTERN = re.compile(r"livraison", re.IGNORECASE)
+TOTAL_KEYWORD_PATTERN = re.compile(r"total", re.IGNORECASE)
+# Formats de montants, du plus spécifique au plus général
+AMOUNT_PATTERNS = (
+    r"(\d{1,3}(?:\.\d{3}){2,},\d{2})",
+    r"(\d{7,},\d{2})",
+    r"(\d{1,3}(?:\.\d{3})*,\d{2})",
+    r"(\d{1,6},\d{2})",
+)
+AMOUNT_PATTERN = _priority_pattern(AMOUNT_PATTERNS)
+ORDER_NUMBER_PATTERNS = (
+    r'Commande\s*N°\s*(\d+/[A-Z]+)',  # Format "4500791137/ROTI"
+    r'N°\s*commande\s*:\s*(\d+)',     # Format "N° commande : 4500791137"
+    r'Commande\s*:\s*(\d+)',          # Format "Commande : 4500791137"
+    r'N°\s*(\d{8,})'                  # Format générique (8+ chiffres)
+)
+ORDER_NUMBER_PATTERN = _priority_pattern(ORDER_NUMBER_PATTERNS, re.IGNORECASE)
+# Jetons des lignes d'items
+QUANTITY_PATTERN = re.compile(r"\d+(?:[.,]\d+)?")
+UNIT_PRICE_PATTERN = re.compile(r"\d{1,3}(?:[\.]\d{3})*,\d{2}")
+DIGIT_PATTERN = re.compile(r"\d")
+# Pied de page et ligne de total qui coupent une désignation
+PAGE_FOOTER_PATTERN = re.compile(r"^page\s+\d+\s*/\s*\d+$", re.IGNORECASE)
+MONTANT_TOTAL_HT_PATTERN = re.compile(r"montant\s+total\s+ht", re.IGNORECASE)
+# Zone du lieu de livraison en page 1 pour un document sans modèle reconnu (x0, top, x1, bottom)
+DEFAULT_DELIVERY_ZONE = (20, 425, 228, 514)
+# Entête de la zone d'adresse de livraison (même si elle est sur plusieurs lignes)
+DELIVERY_HEADER_PATTERN = re.compile(r"Adresse de livraison, lieu de\s*réception ou d'exécution\s*:", re.IGNORECASE)
+
+# Colonnes de la feuille Items de l'export Excel : clé de l'item -> titre, dans l'ordre d'export
+EXCEL_ITEM_COLUMNS = {
+    'numero_commande': 'Numéro de commande',
+    'position': 'Position',
+    'designation': 'Référence',
+    'nom_produit': 'Désignation',
+    'quantite': 'Quantité',
+    'unite': 'Unité',
+    'prix_unitaire': 'Prix unitaire',
+    'date_livraison': 'Date de livraison'
+}
+
+# Champs disponibles pour l'extraction sélective (InvoiceParser.extract_fields)
+EXTRACTABLE_FIELDS = ("numero_commande", "objet", "lieu_livraison", "total_ht", "items")
+
+# Version des règles d'extraction : elle fait partie de la clé du cache de résultats (mémoire
+# et SQLite). À incrémenter dans le même commit que toute modification du résultat produit
+# (clés, types, valeurs), sans quoi le cache sert des résultats de l'ancienne version.
+# 1.1 : clé "modele", items en ItemTable, zones via l'index des mots.
+# 1.2 : extract_fields retient le premier total HT du document, comme parse_pdf.
+# 1.3 : le total HT est la dernière ligne 'total' portant un montant du document.
+PARSER_VERSION = "1.3"
+
+# Moteur de mise en page au niveau des mots (une lecture extract_words par page) ;
+# PARSER_LAYOUT_ENGINE=0 revient à extract_text et aux découpes de zone
+LAYOUT_ENGINE = os.environ.get("PARSER_LAYOUT_ENGINE", "1") != "0"
+
+# Mode mémoire bornée (textes des pages retirés du cache dès qu'ils ne servent plus) :
+# activé automatiquement au-delà de ce nombre de pages (0 : toujours)
+BOUNDED_MEMORY_PAGES = int(os.environ.get("PARSER_BOUNDED_PAGES", 100))
+# Plafond de mémoire résidente du processus pendant une analyse, en Mo (0 : aucun)
+MEMORY_LIMIT_MB = float(os.environ.get("PARSER_MEMORY_LIMIT_MB", 0))
+
+# Nombre maximal de pages d'un document analysé (0 : aucune limite)
+MAX_PAGES = int(os.environ.get("PARSER_MAX_PAGES", 0))
+
+# Extraction parallèle du texte des pages (PARSER_PARALLEL=1), pour les documents d'au moins
+# PARSER_PARALLEL_MIN_PAGES pages : en deçà, le transfert vers le pool coûte plus qu'il ne rapporte.
+# Le pool compte PARSER_PARALLEL_WORKERS processus (0 : un par cœur) et reçoit les pages par
+# plages de PARSER_PARALLEL_CHUNK_PAGES.
+PARALLEL_PAGES = os.environ.get("PARSER_PARALLEL", "0") == "1"
+PARALLEL_MIN_PAGES = int(os.environ.get("PARSER_PARALLEL_MIN_PAGES", 20))
+PARALLEL_WORKERS = int(os.environ.get("PARSER_PARALLEL_WORKERS", 0)) or os.cpu_count() or 1
+PARALLEL_CHUNK_PAGES = int(os.environ.get("PARSER_PARALLEL_CHUNK_PAGES", 8))
+_page_pool = None
+_page_pool_lock = threading.Lock()
+
+class MemoryLimitError(MemoryError):
+    """
+    Levée quand la mémoire résidente du processus dépasse le plafond pendant une analyse.
+    """
+
+class PageLimitError(ValueError):
+    """
+    Levée à l'ouverture d'un document qui dépasse le nombre maximal de pages.
+    """
+
+class PageTextCache:
+    """
+    Cache mémoire borné (LRU) des textes extraits par pdfplumber.
+    La clé est (document, numéro de page, zone de découpe) : une page entière utilise la zone None
+    et la mise en page au niveau des mots (PageLayout) la zone "mots".
+    Partagé entre les sessions, il évite de réextraire une page déjà lue (extract_text est l'étape la plus coûteuse).
+    Son verrou est recréé dans un processus issu d'un fork (voir _reset_locks_after_fork).
+
+    Attributs :
+        max_entries (int) : Nombre maximal de textes conservés avant éviction des plus anciens.
+        hits (int) : Nombre de lectures servies par le cache.
+        misses (int) : Nombre d'extractions réellement effectuées.
+    """
+
+    # Caches du processus, dont le verrou est recréé après un fork
+    _instances: "weakref.WeakSet[PageTextCache]" = weakref.WeakSet()
+
+    def __init__(self, max_entries: int = 256):
+        """
+        Initialise un cache vide.
+
+        Args:
+            max_entries (int): Nombre maximal d'entrées conservées.
+        """
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Hashable, str]" = OrderedDict()
+        self._lock = threading.Lock()
+        PageTextCache._instances.add(self)
+
+    def get_or_extract(self, key: Hashable, extract: Callable[[], str]) -> str:
+        """
+        Retourne le texte mémorisé pour la clé, ou l'extrait et le mémorise.
+
+        Args:
+            key (Hashable): Clé (document, page, zone).
+            extract (Callable): Fonction d'extraction appelée en cas d'absence.
+
+        Returns:
+            str: Texte de la page ou de la zone.
+        """
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+        # L'extraction se fait hors du verrou pour ne pas bloquer les autres requêtes
+        text = extract()
+        self.put(key, text)
+        return text
+
+    def put(self, key: Hashable, text: str) -> None:
+        """
+        Mémorise un texte extrait ailleurs (par exemple dans un processus du pool parallèle).
+
+        Args:
+            key (Hashable): Clé (document, page, zone).
+            text (str): Texte extrait.
+        """
+        with self._lock:
+            self._entries[key] = text
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def discard_page(self, document_key: Hashable, page_number: int) -> None:
+        """
+        Retire toutes les entrées d'une page (texte, mots et zones).
+
+        Args:
+            document_key (Hashable): Identifiant du document.
+            page_number (int): Numéro de la page (à partir de 0).
+        """
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == document_key and key[1] == page_number]:
+                del self._entries[key]
+
+    def discard_document(self, document_key: Hashable) -> None:
+        """
+        Retire toutes les entrées d'un document (toutes pages et zones).
+
+        Args:
+            document_key (Hashable): Identifiant du document.
+        """
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == document_key]:
+                del self._entries[key]
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Retourne les compteurs du cache.
+
+        Returns:
+            dict: hits, misses, entries et max_entries.
+        """
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+            }
+
+    def clear(self) -> None:
+        """
+        Vide le cache et remet les compteurs à zéro.
+        """
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+def _reset_locks_after_fork() -> None:
+    """
+    Recrée le verrou des caches de textes dans un processus issu d'un fork (analyse isolée,
+    pool parallèle) : un verrou tenu par un autre thread au moment du fork ne serait jamais
+    relâché dans l'enfant. Le pool d'extraction parallèle, dont les threads de gestion
+    n'existent pas dans l'enfant, est abandonné : l'enfant en crée un au besoin.
+    """
+    global _page_pool, _page_pool_lock
+    for cache in list(PageTextCache._instances):
+        cache._lock = threading.Lock()
+    _page_pool = None
+    _page_pool_lock = threading.Lock()
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_locks_after_fork)
+
+# Cache partagé par défaut entre tous les parsers du processus
+PAGE_TEXT_CACHE = PageTextCache(int(os.environ.get("PAGE_TEXT_CACHE_SIZE", 256)))
+
+# Modèles de mise en page du processus : bon de commande standard, précédé des modèles
+# du fichier JSON désigné par PARSER_TEMPLATES (voir layout_templates)
+TEMPLATES = TemplateRegistry([STANDARD_TEMPLATE])
+if os.environ.get("PARSER_TEMPLATES"):
+    TEMPLATES.load_json(os.environ["PARSER_TEMPLATES"])
+
+# Source acceptée par le parser : chemin, contenu brut ou flux binaire déjà ouvert
+PdfSource = Union[str, os.PathLike, bytes, bytearray, memoryview, IO[bytes]]
+
+# Identifiants uniques des documents en mémoire (pas de chemin ni de date de modification)
+_memory_document_ids = itertools.count(1)
+
+def _extract_page_range(source: Union[str, bytes], start: int, stop: int) -> List[str]:
+    """
+    Extrait le texte des pages [start, stop) d'un PDF.
+    Exécutée dans un processus du pool : le document y est rouvert une fois pour toute la plage.
+
+    Args:
+        source (str|bytes): Chemin ou contenu du PDF.
+        start (int): Première page (incluse).
+        stop (int): Dernière page (exclue).
+
+    Returns:
+        list[str]: Textes des pages, dans l'ordre.
+    """
+    if isinstance(source, bytes):
+        source = io.BytesIO(source)
+    with pdfplumber.open(source) as pdf:
+        return [pdf.pages[n].extract_text() or "" for n in range(start, stop)]
+
+def get_page_pool() -> ProcessPoolExecutor:
+    """
+    Retourne le pool de processus de l'extraction parallèle, créé au premier appel et
+    partagé par toutes les analyses du processus (comme le pool de /upload/batch).
+
+    Returns:
+        ProcessPoolExecutor: Pool de PARALLEL_WORKERS processus.
+    """
+    global _page_pool
+    with _page_pool_lock:
+        if _page_pool is None:
+            _page_pool = ProcessPoolExecutor(max_workers=PARALLEL_WORKERS)
+        return _page_pool
+
+def discard_page_pool(pool: ProcessPoolExecutor) -> None:
+    """
+    Abandonne un pool cassé (processus tué : mémoire, signal...) : le prochain appel à
+    get_page_pool en crée un neuf. Sans effet si le pool a déjà été remplacé.
+
+    Args:
+        pool (ProcessPoolExecutor): Pool dont un processus s'est arrêté brutalement.
+    """
+    global _page_pool
+    with _page_pool_lock:
+        if _page_pool is pool:
+            _page_pool = None
+            logger.warning("Pool d'extraction parallèle cassé : il sera recréé")
+    pool.shutdown(wait=False, cancel_futures=True)
+
+def new_parse_result() -> Dict[str, Any]:
+    """
+    Retourne un résultat de parse_pdf vide, complété par collect_parse_event.
+
+    Returns:
+        dict: items (ItemTable vide), total_ht, numero_commande, objet, objet_lignes, lieu_livraison, modele.
+    """
+    return {
+        "items": ItemTable(),
+        "total_ht": None,
+        "numero_commande": None,
+        "objet": "",
+        "objet_lignes": [],
+        "lieu_livraison": "",
+        "modele": None,
+    }
+
+def collect_parse_event(result: Dict[str, Any], event: Dict[str, Any]) -> None:
+    """
+    Reporte un événement de iter_parse_pdf dans un résultat en cours de construction.
+    Un résultat interrompu garde ainsi l'entête et les items des pages déjà analysées.
+
+    Args:
+        result (dict): Résultat créé par new_parse_result (modifié sur place).
+        event (dict): Événement d'analyse (entete, items ou total).
+    """
+    if event["type"] == "items":
+        result["items"].extend(event["items"])
+    elif event["type"] == "entete":
+        for key in ("numero_commande", "objet", "objet_lignes", "lieu_livraison", "modele"):
+            result[key] = event[key]
+    else:
+        result["total_ht"] = event["total_ht"]
+
+class ParsingSession:
+    """
+    Session d'analyse d'un PDF : le document est ouvert une seule fois et le handle
+    pdfplumber ainsi que le texte déjà extrait de chaque page sont partagés entre
+    tous les extracteurs (objet, zone, numéro de commande, date globale, items).
+    Les textes passent par un PageTextCache : une page n'est extraite qu'une fois.
+
+    Avec le moteur de mise en page (layout=True), chaque page est lue une seule fois par
+    extract_words : texte, zones et lignes sont ensuite des requêtes sur l'index des mots
+    (voir page_layout.PageLayout), sans découpe ni nouvelle extraction.
+
+    S'utilise comme gestionnaire de contexte :
+
+        with ParsingSession(pdf_path) as session:
+            texte = session.page_text(0)
+
+    Le document peut être un chemin, des bytes, un memoryview ou un flux binaire (BytesIO...) :
+    un PDF reçu par l'API est analysé directement en mémoire, sans fichier temporaire.
+
+    Une page dont l'analyse est terminée est libérée (release_page) : pdfplumber garde sinon
+    les caractères et objets de chaque page visitée jusqu'à la fermeture du document.
+    En mode mémoire bornée, ses textes sont aussi retirés du cache.
+
+    Un document en mémoire reçoit un identifiant propre à la session : aucune autre session ne
+    pouvant relire ses textes, ils sont retirés du cache à la fermeture (close).
+
+    Attributs :
+        pdf_path (PdfSource) : Chemin ou contenu du PDF analysé.
+        pdf (pdfplumber.PDF|None) : Document ouvert (None en dehors du contexte).
+        cache (PageTextCache) : Cache des textes extraits.
+        layout (bool) : Utilise le moteur de mise en page au niveau des mots.
+        document_key (tuple|None) : Identifiant du document dans le cache.
+        bounded (bool|None) : Mode mémoire bornée (None : décidé à l'ouverture selon le nombre de pages).
+        memory_limit (int|None) : Plafond de mémoire résidente du processus, en octets.
+        max_pages (int) : Nombre maximal de pages accepté (0 : aucune limite).
+    """
+
+    def __init__(self, pdf_path: PdfSource, cache: PageTextCache = None, layout: bool = None,
+                 bounded: bool = None, memory_limit_mb: float = None, max_pages: int = None):
+        """
+        Prépare la session sans ouvrir le document.
+
+        Args:
+            pdf_path (PdfSource): Chemin du fichier PDF ou contenu en mémoire.
+            cache (PageTextCache, optional): Cache de textes (cache partagé par défaut).
+            layout (bool, optional): Moteur de mise en page (LAYOUT_ENGINE par défaut).
+            bounded (bool, optional): Mode mémoire bornée (par défaut au-delà de BOUNDED_MEMORY_PAGES pages).
+            memory_limit_mb (float, optional): Plafond de mémoire en Mo (MEMORY_LIMIT_MB par défaut, 0 : aucun).
+            max_pages (int, optional): Nombre maximal de pages (MAX_PAGES par défaut, 0 : aucune limite).
+        """
+        self.pdf_path = pdf_path
+        self.pdf = None
+        self.cache = cache if cache is not None else PAGE_TEXT_CACHE
+        self.layout = LAYOUT_ENGINE if layout is None else layout
+        self.document_key = None
+        self.bounded = bounded
+        limit_mb = MEMORY_LIMIT_MB if memory_limit_mb is None else memory_limit_mb
+        self.memory_limit = int(limit_mb * 1024 * 1024) if limit_mb > 0 else None
+        self.max_pages = MAX_PAGES if max_pages is None else max_pages
+
+    def __enter__(self) -> "ParsingSession":
+        source = self.pdf_path
+        if isinstance(source, (str, os.PathLike)):
+            # La date de modification et la taille invalident le cache si le fichier est remplacé
+            stat = os.stat(source)
+            self.document_key = (os.path.abspath(source), stat.st_mtime_ns, stat.st_size)
+        else:
+            if isinstance(source, (bytes, bytearray, memoryview)):
+                source = io.BytesIO(source)
+            self.document_key = ("memoire", next(_memory_document_ids))
+        with metrics.time_stage("ouverture_pdf"):
+            self.pdf = pdfplumber.open(source)
+        if self.max_pages and self.page_count > self.max_pages:
+            page_count = self.page_count
+            self.close()
+            raise PageLimitError(f"Document trop long : {page_count} pages (limite {self.max_pages})")
+        if self.bounded is None:
+            self.bounded = self.page_count > BOUNDED_MEMORY_PAGES
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """
+        Ferme le document. Les textes d'un fichier restent disponibles dans le cache ;
+        ceux d'un document en mémoire en sont retirés.
+        """
+        if self.pdf is not None:
+            self.pdf.close()
+            self.pdf = None
+        if self.document_key is not None and self.document_key[0] == "memoire":
+            self.cache.discard_document(self.document_key)
+
+    @property
+    def page_count(self) -> int:
+        """
+        Nombre de pages du document ouvert.
+        """
+        return len(self.pdf.pages)
+
+    def page_text(self, page_number: int) -> str:
+        """
+        Retourne le texte d'une page, extrait une seule fois pour toute la session.
+
+        Args:
+            page_number (int): Numéro de la page (à partir de 0).
+
+        Returns:
+            str: Texte de la page ("" si la page ne contient pas de texte).
+        """
+        if self.layout:
+            return self.page_layout(page_number).text
+        return self.cache.get_or_extract(
+            (self.document_key, page_number, None),
+            lambda: self._timed_extract(lambda: self.pdf.pages[page_number].extract_text() or ""),
+        )
+
+    def page_layout(self, page_number: int) -> PageLayout:
+        """
+        Retourne la mise en page d'une page (mots et index spatial), lue une seule fois.
+
+        Args:
+            page_number (int): Numéro de la page (à partir de 0).
+
+        Returns:
+            PageLayout: Mise en page de la page.
+        """
+        return self.cache.get_or_extract(
+            (self.document_key, page_number, "mots"),
+            lambda: self._timed_extract(lambda: PageLayout.from_page(self.pdf.pages[page_number])),
+        )
+
+    def release_page(self, page_number: int) -> None:
+        """
+        Libère les objets pdfplumber d'une page déjà analysée (caractères, objets, mise en page).
+        En mode mémoire bornée, ses textes sont aussi retirés du cache. Une lecture ultérieure
+        de la page reste possible : elle est simplement réextraite.
+
+        Args:
+            page_number (int): Numéro de la page (à partir de 0).
+        """
+        if self.pdf is None or not 0 <= page_number < len(self.pdf.pages):
+            return
+        self.pdf.pages[page_number].close()
+        if self.bounded:
+            self.cache.discard_page(self.document_key, page_number)
+
+    def check_memory(self) -> None:
+        """
+        Vérifie que la mémoire résidente du processus reste sous le plafond de la session.
+        Le plafond porte sur tout le processus : les analyses simultanées d'un même worker comptent.
+
+        Raises:
+            MemoryLimitError: Si le plafond est dépassé.
+        """
+        if self.memory_limit is None:
+            return
+        rss = metrics.process_rss_bytes()
+        if rss > self.memory_limit:
+            metrics.ERRORS.inc(source="memoire")
+            raise MemoryLimitError(f"Plafond mémoire dépassé : {rss / 1048576:.0f} Mo utilisés "
+                                   f"(limite {self.memory_limit / 1048576:.0f} Mo)")
+
+    def _timed_extract(self, extract: Callable[[], Any]) -> Any:
+        """
+        Exécute une extraction pdfplumber en mesurant sa durée (étape extraction_texte).
+        """
+        with metrics.time_stage("extraction_texte"):
+            return extract()
+
+    def parallel_page_texts(self, workers: int = None) -> "ParallelPageTexts":
+        """
+        Prépare l'extraction parallèle du texte des pages 2 et suivantes dans le pool partagé.
+        La page 1, dont l'entête et les zones sont lues par la session, n'est pas envoyée au pool.
+
+        Args:
+            workers (int, optional): Nombre de plages extraites simultanément (PARALLEL_WORKERS par défaut).
+
+        Returns:
+            ParallelPageTexts: Textes servis dans l'ordre des pages (à fermer après usage).
+        """
+        source = self.pdf_path
+        if isinstance(source, os.PathLike):
+            source = os.fspath(source)
+        elif not isinstance(source, str):
+            # Les processus ne partagent pas le flux : on leur transmet le contenu brut
+            if hasattr(source, "getvalue"):
+                source = source.getvalue()
+            elif hasattr(source, "read"):
+                source.seek(0)
+                source = source.read()
+            else:
+                source = bytes(source)
+        return ParallelPageTexts(self, source, workers or PARALLEL_WORKERS)
+
+    def zone_text(self, page_number: int, x0: float, top: float, x1: float, bottom: float) -> str:
+        """
+        Retourne le texte d'une zone rectangulaire d'une page du document ouvert.
+
+        Args:
+            page_number (int): Numéro de la page.
+            x0, top, x1, bottom (float): Coordonnées de la zone.
+
+        Returns:
+            str: Texte de la zone ("" si vide).
+        """
+        if self.layout:
+            # Requête sur l'index des mots : la page n'est ni découpée ni réextraite
+            return self.page_layout(page_number).zone_text(x0, top, x1, bottom)
+        bbox: Tuple[float, float, float, float] = (x0, top, x1, bottom)
+        return self.cache.get_or_extract(
+            (self.document_key, page_number, bbox),
+            lambda: self._timed_extract(lambda: self.pdf.pages[page_number].crop(bbox).extract_text() or ""),
+        )
+
+class ParallelPageTexts:
+    """
+    Textes des pages d'un document extraits par le pool partagé, servis dans l'ordre des pages.
+    Les pages sont envoyées par plages de PARALLEL_CHUNK_PAGES, au plus 2 × workers plages en
+    avance sur la lecture : seuls les textes de ces plages sont en mémoire, et un texte est
+    oublié dès que sa page est libérée (release). Si le pool casse (processus tué), il est
+    abandonné et les pages restantes sont lues par la session, sans interrompre l'analyse.
+
+    S'appelle comme une fonction : texts(n) retourne le texte de la page n (à partir de 0).
+
+    Attributs :
+        session (ParsingSession) : Session du document (page 1 lue par la session).
+        page_count (int) : Nombre de pages du document.
+    """
+
+    def __init__(self, session: ParsingSession, source: Union[str, bytes], workers: int):
+        """
+        Args:
+            session (ParsingSession): Session ouverte sur le document.
+            source (str|bytes): Chemin ou contenu du PDF, transmis aux processus du pool.
+            workers (int): Nombre de plages extraites simultanément.
+        """
+        self.session = session
+        self.page_count = session.page_count
+        self._source = source
+        self._window = max(1, 2 * workers)
+        self._pool = get_page_pool()
+        self._pending: deque = deque()
+        self._next_start = 1
+        self._texts: Dict[int, str] = {}
+
+    def __call__(self, page_number: int) -> str:
+        if page_number == 0:
+            return self.session.page_text(0)
+        while page_number not in self._texts:
+            if self._pool is None:
+                # Pool cassé : les pages restantes sont lues par la session
+                return self.session.page_text(page_number)
+            self._submit()
+            if not self._pending:
+                raise IndexError(f"Page {page_number} absente du document ({self.page_count} pages)")
+            start, future = self._pending.popleft()
+            try:
+                with metrics.time_stage("extraction_texte"):
+                    texts = future.result()
+            except BrokenProcessPool:
+                discard_page_pool(self._pool)
+                self._pool = None
+                self.close()
+                continue
+            for offset, text in enumerate(texts):
+                self._texts[start + offset] = text
+        return self._texts[page_number]
+
+    def _submit(self) -> None:
+        """
+        Envoie au pool les plages suivantes, jusqu'à remplir la fenêtre d'avance.
+        """
+        while len(self._pending) < self._window and self._next_start < self.page_count:
+            stop = min(self._next_start + PARALLEL_CHUNK_PAGES, self.page_count)
+            self._pending.append((self._next_start, self._pool.submit(_extract_page_range, self._source,
+                                                                      self._next_start, stop)))
+            self._next_start = stop
+
+    def release(self, page_number: int) -> None:
+        """
+        Oublie le texte d'une page dont l'analyse est terminée.
+        """
+        self._texts.pop(page_number, None)
+
+    def close(self) -> None:
+        """
+        Annule les plages pas encore commencées (analyse interrompue) et oublie les textes.
+        """
+        for _, future in self._pending:
+            future.cancel()
+        self._pending.clear()
+        self._texts.clear()
+
 class InvoiceParser:
     """
     Permet d'extraire les informations structurées d'une facture PDF (items, objet, lieu, etc.)
@@ -34,16 +713,98 @@ class InvoiceParser:
     Attributs :
         global_delivery_date (str|None) : Date de livraison globale trouvée dans le PDF.
         last_result (dict|None) : Dernier résultat d'extraction.
-        pdf_path (str|None) : Chemin du PDF en cours de traitement.
+        pdf_path (PdfSource|None) : Chemin ou contenu du PDF en cours de traitement.
+        page_cache (PageTextCache) : Cache des textes de pages utilisé par toutes les méthodes.
+        result_cache (ResultCache|None) : Cache des résultats de parse_pdf, indexé par le contenu du PDF.
+        layout (bool) : Utilise le moteur de mise en page au niveau des mots (voir ParsingSession).
+        templates (TemplateRegistry) : Modèles de mise en page reconnus.
+        template (LayoutTemplate|None) : Modèle du dernier document analysé (None : heuristique générique).
+        bounded_memory (bool|None) : Mode mémoire bornée (None : selon le nombre de pages, voir ParsingSession).
+        memory_limit_mb (float|None) : Plafond de mémoire du processus pendant une analyse, en Mo.
+        max_pages (int|None) : Nombre maximal de pages d'un document (MAX_PAGES par défaut).
     """
 
-    def __init__(self):
+    def __init__(self, page_cache: PageTextCache = None, result_cache=None, layout: bool = None,
+                 templates: TemplateRegistry = None, bounded_memory: bool = None, memory_limit_mb: float = None,
+                 max_pages: int = None):
         """
         Initialise le parser.
+
+        Args:
+            page_cache (PageTextCache, optional): Cache de textes (cache partagé du processus par défaut).
+            result_cache (result_cache.ResultCache, optional): Cache de résultats consulté avant toute analyse.
+            layout (bool, optional): Moteur de mise en page au niveau des mots (LAYOUT_ENGINE par défaut).
+            templates (TemplateRegistry, optional): Modèles de mise en page (registre TEMPLATES par défaut).
+            bounded_memory (bool, optional): Force ou désactive le mode mémoire bornée.
+            memory_limit_mb (float, optional): Plafond de mémoire en Mo (MEMORY_LIMIT_MB par défaut).
+            max_pages (int, optional): Nombre maximal de pages (MAX_PAGES par défaut, 0 : aucune limite).
         """
         self.global_delivery_date = None
         self.last_result = None
         self.pdf_path = None
+        self.page_cache = page_cache if page_cache is not None else PAGE_TEXT_CACHE
+        self.result_cache = result_cache
+        self.layout = LAYOUT_ENGINE if layout is None else layout
+        self.templates = templates if templates is not None else TEMPLATES
+        self.template = None
+        self.bounded_memory = bounded_memory
+        self.memory_limit_mb = memory_limit_mb
+        self.max_pages = max_pages
+
+    @contextmanager
+    def _open_session(self, pdf_path: PdfSource, session: ParsingSession = None) -> Iterator[ParsingSession]:
+        """
+        Réutilise la session fournie ou, à défaut, ouvre le PDF le temps de l'appel.
+
+        Args:
+            pdf_path (PdfSource): Chemin ou contenu du PDF.
+            session (ParsingSession, optional): Session déjà ouverte.
+
+        Yields:
+            ParsingSession: Session à utiliser pour l'extraction.
+        """
+        if session is not None:
+            yield session
+            return
+        with self._new_session(pdf_path) as own_session:
+            yield own_session
+
+    def _new_session(self, pdf_path: PdfSource) -> ParsingSession:
+        """
+        Crée une session avec les réglages du parser (cache, moteur de mise en page, mémoire).
+        """
+        return ParsingSession(pdf_path, cache=self.page_cache, layout=self.layout,
+                              bounded=self.bounded_memory, memory_limit_mb=self.memory_limit_mb,
+                              max_pages=self.max_pages)
+
+    def _detect_template(self, session: ParsingSession, first_page_text: str) -> Union[ExtractionPlan, None]:
+        """
+        Cherche le modèle de mise en page du document à partir de sa première page, déjà extraite.
+        Le modèle trouvé est mémorisé dans self.template.
+
+        Args:
+            session (ParsingSession): Session ouverte sur le document.
+            first_page_text (str): Texte de la page 1.
+
+        Returns:
+            ExtractionPlan|None: Plan d'extraction du modèle, None pour un document inconnu.
+        """
+        with metrics.time_stage("detection_modele"):
+            fingerprint = PageFingerprint.from_page(session.pdf.pages[0], first_page_text)
+            self.template = self.templates.detect(fingerprint)
+        logger.debug("Modèle de mise en page : %s", self.template.name if self.template else GENERIC_TEMPLATE)
+        return self.template.plan if self.template else None
+
+    def _record_template_time(self, seconds: float) -> None:
+        """
+        Enregistre la durée d'analyse du document pour son modèle (statistiques du registre et /metrics).
+
+        Args:
+            seconds (float): Durée de l'analyse, en secondes.
+        """
+        name = self.template.name if self.template else GENERIC_TEMPLATE
+        self.templates.record(name, seconds)
+        metrics.TEMPLATE_SECONDS.observe(seconds, template=name)
 
     def _is_valid_date(self, day: str, month: str, year: str) -> bool:
         """
@@ -86,14 +847,14 @@ class InvoiceParser:
         Returns:
             str|None: Date trouvée ou None.
         """
-        dates = []
-        for match in re.finditer(r"(\d{2})\.(\d{2})\.(\d{4})", text):
-            if self._is_valid_date(match.group(1), match.group(2), match.group(3)):
-                dates.append((match.group(0), match.start()))
-        if not dates:
-            for match in re.finditer(r"(\d{2})/(\d{2})/(\d{4})", text):
-                if self._is_valid_date(match.group(1), match.group(2), match.group(3)):
-                    dates.append((match.group(0), match.start()))
+        # Une seule passe pour les deux séparateurs ; les dates à points restent prioritaires
+        dotted_dates = []
+        slash_dates = []
+        for match in DATE_PATTERN.finditer(text):
+            if self._is_valid_date(match.group(1), match.group(3), match.group(4)):
+                target = dotted_dates if match.group(2) == "." else slash_dates
+                target.append((match.group(0), match.start()))
+        dates = dotted_dates or slash_dates
         if dates:
             if pos is not None:
                 # Prend la date la plus proche de la position donnée (utile pour "livraison")
@@ -123,18 +884,19 @@ class InvoiceParser:
         Returns:
             str|None: Date trouvée ou None.
         """
-        liv = re.search(r"livraison", text, re.IGNORECASE)
+        liv = LIVRAISON_PATTERN.search(text)
         if liv:
             pos = liv.start()
             if date := self._extract_date_from_text(text, pos):
-                print(f"Date valide trouvée : {date}")
+                logger.debug("Date valide trouvée : %s", date)
                 return date
-        print("Aucune date valide trouvée près du mot 'livraison'")
+        logger.debug("Aucune date valide trouvée près du mot 'livraison'")
         return None
 
     def _extract_total(self, text: str) -> Union[str, None]:
         """
-        Recherche la ligne contenant 'total' et retourne le montant au format français.
+        Recherche la dernière ligne contenant 'total' et portant un montant, et retourne ce
+        montant au format français (le total HT suit les éventuels sous-totaux).
 
         Args:
             text (str): Texte à analyser.
@@ -142,23 +904,32 @@ class InvoiceParser:
         Returns:
             str|None: Montant trouvé ou None.
         """
-        for line in text.splitlines():
-            if re.search(r"total", line, re.IGNORECASE):
-                # Plusieurs patterns pour gérer les différents formats de montants
-                patterns = [
-                    r"(\d{1,3}(?:\.\d{3}){2,},\d{2})",
-                    r"(\d{7,},\d{2})",
-                    r"(\d{1,3}(?:\.\d{3})*,\d{2})",
-                    r"(\d{1,6},\d{2})",
-                ]
-                for pattern in patterns:
-                    m = re.search(pattern, line)
-                    if m:
-                        total = m.group(1)
-                        print(f"Total trouvé avec pattern '{pattern}': {total}")
-                        return total
+        for line in reversed(text.splitlines()):
+            if TOTAL_KEYWORD_PATTERN.search(line):
+                # Plusieurs formats de montants, testés en une passe par ordre de priorité
+                found = _search_by_priority(AMOUNT_PATTERN, line)
+                if found:
+                    index, total = found
+                    logger.debug("Total trouvé avec le motif '%s' : %s", AMOUNT_PATTERNS[index], total)
+                    return total
         return None
 
+    def _update_total(self, total_ht: Union[str, None], text: str) -> Union[str, None]:
+        """
+        Règle de sélection du total HT, commune à parse_pdf, iter_parse_pdf et extract_fields :
+        la dernière ligne 'total' portant un montant du document est retenue. Appelée page par
+        page dans l'ordre, le total d'une page remplace celui des pages précédentes.
+
+        Args:
+            total_ht (str|None): Total trouvé sur les pages précédentes.
+            text (str): Texte de la page suivante.
+
+        Returns:
+            str|None: Total de la page s'il en porte un, sinon total_ht.
+        """
+        page_total = self._extract_total(text) if text else None
+        return page_total if page_total is not None else total_ht
+
     def _extract_date_from_context(self, text: str, start_pos: int, window: int = 200) -> Union[str, None]:
         """
         Recherche une date dans une fenêtre de texte autour d'une position donnée.
@@ -175,112 +946,192 @@ class InvoiceParser:
         start = max(0, start_pos - window)
         end = min(len(text), start_pos + window)
         search_text = text[start:end]
-        dates = list(re.finditer(r"\d{1,2}[\.\-/]\d{1,2}[\.\-/]\d{2,4}", search_text))
+        dates = list(CONTEXT_DATE_PATTERN.finditer(search_text))
         if dates:
             return min(dates, key=lambda m: abs(m.start() + start - start_pos)).group(0)
         return None
 
+    def _find_product_name_after_montant_ht(self, text: str) -> Union[str, None]:
+        """
+        Cherche le nom du produit après 'Montant HT' dans le texte donné.
+        Utile pour les cas où la désignation est sur la page suivante.
+
+        Args:
+            text (str): Texte de la page suivante.
+
+        Returns:
+            str|None: Première ligne non numérique après l'entête 'Montant HT', ou None.
+        """
+        if not text:
+            return None
+        lines = text.splitlines()
+        for i, line in enumerate(lines):
+            if "Montant HT" in line:
+                # Les entêtes suivants ne donneraient pas d'autre candidat : une seule lecture suffit
+                for next_line in lines[i+1:]:
+                    if next_line.strip() and not next_line.split()[0].isdigit():
+                        return next_line.strip()
+                return None
+        return None
+
     def _heuristic_parse(self, text: str, next_page_text: str = None) -> List[Dict[str, Any]]:
         """
         Extraction ligne-à-ligne des items par heuristique (regex/keywords).
         Permet de récupérer les lignes d'items même si la structure du PDF varie.
 
+        Chaque ligne est découpée et classée une seule fois (entête d'item, désignation,
+        pied de page, mention 'livraison') : le coût est linéaire en nombre de lignes.
+
         Args:
             text (str): Texte de la page.
             next_page_text (str, optional): Texte de la page suivante (pour certains cas multi-pages).
 
         Returns:
-            list[dict]: Liste d'items extraits.
+            list[InvoiceItem]: Liste d'items extraits.
         """
         results = []
         lines = [l.strip() for l in text.splitlines() if l.strip()]
+        line_count = len(lines)
+        # Passe de classement : jetons et position du mot 'livraison' de chaque ligne
+        tokens = [line.split() for line in lines]
+        livraison_offsets = []
+        for line in lines:
+            liv_match = LIVRAISON_PATTERN.search(line)
+            livraison_offsets.append(liv_match.start() if liv_match else -1)
+        # Désignation reportée sur la page suivante : calculée au plus une fois par page
+        carried_name = None
+        carried_name_done = False
         current = None
-        page_pattern = re.compile(r"^page\s+\d+\s*/\s*\d+$", re.IGNORECASE)
-        montant_total_pattern = re.compile(r"montant\s+total\s+ht", re.IGNORECASE)
-
-        def find_product_name_after_montant_ht(text: str) -> Union[str, None]:
-            """
-            Cherche le nom du produit après 'Montant HT' dans le texte donné.
-            Utile pour les cas où la désignation est sur la page suivante.
-            """
-            if not text:
-                return None
-            lines = text.splitlines()
-            for i, line in enumerate(lines):
-                if "Montant HT" in line:
-                    for next_line in lines[i+1:]:
-                        if next_line.strip() and not (next_line.split() + [None, None])[:2][0].isdigit():
-                            return next_line.strip()
-            return None
 
-        for i, line in enumerate(lines):
-            parts = line.split()
+        for i in range(line_count):
+            parts = tokens[i]
             # On considère une ligne d'item si les deux premiers tokens sont numériques
-            if len(parts) >= 2 and parts[0].isdigit() and parts[1].isdigit():
-                if current:
-                    results.append(current)
-                current = {
-                    "position": parts[0],
-                    "designation": parts[1],
-                    "nom_produit": None,
-                    "quantite": None,
-                    "unite": None,
-                    "prix_unitaire": None,
-                    "date_livraison": None
-                }
-                # On tente d'extraire la date de livraison sur la même ligne
-                date_in_line = self._extract_date_from_line(line)
-                if date_in_line:
-                    current["date_livraison"] = date_in_line
+            if not (len(parts) >= 2 and parts[0].isdigit() and parts[1].isdigit()):
+                continue
+            if current:
+                results.append(current)
+            current = InvoiceItem(position=parts[0], designation=parts[1])
+            # On tente d'extraire la date de livraison sur la même ligne
+            date_in_line = self._extract_date_from_line(lines[i])
+            if date_in_line:
+                current.date_livraison = date_in_line
+            else:
                 # Sinon, on cherche une date proche du mot "livraison" dans les lignes suivantes
-                if not current["date_livraison"]:
-                    context = "\n".join(lines[i:min(i+5, len(lines))])
-                    liv_match = re.search(r"livraison", context, re.IGNORECASE)
-                    if liv_match:
-                        date = self._extract_date_from_context(context, liv_match.start())
+                # (contexte de 5 lignes à partir de l'item, position connue grâce au classement)
+                context_end = min(i + 5, line_count)
+                offset = 0
+                for k in range(i, context_end):
+                    if livraison_offsets[k] >= 0:
+                        context = "\n".join(lines[i:context_end])
+                        date = self._extract_date_from_context(context, offset + livraison_offsets[k])
                         if date:
-                            current["date_livraison"] = date
-                # Extraction de la quantité, unité et prix unitaire
-                for j, tok in enumerate(parts[2:], start=2):
-                    if not current["quantite"] and re.fullmatch(r"\d+(?:[.,]\d+)?", tok):
-                        if j + 1 < len(parts) and not re.search(r"\d", parts[j+1]):
-                            current["quantite"] = tok
-                            current["unite"] = parts[j+1]
-                            # Le prix unitaire suit généralement l'unité
-                            if j + 2 < len(parts) and re.fullmatch(r"\d{1,3}(?:[\.]\d{3})*,\d{2}", parts[j+2]):
-                                current["prix_unitaire"] = parts[j+2]
-                # Gestion du nom du produit (ligne suivante ou page suivante)
-                if i + 1 < len(lines):
-                    next_line = lines[i + 1].strip()
-                    if page_pattern.match(next_line) or montant_total_pattern.search(next_line):
-                        # Cas où la désignation est sur la page suivante
-                        if next_page_text:
-                            product_name = find_product_name_after_montant_ht(next_page_text)
-                            if product_name:
-                                current["nom_produit"] = product_name
-                    else:
-                        # Cas classique : la ligne suivante contient la désignation
-                        if not (next_line.split() + [None, None])[:2][0].isdigit():
-                            current["nom_produit"] = next_line
+                            current.date_livraison = date
+                        break
+                    offset += len(lines[k]) + 1
+            # Extraction de la quantité, unité et prix unitaire : premier nombre suivi d'un jeton sans chiffre
+            for j in range(2, len(parts) - 1):
+                if QUANTITY_PATTERN.fullmatch(parts[j]) and not DIGIT_PATTERN.search(parts[j+1]):
+                    current.quantite = parts[j]
+                    current.unite = parts[j+1]
+                    # Le prix unitaire suit généralement l'unité
+                    if j + 2 < len(parts) and UNIT_PRICE_PATTERN.fullmatch(parts[j+2]):
+                        current.prix_unitaire = parts[j+2]
+                    break
+            # Gestion du nom du produit (ligne suivante ou page suivante)
+            if i + 1 < line_count:
+                next_line = lines[i + 1]
+                if PAGE_FOOTER_PATTERN.match(next_line) or MONTANT_TOTAL_HT_PATTERN.search(next_line):
+                    # Cas où la désignation est sur la page suivante
+                    if next_page_text:
+                        if not carried_name_done:
+                            carried_name = self._find_product_name_after_montant_ht(next_page_text)
+                            carried_name_done = True
+                        if carried_name:
+                            current.nom_produit = carried_name
+                elif not tokens[i + 1][0].isdigit():
+                    # Cas classique : la ligne suivante contient la désignation
+                    current.nom_produit = next_line
         if current:
             results.append(current)
         return results
 
-    def _merge_items(self, a: List[Dict[str, Any]], b: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    def _column_parse(self, layout: PageLayout, plan: ExtractionPlan, next_page_text: str = None) -> List[InvoiceItem]:
+        """
+        Extraction des items d'une page selon les colonnes d'un modèle connu : chaque mot est
+        rangé dans la colonne qui contient son centre, sans deviner la structure de la ligne.
+        Une ligne d'item a une position et une désignation numériques ; la ligne suivante,
+        si elle ne commence pas par un nombre, donne le nom du produit.
+
+        Args:
+            layout (PageLayout): Mise en page de la page.
+            plan (ExtractionPlan): Plan d'extraction (colonnes renseignées).
+            next_page_text (str, optional): Texte de la page suivante (désignation reportée).
+
+        Returns:
+            list[InvoiceItem]: Liste d'items extraits.
+        """
+        results = []
+        line_texts = [line.strip() for line in layout.line_texts]
+        rows = []
+        for line in layout.lines:
+            cells: Dict[str, str] = {}
+            for word in line:
+                field = plan.column_of(word[1], word[3])
+                if field is not None:
+                    cells[field] = f"{cells[field]} {word[0]}" if field in cells else word[0]
+            rows.append(cells)
+        is_item_row = [cells.get("position", "").isdigit() and cells.get("designation", "").isdigit()
+                       for cells in rows]
+        line_count = len(rows)
+        carried_name = None
+        carried_name_done = False
+
+        for i, cells in enumerate(rows):
+            if not is_item_row[i]:
+                continue
+            item = InvoiceItem(position=cells["position"], designation=cells["designation"],
+                               quantite=cells.get("quantite"), unite=cells.get("unite"),
+                               prix_unitaire=cells.get("prix_unitaire"))
+            item.date_livraison = cells.get("date_livraison") or self._extract_date_from_line(line_texts[i])
+            if not item.date_livraison:
+                # Date annoncée par 'livraison' dans les lignes de l'item (jusqu'à l'item suivant)
+                for k in range(i + 1, min(i + 5, line_count)):
+                    if is_item_row[k]:
+                        break
+                    if LIVRAISON_PATTERN.search(line_texts[k]):
+                        item.date_livraison = self._extract_date_from_line(line_texts[k])
+                        break
+            # Gestion du nom du produit (ligne suivante ou page suivante), comme _heuristic_parse
+            if i + 1 < line_count:
+                next_line = line_texts[i + 1]
+                if PAGE_FOOTER_PATTERN.match(next_line) or MONTANT_TOTAL_HT_PATTERN.search(next_line):
+                    # Désignation reportée sur la page suivante
+                    if next_page_text:
+                        if not carried_name_done:
+                            carried_name = self._find_product_name_after_montant_ht(next_page_text)
+                            carried_name_done = True
+                        if carried_name:
+                            item.nom_produit = carried_name
+                elif next_line and not next_line.split()[0].isdigit():
+                    item.nom_produit = next_line
+            results.append(item)
+        return results
+
+    def _merge_items(self, a: List[InvoiceItem], b: List[InvoiceItem]) -> List[InvoiceItem]:
         """
         Fusionne deux listes d'items selon la clé 'position'.
         Prend les valeurs non nulles de la première liste si absentes dans la seconde.
 
         Args:
-            a (list[dict]): Première liste d'items.
-            b (list[dict]): Deuxième liste d'items.
+            a (list[InvoiceItem|dict]): Première liste d'items.
+            b (list[InvoiceItem|dict]): Deuxième liste d'items.
 
         Returns:
-            list[dict]: Liste fusionnée.
+            list[InvoiceItem]: Liste fusionnée.
         """
-        merged: Dict[str, Dict[str, Any]] = {}
+        merged: Dict[str, InvoiceItem] = {}
         for it in b:
-            merged[it['position']] = {**it}
+            merged[it['position']] = it.copy() if isinstance(it, InvoiceItem) else InvoiceItem.from_mapping(it)
         for it in a:
             pos = it.get('position')
             if not pos:
@@ -293,75 +1144,241 @@ class InvoiceParser:
                 merged[pos] = it
         return [merged[k] for k in sorted(merged, key=lambda x: int(x))]
 
-    def parse_pdf(self, pdf_path: str) -> Dict[str, Any]:
+    def parse_pdf(self, pdf_path: PdfSource, parallel: bool = None, workers: int = None) -> Dict[str, Any]:
         """
         Traite un PDF page par page et extrait les informations structurées.
+        Le document n'est ouvert qu'une fois : tous les extracteurs partagent la même session.
+
+        En mode parallèle (pour les longues commandes), le texte des pages 2 et suivantes est
+        extrait dans le pool de processus partagé, en avance sur l'analyse, puis l'heuristique est
+        appliquée à chaque couple (page, page suivante) : la liste d'items obtenue est identique
+        au mode séquentiel.
 
         Args:
-            pdf_path (str): Chemin du fichier PDF.
+            pdf_path (PdfSource): Chemin du fichier PDF, ou contenu en mémoire (bytes, BytesIO, memoryview).
+            parallel (bool, optional): Active l'extraction parallèle du texte des pages (par défaut :
+                PARSER_PARALLEL, pour les documents d'au moins PARALLEL_MIN_PAGES pages).
+            workers (int, optional): Nombre de plages extraites simultanément (PARALLEL_WORKERS par défaut).
 
         Returns:
-            dict: Résultat contenant items, total_ht, numero_commande, objet, lieu_livraison.
-        """
-        all_items: List[Dict[str, Any]] = []
-        all_texts: List[str] = []
-        with pdfplumber.open(pdf_path) as pdf:
-            first_page_text = pdf.pages[0].extract_text()
-            self.global_delivery_date = self._extract_global_date(first_page_text)
-            print(f"Date de livraison globale trouvée: {self.global_delivery_date}")
-            numero_commande = self._extract_order_number(first_page_text)
-            objet = self.find_objet(pdf_path)
-            lieu_livraison = self.find_lieux_livraison(pdf_path)
-            for page_num, page in enumerate(pdf.pages, 1):
-                print(f"Traitement de la page {page_num}...")
-                text = page.extract_text()
-                if text:
-                    all_texts.append(text)
-                try:
-                    next_page_text = pdf.pages[page_num].extract_text() if page_num < len(pdf.pages) else None
-                    page_items = self._heuristic_parse(text, next_page_text)
-                    print(f"Heuristique a trouvé {len(page_items)} items sur la page {page_num}")
-                    for item in page_items:
-                        if not item.get('date_livraison'):
-                            item['date_livraison'] = self.global_delivery_date
-                    all_items.extend(page_items)
-                    print(f"Total: {len(page_items)} items trouvés sur la page {page_num}\n")
-                except Exception as e:
-                    print(f"Erreur lors du traitement de la page {page_num}: {str(e)}")
-                    continue
-        total_text = "\n".join(all_texts)
-        total_ht = self._extract_total(total_text)
-        result = {
-            "items": all_items,
-            "total_ht": total_ht,
-            "numero_commande": numero_commande,
-            "objet": objet,
-            "lieu_livraison": lieu_livraison,
-        }
+            dict: Résultat contenant items (ItemTable), total_ht, numero_commande, objet, objet_lignes,
+                lieu_livraison et modele (modèle de mise en page reconnu).
+        """
+        self.pdf_path = pdf_path
+        cache_key = None
+        if self.result_cache is not None:
+            # Un PDF déjà analysé (même contenu, même version) est servi sans être rouvert
+            cache_key = self.result_cache.key_for(pdf_path, "parse_pdf")
+            cached = self.result_cache.get(cache_key)
+            if cached is not None:
+                # Le cache conserve les items en JSON : même type de résultat qu'après une analyse
+                cached["items"] = ItemTable(cached["items"])
+                self.last_result = cached
+                return cached
+        result = new_parse_result()
+        for event in self.iter_parse_pdf(pdf_path, parallel=parallel, workers=workers):
+            collect_parse_event(result, event)
+        if cache_key is not None:
+            self.result_cache.set(cache_key, result)
         self.last_result = result
         return result
 
-    def _extract_order_number(self, text: str) -> Union[str, None]:
+    def iter_parse_pdf(self, pdf_path: PdfSource, parallel: bool = None, workers: int = None) -> Iterator[Dict[str, Any]]:
+        """
+        Version générateur de parse_pdf : les informations sont produites dès qu'elles sont connues,
+        ce qui permet de les transmettre au client au fil de l'analyse.
+
+        Événements produits, dans l'ordre :
+            - {"type": "entete", "numero_commande", "objet", "objet_lignes", "lieu_livraison", "modele"}
+              (page 1 seulement ; modele : nom du modèle de mise en page reconnu, ou "generique")
+            - {"type": "items", "page": n, "items": [...]} pour chaque page analysée
+            - {"type": "total", "total_ht": ...} une fois toutes les pages lues
+
+        Args:
+            pdf_path (PdfSource): Chemin du fichier PDF, ou contenu en mémoire.
+            parallel (bool, optional): Active l'extraction parallèle du texte des pages (voir parse_pdf).
+            workers (int, optional): Nombre de plages extraites simultanément en mode parallèle.
+
+        Yields:
+            dict: Événement d'analyse.
+        """
+        self.pdf_path = pdf_path
+        total_ht = None
+        item_count = 0
+        start = time.perf_counter()
+        with self._new_session(pdf_path) as session:
+            page_count = session.page_count
+            if parallel is None:
+                parallel = PARALLEL_PAGES and page_count >= PARALLEL_MIN_PAGES
+            # Les colonnes d'un modèle se lisent dans l'index des mots, indisponible en mode parallèle
+            column_session = None
+            page_texts = None
+            if parallel and page_count > 1:
+                page_texts = session.parallel_page_texts(workers)
+                get_page_text = page_texts
+            else:
+                get_page_text = session.page_text
+                column_session = session
+            try:
+                first_page_text = get_page_text(0)
+                plan = self._detect_template(session, first_page_text)
+                self.global_delivery_date = self._extract_global_date(first_page_text)
+                logger.debug("Date de livraison globale trouvée : %s", self.global_delivery_date)
+                objet_lignes = self.extract_lines_after_objet(pdf_path, session=session, plan=plan)
+                yield {
+                    "type": "entete",
+                    "numero_commande": self._extract_order_number(first_page_text, plan),
+                    "objet": " ".join(objet_lignes),
+                    "objet_lignes": objet_lignes,
+                    "lieu_livraison": self.find_lieux_livraison(pdf_path, session=session, plan=plan),
+                    "modele": self.template.name if self.template else GENERIC_TEMPLATE,
+                }
+                for page_num in range(1, page_count + 1):
+                    text = get_page_text(page_num - 1)
+                    # Total HT cherché page par page, sans concaténer le texte de toutes les pages
+                    total_ht = self._update_total(total_ht, text)
+                    page_items = self._parse_page_items(page_num, page_count, get_page_text, plan, column_session)
+                    # La page précédente a servi ici pour la dernière fois (désignations reportées)
+                    session.release_page(page_num - 1)
+                    if page_texts is not None:
+                        page_texts.release(page_num - 1)
+                    session.check_memory()
+                    if page_items is not None:
+                        item_count += len(page_items)
+                        yield {"type": "items", "page": page_num, "items": page_items}
+            finally:
+                # Analyse interrompue : les plages pas encore extraites sont annulées
+                if page_texts is not None:
+                    page_texts.close()
+        metrics.PDF_PAGES.observe(page_count)
+        metrics.PDF_ITEMS.observe(item_count)
+        self._record_template_time(time.perf_counter() - start)
+        yield {"type": "total", "total_ht": total_ht}
+
+    def _parse_page_items(self, page_num: int, page_count: int, get_page_text: Callable[[int], str],
+                          plan: ExtractionPlan = None,
+                          session: ParsingSession = None) -> Union[List[Dict[str, Any]], None]:
+        """
+        Extrait les items d'une page (la page suivante sert aux désignations reportées)
+        et complète les dates de livraison manquantes avec la date globale.
+        Les colonnes du plan d'un modèle connu remplacent l'heuristique quand la mise en page
+        des mots est disponible.
+
+        Args:
+            page_num (int): Numéro de la page (à partir de 1).
+            page_count (int): Nombre de pages du document.
+            get_page_text (Callable): Retourne le texte d'une page à partir de son indice (à partir de 0).
+            plan (ExtractionPlan, optional): Plan d'extraction du modèle reconnu.
+            session (ParsingSession, optional): Session en mode mise en page, pour la lecture par colonnes.
+
+        Returns:
+            list[InvoiceItem]|None: Items de la page, ou None si la page n'a pas pu être traitée.
+        """
+        try:
+            text = get_page_text(page_num - 1)
+            # Le texte de la page suivante est mémorisé dans le cache : il ne sera pas réextrait
+            next_page_text = get_page_text(page_num) if page_num < page_count else None
+            with metrics.time_stage("heuristique"):
+                if plan is not None and plan.columns and session is not None and session.layout:
+                    page_items = self._column_parse(session.page_layout(page_num - 1), plan, next_page_text)
+                else:
+                    page_items = self._heuristic_parse(text, next_page_text)
+            for item in page_items:
+                if not item.date_livraison:
+                    item.date_livraison = self.global_delivery_date
+            logger.debug("Page %d/%d : %d items trouvés", page_num, page_count, len(page_items),
+                         extra={"page": page_num, "items": len(page_items)})
+            return page_items
+        except Exception as e:
+            metrics.ERRORS.inc(source="page")
+            logger.warning("Erreur lors du traitement de la page %d : %s", page_num, e,
+                           extra={"page": page_num})
+            return None
+
+    def extract_fields(self, pdf_path: PdfSource, fields: Iterable[str] = None,
+                       pages: Tuple[int, int] = None) -> Dict[str, Any]:
+        """
+        Extraction sélective : seules les pages nécessaires aux champs demandés sont lues.
+            - numero_commande, objet, lieu_livraison : page 1 uniquement ;
+            - total_ht : pages lues à rebours depuis la dernière jusqu'à la première portant une ligne
+              'total' avec un montant (même règle que parse_pdf, voir _update_total) ;
+            - items : pages de la plage demandée (et la page suivante pour les désignations reportées).
+        Une demande d'entête seul lit donc la page 1 et, pour le total HT, les dernières pages seulement
+        (la dernière en général), quelle que soit la longueur du document.
+
+        Args:
+            pdf_path (PdfSource): Chemin du fichier PDF, ou contenu en mémoire.
+            fields (Iterable[str], optional): Champs voulus parmi EXTRACTABLE_FIELDS (tous par défaut).
+            pages (tuple(int, int), optional): Première et dernière page (à partir de 1, incluses)
+                analysées pour les items (toutes par défaut).
+
+        Returns:
+            dict: Champs demandés ; "objet" est accompagné de "objet_lignes".
+
+        Raises:
+            ValueError: Si un champ demandé est inconnu.
+        """
+        fields = list(fields) if fields else list(EXTRACTABLE_FIELDS)
+        unknown = [field for field in fields if field not in EXTRACTABLE_FIELDS]
+        if unknown:
+            raise ValueError(f"Champs inconnus : {', '.join(unknown)} (attendus : {', '.join(EXTRACTABLE_FIELDS)})")
+        self.pdf_path = pdf_path
+        result: Dict[str, Any] = {}
+        with self._new_session(pdf_path) as session:
+            page_count = session.page_count
+            plan = self._detect_template(session, session.page_text(0))
+            if "numero_commande" in fields:
+                result["numero_commande"] = self._extract_order_number(session.page_text(0), plan)
+            if "objet" in fields:
+                objet_lignes = self.extract_lines_after_objet(pdf_path, session=session, plan=plan)
+                result["objet"] = " ".join(objet_lignes)
+                result["objet_lignes"] = objet_lignes
+            if "lieu_livraison" in fields:
+                result["lieu_livraison"] = self.find_lieux_livraison(pdf_path, session=session, plan=plan)
+            if "total_ht" in fields:
+                # Lecture à rebours : la première page portant un total est celle du dernier total
+                total_ht = None
+                for page_index in reversed(range(page_count)):
+                    total_ht = self._extract_total(session.page_text(page_index))
+                    # La page 1 sert encore aux items ; les autres ne sont plus relues
+                    if page_index:
+                        session.release_page(page_index)
+                    session.check_memory()
+                    if total_ht is not None:
+                        break
+                result["total_ht"] = total_ht
+            if "items" in fields:
+                first_page, last_page = pages or (1, page_count)
+                first_page, last_page = max(1, first_page), min(page_count, last_page)
+                self.global_delivery_date = self._extract_global_date(session.page_text(0))
+                items = ItemTable()
+                for page_num in range(first_page, last_page + 1):
+                    page_items = self._parse_page_items(page_num, page_count, session.page_text, plan, session)
+                    session.release_page(page_num - 1)
+                    session.check_memory()
+                    if page_items is not None:
+                        items.extend(page_items)
+                result["items"] = items
+        return result
+
+    def _extract_order_number(self, text: str, plan: ExtractionPlan = None) -> Union[str, None]:
         """
         Recherche du numéro de commande dans le texte.
 
         Args:
             text (str): Texte à analyser.
+            plan (ExtractionPlan, optional): Plan du modèle reconnu (motif propre à l'émetteur).
 
         Returns:
             str|None: Numéro de commande trouvé ou None.
         """
-        order_patterns = [
-            r'Commande\s*N°\s*(\d+/[A-Z]+)',  # Format "4500791137/ROTI"
-            r'N°\s*commande\s*:\s*(\d+)',     # Format "N° commande : 4500791137"
-            r'Commande\s*:\s*(\d+)',          # Format "Commande : 4500791137"
-            r'N°\s*(\d{8,})'                  # Format générique (8+ chiffres)
-        ]
-        for pattern in order_patterns:
-            match = re.search(pattern, text, re.IGNORECASE)
+        if plan is not None and plan.order_number is not None:
+            match = plan.order_number.search(text)
             if match:
                 return match.group(1)
-        return None
+        # Les formats sont testés en une passe, par ordre de priorité (voir ORDER_NUMBER_PATTERNS)
+        found = _search_by_priority(ORDER_NUMBER_PATTERN, text)
+        return found[1] if found else None
 
     def _clean_number(self, value: str) -> str:
         """
@@ -373,43 +1390,132 @@ class InvoiceParser:
         Returns:
             str: Nombre nettoyé.
         """
-        if not value:
-            return value
-        return str(value).replace('.', '')
+        return strip_thousands(value)
+
+    def _excel_sheets(self, numeric: bool = False) -> List[Tuple[str, List[str], Iterable[tuple]]]:
+        """
+        Décrit les feuilles de l'export Excel à partir de last_result, sans copier ni modifier les items.
+        Les nombres passent par l'étape de normalisation partagée avec l'API (fr_numbers).
+
+        Args:
+            numeric (bool): Écrit quantités, prix unitaires et total HT en nombres (Decimal)
+                plutôt qu'en texte au format français.
+
+        Returns:
+            list[tuple]: (nom de la feuille, titres des colonnes, itérable des lignes) pour chaque feuille.
+        """
+        result = self.last_result
+        numero_commande = result.get('numero_commande', '')
+        items = result["items"]
+        if not isinstance(items, ItemTable):
+            items = ItemTable(items)
+        # Colonnes numériques normalisées en une passe ; les autres sont reprises telles quelles
+        if numeric:
+            number_columns = {key: normalize_column(items.column(key), "decimal")
+                              for key in ('quantite', 'prix_unitaire')}
+        else:
+            number_columns = {'prix_unitaire': normalize_column(items.column('prix_unitaire'), style="excel")}
+        item_rows = zip(*(
+            itertools.repeat(numero_commande) if key == 'numero_commande'
+            else number_columns.get(key) or items.column(key)
+            for key in EXCEL_ITEM_COLUMNS
+        ))
+        # Informations globales : objet et lieu de livraison sur une seule ligne
+        global_row = (
+            numero_commande,
+            result.get('objet', '').replace('\n', ' ').replace('\r', ' '),
+            result.get('lieu_livraison', '').replace('\n', ' ').replace('\r', ' '),
+            normalize_amount(result.get('total_ht', ''), "decimal" if numeric else None, style="excel"),
+        )
+        # Feuille Lieu de livraison : chaque ligne sur une ligne Excel
+        lieu_livraison_lines = result.get('lieu_livraison', '').replace('\r', '').split('\n')
+        lieu_livraison_lines = [line.strip() for line in lieu_livraison_lines if line.strip()]
+        return [
+            ('Items', list(EXCEL_ITEM_COLUMNS.values()), item_rows),
+            ('Informations globales', ['Numéro de commande', 'Objet', 'Lieu de livraison', 'Total HT'], [global_row]),
+            # Feuille Objet : chaque ligne sur une ligne Excel (déjà extraites par parse_pdf)
+            ('Objet', ['Objet'], ((line,) for line in result.get('objet_lignes', []))),
+            ('Lieu de livraison', ['Lieu de livraison'], ((line,) for line in lieu_livraison_lines)),
+        ]
+
+    def _write_excel_streaming(self, output_path: str, numeric: bool = False) -> None:
+        """
+        Écrit le classeur en mode write-only d'openpyxl : les lignes sont envoyées directement
+        depuis last_result et la largeur des colonnes est calculée pendant le parcours des données,
+        sans relire le classeur.
+
+        Args:
+            output_path (str): Chemin du fichier Excel de sortie.
+            numeric (bool): Nombres écrits en valeurs numériques (voir _excel_sheets).
+        """
+        # Import à la demande : l'API n'exporte jamais en Excel et n'a pas à charger openpyxl
+        from openpyxl import Workbook
+        from openpyxl.utils import get_column_letter
+
+        workbook = Workbook(write_only=True)
+        for sheet_name, header, rows in self._excel_sheets(numeric):
+            worksheet = workbook.create_sheet(sheet_name)
+            widths = [len(title) for title in header]
+            sheet_rows = []
+            for row in rows:
+                for index, value in enumerate(row):
+                    if value is not None and len(str(value)) > widths[index]:
+                        widths[index] = len(str(value))
+                sheet_rows.append(row)
+            # En mode write-only, les largeurs doivent être fixées avant la première ligne
+            for index, width in enumerate(widths, 1):
+                worksheet.column_dimensions[get_column_letter(index)].width = width + 2
+            worksheet.append(header)
+            for row in sheet_rows:
+                worksheet.append(row)
+        workbook.save(output_path)
 
-    def export_to_excel(self, output_path: str = None) -> None:
+    def _write_excel_pandas(self, output_path: str, numeric: bool = False) -> None:
+        """
+        Écrit le classeur avec pandas puis ajuste la largeur des colonnes en relisant chaque cellule.
+
+        Args:
+            output_path (str): Chemin du fichier Excel de sortie.
+            numeric (bool): Nombres écrits en valeurs numériques (voir _excel_sheets).
+        """
+        # Import à la demande : pandas n'est utile qu'à ce mode d'export
+        import pandas as pd
+
+        with pd.ExcelWriter(output_path, engine='openpyxl', mode='w') as writer:
+            for sheet_name, header, rows in self._excel_sheets(numeric):
+                pd.DataFrame(list(rows), columns=header).to_excel(writer, sheet_name=sheet_name, index=False)
+
+            # Ajuste automatiquement la largeur des colonnes pour une meilleure lisibilité
+            for sheet_name in writer.sheets:
+                worksheet = writer.sheets[sheet_name]
+                for column in worksheet.columns:
+                    max_length = 0
+                    column = [cell for cell in column]
+                    for cell in column:
+                        try:
+                            if len(str(cell.value)) > max_length:
+                                max_length = len(cell.value)
+                        except:
+                            pass
+                    adjusted_width = (max_length + 2)
+                    worksheet.column_dimensions[column[0].column_letter].width = adjusted_width
+
+    def export_to_excel(self, output_path: str = None, streaming: bool = True, numeric: bool = False) -> None:
         """
         Exporte les résultats extraits au format Excel.
+        Feuilles produites : Items, Informations globales, Objet, Lieu de livraison.
 
         Args:
             output_path (str, optional): Chemin du fichier Excel de sortie.
+            streaming (bool): Écriture directe en mode write-only (par défaut). False pour
+                l'ancien export via pandas, plus lent sur les commandes de plusieurs milliers de lignes.
+            numeric (bool): Écrit quantités, prix unitaires et total HT en nombres (cellules numériques
+                Excel) au lieu de texte au format français.
 
         Raises:
             Exception: En cas d'erreur lors de l'écriture du fichier.
         """
         try:
-            items_data = self.last_result["items"].copy()
-            for item in items_data:
-                item['numero_commande'] = self.last_result.get('numero_commande', '')
-            for item in items_data:
-                if item.get('prix_unitaire'):
-                    item['prix_unitaire'] = self._clean_number(item['prix_unitaire'])
-            df_items = pd.DataFrame(items_data)
-            column_names = {
-                'numero_commande': 'Numéro de commande',
-                'position': 'Position',
-                'designation': 'Référence',
-                'nom_produit': 'Désignation',
-                'quantite': 'Quantité',
-                'unite': 'Unité',
-                'prix_unitaire': 'Prix unitaire',
-                'date_livraison': 'Date de livraison'
-            }
-            columns_order = [
-                'numero_commande', 'position', 'designation', 'nom_produit',
-                'quantite', 'unite', 'prix_unitaire', 'date_livraison'
-            ]
-            df_items = df_items[columns_order].rename(columns=column_names)
             if not output_path:
                 timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
                 output_path = f"facture_{timestamp}.xlsx"
@@ -421,129 +1527,105 @@ class InvoiceParser:
                     base, ext = os.path.splitext(output_path)
                     timestamp = datetime.now().strftime("_%Y-%m-%d_%H-%M-%S")
                     output_path = f"{base}{timestamp}{ext}"
-                    print(f"Fichier existant verrouillé, utilisation du nouveau nom: {output_path}")
-            with pd.ExcelWriter(output_path, engine='openpyxl', mode='w') as writer:
-                df_items.to_excel(writer, sheet_name='Items', index=False)
-                # Informations globales : objet et lieu de livraison sur une seule ligne
-                df_global = pd.DataFrame({
-                    'Numéro de commande': [self.last_result.get('numero_commande', '')],
-                    'Objet': [self.last_result.get('objet', '').replace('\n', ' ').replace('\r', ' ')],
-                    'Lieu de livraison': [self.last_result.get('lieu_livraison', '').replace('\n', ' ').replace('\r', ' ')],
-                    'Total HT': [self._clean_number(self.last_result.get('total_ht', ''))]
-                })
-                df_global.to_excel(writer, sheet_name='Informations globales', index=False)
-
-                # Feuille Objet : chaque ligne sur une ligne Excel
-                objet_lines = self.extract_lines_after_objet(self.pdf_path)
-                df_objet = pd.DataFrame({'Objet': objet_lines})
-                df_objet.to_excel(writer, sheet_name='Objet', index=False)
-
-                # Feuille Lieu de livraison : chaque ligne sur une ligne Excel
-                lieu_livraison_lines = self.last_result.get('lieu_livraison', '').replace('\r', '').split('\n')
-                lieu_livraison_lines = [line.strip() for line in lieu_livraison_lines if line.strip()]
-                df_lieu = pd.DataFrame({'Lieu de livraison': lieu_livraison_lines})
-                df_lieu.to_excel(writer, sheet_name='Lieu de livraison', index=False)
-
-                # Ajuste automatiquement la largeur des colonnes pour une meilleure lisibilité
-                for sheet_name in writer.sheets:
-                    worksheet = writer.sheets[sheet_name]
-                    for column in worksheet.columns:
-                        max_length = 0
-                        column = [cell for cell in column]
-                        for cell in column:
-                            try:
-                                if len(str(cell.value)) > max_length:
-                                    max_length = len(cell.value)
-                            except:
-                                pass
-                        adjusted_width = (max_length + 2)
-                        worksheet.column_dimensions[column[0].column_letter].width = adjusted_width
-            print(f"Fichier Excel créé avec succès : {output_path}")
+                    logger.warning("Fichier existant verrouillé, utilisation du nouveau nom : %s", output_path)
+            if streaming:
+                self._write_excel_streaming(output_path, numeric)
+            else:
+                self._write_excel_pandas(output_path, numeric)
+            logger.info("Fichier Excel créé avec succès : %s", output_path)
         except Exception as e:
-            print(f"Erreur lors de la création du fichier Excel : {str(e)}")
+            logger.error("Erreur lors de la création du fichier Excel : %s", e)
             raise
 
-    def extract_lines_after_objet(self, pdf_path: str, page_number: int = 0) -> list:
+    def extract_lines_after_objet(self, pdf_path: PdfSource, page_number: int = 0, session: ParsingSession = None,
+                                  plan: ExtractionPlan = None) -> list:
         """
         Extrait les lignes après 'OBJET' jusqu'à 'CONTRAT N°' (exclue).
 
         Args:
-            pdf_path (str): Chemin du PDF.
+            pdf_path (PdfSource): Chemin ou contenu du PDF.
             page_number (int): Numéro de la page à analyser.
+            session (ParsingSession, optional): Session ouverte à réutiliser (évite de rouvrir le PDF).
+            plan (ExtractionPlan, optional): Plan du modèle reconnu (mots-clés de début et de fin propres à l'émetteur).
 
         Returns:
             list: Lignes extraites.
         """
-        with pdfplumber.open(pdf_path) as pdf:
-            page = pdf.pages[page_number]
-            lines = page.extract_text().splitlines()
+        start_keyword, stop_keyword = (plan.objet_keywords if plan is not None and plan.objet_keywords
+                                       else ("objet", "contrat n"))
+        with self._open_session(pdf_path, session) as pdf_session:
+            if pdf_session.layout:
+                return pdf_session.page_layout(page_number).lines_between(start_keyword, stop_keyword)
+            lines = pdf_session.page_text(page_number).splitlines()
             objet_lines = []
             found_objet = False
             for line in lines:
                 if not found_objet:
-                    if "objet" in line.lower():
+                    if start_keyword in line.lower():
                         found_objet = True
                     continue
                 # Arrêt si on trouve 'CONTRAT N°'
-                if "contrat n" in line.lower():
+                if stop_keyword in line.lower():
                     break
                 if line.strip():
                     objet_lines.append(line.strip())
             return objet_lines
 
-    def find_objet(self, pdf_path: str) -> str:
+    def find_objet(self, pdf_path: PdfSource, session: ParsingSession = None) -> str:
         """
         Retourne le texte de l'objet (après 'OBJET' jusqu'à 'CONTRAT N°').
 
         Args:
-            pdf_path (str): Chemin du PDF.
+            pdf_path (PdfSource): Chemin ou contenu du PDF.
+            session (ParsingSession, optional): Session ouverte à réutiliser.
 
         Returns:
             str: Texte de l'objet.
         """
-        lines = self.extract_lines_after_objet(pdf_path)
+        lines = self.extract_lines_after_objet(pdf_path, session=session)
         return " ".join(lines) if lines else ""
 
-    def find_lieux_livraison(self, pdf_path: str) -> str:
+    def find_lieux_livraison(self, pdf_path: PdfSource, session: ParsingSession = None,
+                             plan: ExtractionPlan = None) -> str:
         """
         Extrait le texte du lieu de livraison à partir d'une zone précise du PDF.
 
         Args:
-            pdf_path (str): Chemin du PDF.
+            pdf_path (PdfSource): Chemin ou contenu du PDF.
+            session (ParsingSession, optional): Session ouverte à réutiliser.
+            plan (ExtractionPlan, optional): Plan du modèle reconnu (zone et entête propres à l'émetteur).
 
         Returns:
             str: Texte du lieu de livraison.
         """
-        # À adapter avec les coordonnées réelles selon le format du PDF
-        return self.extract_zone_text(pdf_path, page_number=0, x0=20, top=425, x1=228, bottom=514)
+        zone = plan.delivery_zone if plan is not None and plan.delivery_zone else DEFAULT_DELIVERY_ZONE
+        header_pattern = plan.delivery_header if plan is not None and plan.delivery_header else None
+        return self.extract_zone_text(pdf_path, 0, *zone, session=session, header_pattern=header_pattern)
 
-    def extract_zone_text(self, pdf_path: str, page_number: int, x0: float, top: float, x1: float, bottom: float) -> str:
+    def extract_zone_text(self, pdf_path: PdfSource, page_number: int, x0: float, top: float, x1: float, bottom: float,
+                          session: ParsingSession = None, header_pattern: "re.Pattern" = None) -> str:
         """
         Extrait le texte d'une zone précise d'une page PDF et retire l'entête d'adresse de livraison.
         Garde les retours à la ligne pour permettre une séparation ligne par ligne.
 
         Args:
-            pdf_path (str): Chemin du PDF.
+            pdf_path (PdfSource): Chemin ou contenu du PDF.
             page_number (int): Numéro de la page.
             x0, top, x1, bottom (float): Coordonnées de la zone à extraire.
+            session (ParsingSession, optional): Session ouverte à réutiliser.
+            header_pattern (re.Pattern, optional): Entête à retirer (DELIVERY_HEADER_PATTERN par défaut).
 
         Returns:
             str: Texte extrait de la zone.
         """
-        with pdfplumber.open(pdf_path) as pdf:
-            page = pdf.pages[page_number]
-            zone = page.crop((x0, top, x1, bottom))
-            texte = zone.extract_text() or ""
+        with self._open_session(pdf_path, session) as pdf_session:
+            texte = pdf_session.zone_text(page_number, x0, top, x1, bottom)
             # Suppression de la phrase d'entête (même si elle est sur plusieurs lignes)
-            texte = re.sub(
-                r"Adresse de livraison, lieu de\s*réception ou d'exécution\s*:", 
-                "", 
-                texte, 
-                flags=re.IGNORECASE
-            )
+            texte = (header_pattern or DELIVERY_HEADER_PATTERN).sub("", texte)
             return texte.strip()
 
 if __name__ == "__main__":
+    logging.basicConfig(level=os.environ.get("LOG_LEVEL", "INFO").upper(), format="%(message)s")
     print("=== Convertisseur PDF vers Excel ===")
     while True:
         pdf_path = input("\nVeuillez entrer le chemin complet du fichier PDF (ou 'q' pour quitter) : ")
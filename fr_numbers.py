@@ -0,0 +1,234 @@
+"""
+fr_numbers.py
+
+Normalisation des nombres au format français (1.234,56) pour une commande entière.
+
+Fonctionnalités principales :
+- Nettoyage texte : format de l'API (clean_fr_number, zéros décimaux retirés) ou de l'export
+  Excel (strip_thousands, séparateurs de milliers retirés seulement). Séparateurs de milliers
+  reconnus : point, espace, espace insécable (U+00A0) et espace fine insécable (U+202F).
+- Conversion optionnelle en Decimal ou en float, pour ne plus reparser les montants en aval.
+- Traitement par colonne : chaque valeur distincte d'une colonne n'est convertie qu'une fois
+  (quantités, unités de prix et montants se répètent beaucoup sur les longues commandes).
+- Contrôle de cohérence : somme des lignes (quantité x prix unitaire) comparée au total HT.
+
+Les opérations de chaînes de pandas ou NumPy ne sont pas utilisées : sur des colonnes de type
+objet elles bouclent elles aussi en Python, et importer pandas sur le chemin de /upload
+coûterait plusieurs centaines de millisecondes au démarrage des workers.
+
+Auteur  : Lam Clément
+Date    : 2024-06
+Licence : Usage interne VINCI Energies
+
+Dépendances :
+- invoice_items (ItemTable)
+"""
+
+from decimal import ROUND_HALF_UP, Decimal, InvalidOperation
+from typing import Any, Callable, Dict, Iterable, List, Union
+
+from invoice_items import ITEM_FIELDS, ItemTable
+
+# Champs numériques des items normalisés par normalize_items
+AMOUNT_FIELDS = ("quantite", "prix_unitaire")
+# Séparateurs de milliers retirés : point, espace, espace insécable et espace fine insécable
+_THOUSANDS_SEPARATORS = str.maketrans("", "", ". \u00a0\u202f")
+# Types numériques disponibles (None : texte nettoyé)
+NUMERIC_TYPES = ("decimal", "float")
+# Précision des montants pour le contrôle de cohérence
+CENT = Decimal("0.01")
+
+def clean_fr_number(val: str) -> str:
+    """
+    Nettoie un nombre au format français : enlève les séparateurs de milliers (points, espaces),
+    garde la virgule et retire les zéros décimaux inutiles.
+
+    Args:
+        val (str): Nombre à nettoyer.
+
+    Returns:
+        str: Nombre nettoyé (un texte à plusieurs virgules est seulement débarrassé des séparateurs).
+    """
+    if not isinstance(val, str):
+        return val
+    val = val.translate(_THOUSANDS_SEPARATORS)  # Enlève les séparateurs de milliers
+    if val.count(',') == 1:
+        entier, dec = val.split(',')
+        dec = dec.rstrip('0')
+        if dec == '':
+            return entier
+        return f"{entier},{dec}"
+    return val
+
+def strip_thousands(value: str) -> str:
+    """
+    Retire les séparateurs de milliers (points, espaces) en conservant la partie décimale
+    telle quelle (export Excel).
+
+    Args:
+        value (str): Nombre à nettoyer.
+
+    Returns:
+        str: Nombre nettoyé.
+    """
+    if not value:
+        return value
+    return str(value).translate(_THOUSANDS_SEPARATORS)
+
+def to_decimal(value: Any) -> Union[Decimal, None]:
+    """
+    Convertit un nombre au format français en Decimal (les points et les espaces sont des
+    séparateurs de milliers).
+
+    Args:
+        value (str|int|float|Decimal|None): Valeur à convertir.
+
+    Returns:
+        Decimal|None: Valeur convertie, None si vide, illisible ou non finie ("NaN", "Infinity").
+    """
+    if isinstance(value, Decimal):
+        return value
+    if isinstance(value, (int, float)):
+        return Decimal(str(value))
+    if not isinstance(value, str):
+        return None
+    text = value.strip().translate(_THOUSANDS_SEPARATORS).replace(',', '.')
+    if not text:
+        return None
+    try:
+        number = Decimal(text)
+    except InvalidOperation:
+        return None
+    return number if number.is_finite() else None
+
+def to_float(value: Any) -> Union[float, None]:
+    """
+    Convertit un nombre au format français en float.
+
+    Args:
+        value (str|int|float|Decimal|None): Valeur à convertir.
+
+    Returns:
+        float|None: Valeur convertie, None si vide ou illisible.
+    """
+    number = to_decimal(value)
+    return float(number) if number is not None else None
+
+def _converter(numeric: str = None, style: str = "api") -> Callable[[Any], Any]:
+    """
+    Retourne la fonction de conversion d'une valeur.
+
+    Args:
+        numeric (str, optional): "decimal", "float" ou None (texte).
+        style (str): Format texte : "api" (clean_fr_number) ou "excel" (strip_thousands).
+
+    Raises:
+        ValueError: Si le type numérique ou le style est inconnu.
+    """
+    if numeric == "decimal":
+        return to_decimal
+    if numeric == "float":
+        return to_float
+    if numeric is not None:
+        raise ValueError(f"Type numérique inconnu : {numeric} (attendus : {', '.join(NUMERIC_TYPES)})")
+    if style == "api":
+        return clean_fr_number
+    if style == "excel":
+        return strip_thousands
+    raise ValueError(f"Style de nettoyage inconnu : {style}")
+
+def normalize_column(values: Iterable[Any], numeric: str = None, style: str = "api") -> List[Any]:
+    """
+    Normalise une colonne de nombres en une passe : chaque valeur distincte n'est convertie qu'une fois.
+
+    Args:
+        values (Iterable): Valeurs de la colonne (str ou None).
+        numeric (str, optional): "decimal", "float" ou None pour un texte nettoyé.
+        style (str): Format texte quand numeric est None : "api" ou "excel".
+
+    Returns:
+        list: Valeurs normalisées, dans le même ordre.
+    """
+    convert = _converter(numeric, style)
+    values = values if isinstance(values, list) else list(values)
+    converted = {value: convert(value) for value in set(values)}
+    return [converted[value] for value in values]
+
+def normalize_amount(value: Any, numeric: str = None, style: str = "api") -> Any:
+    """
+    Normalise un montant isolé (total HT) avec les mêmes règles que normalize_column.
+    Une valeur vide est conservée telle quelle.
+
+    Args:
+        value (str|None): Montant au format français.
+        numeric (str, optional): "decimal", "float" ou None pour un texte nettoyé.
+        style (str): Format texte quand numeric est None : "api" ou "excel".
+
+    Returns:
+        Any: Montant normalisé.
+    """
+    if not value:
+        return value
+    return _converter(numeric, style)(value)
+
+def normalize_items(items: Union[ItemTable, List[Dict[str, Any]]], numeric: str = None,
+                    fields: Iterable[str] = AMOUNT_FIELDS) -> Union[ItemTable, List[Dict[str, Any]]]:
+    """
+    Normalise sur place les champs numériques des items de toute une commande.
+    Une ItemTable est traitée colonne par colonne ; pour une liste d'items, seuls les items
+    qui possèdent le champ sont modifiés.
+
+    Args:
+        items (ItemTable|list[dict]): Items extraits par InvoiceParser.
+        numeric (str, optional): "decimal", "float" ou None pour un texte nettoyé (format de l'API).
+        fields (Iterable[str]): Champs à normaliser.
+
+    Returns:
+        ItemTable|list[dict]: Les mêmes items, normalisés.
+    """
+    for field in fields:
+        if isinstance(items, ItemTable):
+            if field in ITEM_FIELDS:
+                column = items.column(field)
+                column[:] = normalize_column(column, numeric)
+            continue
+        present = [item for item in items if field in item]
+        if present:
+            for item, value in zip(present, normalize_column([item[field] for item in present], numeric)):
+                item[field] = value
+    return items
+
+def check_totals(items: Iterable[Dict[str, Any]], total_ht: Any, tolerance: Decimal = CENT) -> Dict[str, Any]:
+    """
+    Vérifie que la somme des lignes (quantité x prix unitaire, arrondie au centime) correspond au total HT.
+    Accepte des valeurs texte (format français) ou déjà converties.
+
+    Args:
+        items (ItemTable|list[dict]): Items de la commande.
+        total_ht (str|Decimal|None): Total HT de la commande.
+        tolerance (Decimal): Écart maximal accepté.
+
+    Returns:
+        dict: somme_lignes, total_ht, ecart (Decimal|None), lignes_incompletes (int) et coherent (bool).
+    """
+    if isinstance(items, ItemTable):
+        pairs = items.rows(("quantite", "prix_unitaire"))
+    else:
+        pairs = ((item.get("quantite"), item.get("prix_unitaire")) for item in items)
+    total_lines = Decimal(0)
+    incomplete = 0
+    for quantity, unit_price in pairs:
+        quantity, unit_price = to_decimal(quantity), to_decimal(unit_price)
+        if quantity is None or unit_price is None:
+            incomplete += 1
+            continue
+        total_lines += (quantity * unit_price).quantize(CENT, rounding=ROUND_HALF_UP)
+    expected = to_decimal(total_ht)
+    gap = total_lines - expected if expected is not None else None
+    return {
+        "somme_lignes": total_lines,
+        "total_ht": expected,
+        "ecart": gap,
+        "lignes_incompletes": incomplete,
+        "coherent": gap is not None and abs(gap) <= tolerance and incomplete == 0,
+    }
@@ -0,0 +1,78 @@
+"""
+gunicorn.conf.py
+
+Configuration gunicorn de l'API en production :
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+Fonctionnalités principales :
+- Application préchargée dans le processus maître (preload_app) : imports et préchauffage
+  de wsgi.py faits une seule fois, puis partagés par les workers en copie sur écriture.
+- Nombre de workers (processus) et de threads par worker configurables par variables d'environnement.
+  Le parsing est limité par le GIL : le débit vient des processus, les threads couvrent surtout
+  les entrées/sorties (réception des corps base64, envoi des réponses en flux).
+- Limites sur la ligne et les entêtes des requêtes ; la taille du corps est limitée par
+  l'application (MAX_UPLOAD_MB, erreur 413 en JSON).
+- Keep-alive pour les clients qui enchaînent les envois sur une même connexion.
+- Recyclage périodique des workers (max_requests) pour borner la mémoire sur les longues durées.
+- Les statuts des conversions /jobs sont partagés entre workers par un fichier SQLite (JOBS_DB,
+  par défaut /tmp/facture_jobs.sqlite3, ou facture_jobs.sqlite3 dans TMPDIR) : le suivi
+  GET /jobs/<id> peut être servi par un autre worker que la soumission. Un traitement reste
+  exécuté par le worker qui l'a reçu : ceux d'un worker recyclé ou arrêté passent en erreur
+  à l'expiration de leur bail (JOBS_LEASE_S).
+
+Variables d'environnement :
+- PORT (3000), WEB_CONCURRENCY (un worker par cœur), GUNICORN_THREADS (2),
+  GUNICORN_TIMEOUT (120 s), GUNICORN_KEEPALIVE (5 s), GUNICORN_MAX_REQUESTS (1000, 0 : jamais),
+  LOG_LEVEL (warning) ;
+  JOBS_DB (fichier des statuts /jobs, défaut /tmp/facture_jobs.sqlite3 : à fixer sur un disque
+  local commun aux workers, jamais vide avec plusieurs workers) ; JOBS_LEASE_S (60 s, bail d'un
+  traitement /jobs : au-delà sans renouvellement, le traitement passe en erreur) ;
+  PARSER_PARALLEL=1 (extraction parallèle des longues commandes : chaque worker a son pool de
+  PARSER_PARALLEL_WORKERS processus, réduire WEB_CONCURRENCY pour ne pas surcharger les cœurs).
+
+Auteur  : Lam Clément
+Date    : 2024-06
+Licence : Usage interne VINCI Energies
+
+Dépendances :
+- gunicorn
+"""
+
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', 3000)}"
+
+# Processus : un par cœur par défaut (le parsing occupe un cœur entier pendant toute la requête)
+workers = int(os.environ.get("WEB_CONCURRENCY", os.cpu_count() or 1))
+# Threads par worker (worker gthread dès qu'il y en a plus d'un)
+threads = int(os.environ.get("GUNICORN_THREADS", 2))
+worker_class = "gthread" if threads > 1 else "sync"
+
+# Application et préchauffage chargés avant le fork
+preload_app = True
+
+# Un gros PDF peut demander plusieurs dizaines de secondes : au-delà, le worker est redémarré
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", 120))
+graceful_timeout = 30
+keepalive = int(os.environ.get("GUNICORN_KEEPALIVE", 5))
+
+# Recyclage des workers, avec une dispersion pour ne pas les redémarrer tous en même temps
+max_requests = int(os.environ.get("GUNICORN_MAX_REQUESTS", 1000))
+max_requests_jitter = max_requests // 10
+
+# Limites de la ligne de requête et des entêtes (le corps est limité par MAX_CONTENT_LENGTH)
+limit_request_line = 4094
+limit_request_fields = 100
+limit_request_field_size = 8190
+
+loglevel = os.environ.get("LOG_LEVEL", "warning").lower()
+accesslog = os.environ.get("GUNICORN_ACCESS_LOG") or None
+errorlog = "-"
+
+def post_fork(server, worker):
+    """
+    Journalise le démarrage d'un worker. Rien n'est à réinitialiser : le pool de /upload/batch,
+    les threads de /jobs et la connexion SQLite du cache sont créés à leur première utilisation,
+    dans le worker lui-même.
+    """
+    server.log.info("Worker %s démarré (préchargé)", worker.pid)
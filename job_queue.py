@@ -0,0 +1,312 @@
+"""
+job_queue.py
+
+File de traitements asynchrones pour les conversions longues.
+
+Fonctionnalités principales :
+- Enregistre un traitement et retourne immédiatement son identifiant.
+- Exécute les traitements dans un groupe de threads de travail.
+- Limite la file d'attente (contre-pression) : au-delà, la soumission est refusée.
+- Conserve le statut et le résultat des derniers traitements terminés, en mémoire ou dans un
+  fichier SQLite partagé : avec plusieurs workers gunicorn, un traitement soumis à un worker
+  peut alors être consulté depuis n'importe quel autre.
+- Bail des traitements en cours : le processus qui les détient renouvelle leur bail ; un
+  traitement dont le bail a expiré (worker tué, recyclé ou arrêté) passe en erreur au lieu de
+  rester indéfiniment en attente ou en cours.
+
+Le traitement s'exécute dans le processus qui l'a reçu ; seuls son statut et son résultat
+sont partagés.
+
+Auteur  : Lam Clément
+Date    : 2024-06
+Licence : Usage interne VINCI Energies
+
+Dépendances :
+- Aucune (bibliothèque standard)
+"""
+
+import json
+import os
+import queue
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Union
+
+# Statuts possibles d'un traitement
+STATUS_PENDING = "en_attente"
+STATUS_RUNNING = "en_cours"
+STATUS_DONE = "termine"
+STATUS_FAILED = "erreur"
+# Statuts d'un traitement détenu par un processus (bail à renouveler)
+ACTIVE_STATUSES = (STATUS_PENDING, STATUS_RUNNING)
+
+class QueueFullError(Exception):
+    """
+    Levée quand la file d'attente a atteint sa taille maximale.
+    """
+
+class JobQueue:
+    """
+    File bornée de traitements exécutés en arrière-plan par des threads.
+
+    Attributs :
+        handler (Callable) : Fonction appelée avec la charge utile de chaque traitement.
+        workers (int) : Nombre de threads de travail.
+        max_queue (int) : Nombre maximal de traitements en attente.
+        max_finished (int) : Nombre de traitements terminés conservés pour consultation.
+        db_path (str|None) : Fichier SQLite des statuts partagé entre processus (None : en mémoire).
+        lease (float) : Durée du bail d'un traitement en attente ou en cours, en secondes.
+        owner (str|None) : Identifiant du processus propriétaire des traitements qu'il a reçus
+            (fixé à l'ouverture du fichier partagé).
+    """
+
+    def __init__(self, handler: Callable[[Any], Any], workers: int = 2, max_queue: int = 100,
+                 max_finished: int = 1000, db_path: str = None, json_default: Callable[[Any], Any] = None,
+                 lease: float = 60.0):
+        """
+        Initialise la file sans démarrer les threads (démarrés à la première soumission).
+
+        Args:
+            handler (Callable): Fonction de traitement, appelée avec la charge utile.
+            workers (int): Nombre de threads de travail.
+            max_queue (int): Taille maximale de la file d'attente.
+            max_finished (int): Nombre de traitements terminés conservés.
+            db_path (str, optional): Fichier SQLite où enregistrer statuts et résultats.
+            json_default (Callable, optional): Sérialisation JSON des résultats stockés en SQLite
+                (paramètre default de json.dumps).
+            lease (float): Durée du bail, renouvelé au tiers de sa durée par le processus propriétaire ;
+                au-delà, un traitement non terminé est considéré comme abandonné.
+        """
+        self.handler = handler
+        self.workers = workers
+        self.max_queue = max_queue
+        self.max_finished = max_finished
+        self.db_path = db_path
+        self.json_default = json_default
+        self.lease = lease
+        self.owner = None
+        self._connection = None
+        self._connection_pid = None
+        self._queue: "queue.Queue[str]" = queue.Queue(maxsize=max_queue)
+        self._jobs: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._payloads: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+        self._threads: List[threading.Thread] = []
+
+    @property
+    def _db(self) -> Union[sqlite3.Connection, None]:
+        """
+        Connexion SQLite du processus courant (None sans fichier partagé). Une connexion héritée
+        d'un fork n'est jamais réutilisée : chaque processus ouvre la sienne (appel sous verrou).
+        """
+        if not self.db_path:
+            return None
+        if self._connection is None or self._connection_pid != os.getpid():
+            self._connection = sqlite3.connect(self.db_path, check_same_thread=False, timeout=30)
+            self._connection_pid = os.getpid()
+            # Propriétaire propre au processus : un fork ne reprend pas les baux de son parent
+            self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                "job_id TEXT PRIMARY KEY, status TEXT NOT NULL, submitted_at REAL NOT NULL, "
+                "started_at REAL, finished_at REAL, result TEXT, error TEXT, owner TEXT, lease_until REAL)"
+            )
+            # Fichier créé par une version sans bail : colonnes ajoutées sur place
+            columns = {row[1] for row in self._connection.execute("PRAGMA table_info(jobs)")}
+            for column, column_type in (("owner", "TEXT"), ("lease_until", "REAL")):
+                if column not in columns:
+                    self._connection.execute(f"ALTER TABLE jobs ADD COLUMN {column} {column_type}")
+            self._connection.execute("CREATE INDEX IF NOT EXISTS jobs_finished ON jobs (finished_at)")
+            self._connection.commit()
+            # Au démarrage : traitements laissés par des processus arrêtés
+            self._expire_leases()
+        return self._connection
+
+    def _store(self, job_id: str, job: Dict[str, Any]) -> None:
+        """
+        Enregistre l'état d'un traitement dans le fichier partagé (appel sous verrou).
+        """
+        db = self._db
+        if db is None:
+            return
+        result = json.dumps(job["result"], ensure_ascii=False, default=self.json_default) if "result" in job else None
+        lease_until = time.time() + self.lease if job["status"] in ACTIVE_STATUSES else None
+        db.execute(
+            "INSERT OR REPLACE INTO jobs (job_id, status, submitted_at, started_at, finished_at, result, error, "
+            "owner, lease_until) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (job_id, job["status"], job["submitted_at"], job.get("started_at"), job.get("finished_at"),
+             result, job.get("error"), self.owner, lease_until),
+        )
+        db.commit()
+
+    def _expire_leases(self) -> None:
+        """
+        Passe en erreur les traitements en attente ou en cours dont le bail a expiré : le processus
+        qui les détenait s'est arrêté sans les terminer (appel sous verrou, connexion ouverte).
+        """
+        now = time.time()
+        self._connection.execute(
+            "UPDATE jobs SET status = ?, error = ?, finished_at = ?, lease_until = NULL "
+            "WHERE status IN (?, ?) AND (lease_until IS NULL OR lease_until < ?)",
+            (STATUS_FAILED, "Traitement abandonné : le processus qui le détenait s'est arrêté",
+             now, *ACTIVE_STATUSES, now),
+        )
+        self._connection.commit()
+
+    def _renew_leases(self) -> None:
+        """
+        Boucle du thread de renouvellement : prolonge le bail des traitements du processus
+        au tiers de sa durée et expire ceux des processus arrêtés.
+        """
+        while True:
+            time.sleep(self.lease / 3)
+            with self._lock:
+                db = self._db
+                db.execute("UPDATE jobs SET lease_until = ? WHERE owner = ? AND status IN (?, ?)",
+                           (time.time() + self.lease, self.owner, *ACTIVE_STATUSES))
+                db.commit()
+                self._expire_leases()
+
+    def _load(self, job_id: str) -> Union[Dict[str, Any], None]:
+        """
+        Lit l'état d'un traitement dans le fichier partagé (appel sous verrou). Un traitement
+        dont le bail a expiré est d'abord passé en erreur.
+        """
+        self._expire_leases()
+        row = self._db.execute(
+            "SELECT status, submitted_at, started_at, finished_at, result, error FROM jobs WHERE job_id = ?",
+            (job_id,),
+        ).fetchone()
+        if row is None:
+            return None
+        status, submitted_at, started_at, finished_at, result, error = row
+        job = {"job_id": job_id, "status": status, "submitted_at": submitted_at}
+        if started_at is not None:
+            job["started_at"] = started_at
+        if result is not None:
+            job["result"] = json.loads(result)
+        if error is not None:
+            job["error"] = error
+        if finished_at is not None:
+            job["finished_at"] = finished_at
+        return job
+
+    def _start_workers(self) -> None:
+        """
+        Démarre les threads de travail s'ils ne tournent pas encore (appel sous verrou).
+        """
+        if self._threads:
+            return
+        for index in range(self.workers):
+            thread = threading.Thread(target=self._work, name=f"job-worker-{index}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        if self._db is not None:
+            thread = threading.Thread(target=self._renew_leases, name="job-lease", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def submit(self, payload: Any) -> str:
+        """
+        Ajoute un traitement à la file.
+
+        Args:
+            payload (Any): Charge utile transmise au handler.
+
+        Returns:
+            str: Identifiant du traitement.
+
+        Raises:
+            QueueFullError: Si la file d'attente est pleine.
+        """
+        job_id = uuid.uuid4().hex
+        with self._lock:
+            self._start_workers()
+            try:
+                self._queue.put_nowait(job_id)
+            except queue.Full:
+                raise QueueFullError(f"File d'attente pleine ({self.max_queue} traitements en attente)")
+            self._payloads[job_id] = payload
+            self._jobs[job_id] = {"job_id": job_id, "status": STATUS_PENDING, "submitted_at": time.time()}
+            self._store(job_id, self._jobs[job_id])
+        return job_id
+
+    def get(self, job_id: str) -> Union[Dict[str, Any], None]:
+        """
+        Retourne l'état d'un traitement.
+
+        Args:
+            job_id (str): Identifiant retourné par submit.
+
+        Returns:
+            dict|None: Statut (et résultat ou erreur une fois terminé), None si inconnu ou expiré.
+        """
+        with self._lock:
+            if self._db is not None:
+                # Fichier partagé : le traitement a pu être soumis à un autre processus
+                return self._load(job_id)
+            job = self._jobs.get(job_id)
+            return dict(job) if job is not None else None
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Retourne l'occupation de la file.
+
+        Returns:
+            dict: Traitements en attente, nombre de threads et taille maximale.
+        """
+        return {"queued": self._queue.qsize(), "workers": self.workers, "max_queue": self.max_queue}
+
+    def _work(self) -> None:
+        """
+        Boucle d'un thread de travail : exécute les traitements dans l'ordre d'arrivée.
+        """
+        while True:
+            job_id = self._queue.get()
+            with self._lock:
+                payload = self._payloads.pop(job_id)
+                self._jobs[job_id].update(status=STATUS_RUNNING, started_at=time.time())
+                self._store(job_id, self._jobs[job_id])
+            try:
+                result = self.handler(payload)
+                update = {"status": STATUS_DONE, "result": result}
+            except Exception as e:
+                update = {"status": STATUS_FAILED, "error": str(e)}
+            with self._lock:
+                self._jobs[job_id].update(update, finished_at=time.time())
+                try:
+                    self._store(job_id, self._jobs[job_id])
+                except (TypeError, ValueError, sqlite3.Error) as e:
+                    # Résultat non enregistrable : le traitement est signalé en erreur plutôt que perdu
+                    self._jobs[job_id] = {**self._jobs[job_id], "status": STATUS_FAILED,
+                                          "error": f"Résultat non enregistré : {e}"}
+                    self._jobs[job_id].pop("result", None)
+                    self._store(job_id, self._jobs[job_id])
+                self._jobs.move_to_end(job_id)
+                self._forget_old_jobs()
+            self._queue.task_done()
+
+    def _forget_old_jobs(self) -> None:
+        """
+        Oublie les plus anciens traitements terminés au-delà de max_finished (appel sous verrou).
+        Avec le fichier partagé, la limite porte sur l'ensemble des processus et les traitements
+        terminés ne restent pas en mémoire.
+        """
+        finished = [job_id for job_id, job in self._jobs.items()
+                    if job["status"] in (STATUS_DONE, STATUS_FAILED)]
+        keep = 0 if self._db is not None else self.max_finished
+        for job_id in finished[:max(0, len(finished) - keep)]:
+            del self._jobs[job_id]
+        db = self._db
+        if db is not None:
+            db.execute(
+                "DELETE FROM jobs WHERE job_id IN ("
+                "SELECT job_id FROM jobs WHERE finished_at IS NOT NULL "
+                "ORDER BY finished_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_finished,),
+            )
+            db.commit()
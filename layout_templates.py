@@ -0,0 +1,365 @@
+"""
+layout_templates.py
+
+Registre des modèles de mise en page des émetteurs récurrents de bons de commande.
+
+Fonctionnalités principales :
+- Empreinte de la première page (mots-clés, format de page, polices) calculée à partir de
+  données déjà extraites : la détection ne relit pas le document.
+- Modèle = empreinte + plan d'extraction précompilé : zone du lieu de livraison et entête à
+  retirer, motif du numéro de commande, mots-clés de l'objet, colonnes des items (abscisses).
+- Avec des colonnes, les items sont lus directement dans l'index des mots de chaque page ;
+  sans colonnes, ou pour un document inconnu, InvoiceParser garde son heuristique générique.
+- Statistiques de durée par modèle (documents, durée totale, moyenne, maximum), reprises
+  dans /metrics (facture_template_seconds).
+- Modèles supplémentaires chargés d'un fichier JSON (variable d'environnement PARSER_TEMPLATES).
+
+Format JSON d'un modèle :
+    {"name": "fournisseur_x",
+     "keywords": ["fournisseur x", "bon de commande"],
+     "page_size": [595, 842], "fonts": ["Arial"],
+     "plan": {"delivery_zone": [20, 425, 228, 514],
+              "delivery_header": "Adresse de livraison\\s*:",
+              "order_number": "Commande\\s+N°\\s*(\\d+)",
+              "objet_keywords": ["objet", "contrat n"],
+              "columns": {"position": [30, 60], "designation": [60, 120], "quantite": [300, 340],
+                          "unite": [340, 370], "prix_unitaire": [370, 440]}}}
+
+Auteur  : Lam Clément
+Date    : 2024-06
+Licence : Usage interne VINCI Energies
+
+Dépendances :
+- Aucune (bibliothèque standard)
+"""
+
+import json
+import os
+import re
+import threading
+import weakref
+from typing import Any, Callable, Dict, FrozenSet, Iterable, List, Tuple, Union
+
+# Nom retenu pour les documents dont aucun modèle ne reconnaît la mise en page
+GENERIC_TEMPLATE = "generique"
+# Écart toléré sur les dimensions de page, en points
+PAGE_SIZE_TOLERANCE = 2.0
+# Champs d'item qu'un plan peut lire dans des colonnes
+COLUMN_FIELDS = ("position", "designation", "quantite", "unite", "prix_unitaire", "date_livraison")
+# Préfixe de sous-ensemble des polices embarquées (ABCDEF+Arial)
+_FONT_SUBSET_PATTERN = re.compile(r"^[A-Z]{6}\+")
+
+Zone = Tuple[float, float, float, float]
+
+class PageFingerprint:
+    """
+    Empreinte de la première page d'un document, comparée aux modèles du registre.
+    Les polices ne sont lues que si un modèle les demande.
+
+    Attributs :
+        text (str) : Texte de la page, en minuscules.
+        width, height (float) : Dimensions de la page, en points.
+    """
+
+    __slots__ = ("text", "width", "height", "_fonts", "_load_fonts")
+
+    def __init__(self, text: str, width: float, height: float,
+                 fonts: Union[Iterable[str], Callable[[], Iterable[str]]] = ()):
+        """
+        Args:
+            text (str): Texte de la page.
+            width, height (float): Dimensions de la page.
+            fonts (Iterable[str]|Callable): Polices de la page, ou fonction qui les retourne.
+        """
+        self.text = text.lower()
+        self.width = width
+        self.height = height
+        self._fonts = None
+        self._load_fonts = fonts if callable(fonts) else (lambda: fonts)
+
+    @classmethod
+    def from_page(cls, page: Any, text: str) -> "PageFingerprint":
+        """
+        Construit l'empreinte d'une page pdfplumber dont le texte est déjà extrait.
+
+        Args:
+            page (pdfplumber.page.Page): Première page du document.
+            text (str): Texte de la page.
+
+        Returns:
+            PageFingerprint: Empreinte de la page.
+        """
+        return cls(text, float(page.width), float(page.height),
+                   lambda: (char["fontname"] for char in page.chars))
+
+    @property
+    def fonts(self) -> FrozenSet[str]:
+        """
+        Polices de la page, sans préfixe de sous-ensemble.
+        """
+        if self._fonts is None:
+            self._fonts = frozenset(_FONT_SUBSET_PATTERN.sub("", font) for font in self._load_fonts())
+        return self._fonts
+
+class ExtractionPlan:
+    """
+    Plan d'extraction précompilé d'un modèle. Un champ laissé à None reprend le comportement générique.
+
+    Attributs :
+        delivery_zone (Zone|None) : Zone (x0, top, x1, bottom) du lieu de livraison en page 1.
+        delivery_header (re.Pattern|None) : Entête retiré du texte de la zone de livraison.
+        order_number (re.Pattern|None) : Motif du numéro de commande (un groupe capturant).
+        objet_keywords (tuple[str, str]|None) : Mots-clés de début et de fin de l'objet, en minuscules.
+        columns (dict[str, tuple[float, float]]|None) : Abscisses [x0, x1) de chaque colonne des items.
+    """
+
+    __slots__ = ("delivery_zone", "delivery_header", "order_number", "objet_keywords", "columns")
+
+    def __init__(self, delivery_zone: Zone = None, delivery_header: str = None, order_number: str = None,
+                 objet_keywords: Tuple[str, str] = None, columns: Dict[str, Tuple[float, float]] = None):
+        """
+        Compile le plan.
+
+        Args:
+            delivery_zone (Zone, optional): Zone du lieu de livraison.
+            delivery_header (str, optional): Expression de l'entête de la zone de livraison (insensible à la casse).
+            order_number (str, optional): Expression du numéro de commande (insensible à la casse).
+            objet_keywords (tuple[str, str], optional): Mots-clés de l'objet.
+            columns (dict, optional): Colonnes des items ; position et designation sont obligatoires.
+
+        Raises:
+            ValueError: Si une colonne est inconnue, ou si position ou designation manque.
+        """
+        self.delivery_zone = tuple(delivery_zone) if delivery_zone else None
+        self.delivery_header = re.compile(delivery_header, re.IGNORECASE) if delivery_header else None
+        self.order_number = re.compile(order_number, re.IGNORECASE) if order_number else None
+        if self.order_number is not None and self.order_number.groups != 1:
+            raise ValueError("Le motif du numéro de commande doit contenir exactement un groupe capturant")
+        self.objet_keywords = tuple(keyword.lower() for keyword in objet_keywords) if objet_keywords else None
+        self.columns = None
+        if columns:
+            unknown = [field for field in columns if field not in COLUMN_FIELDS]
+            if unknown:
+                raise ValueError(f"Colonnes inconnues : {', '.join(unknown)} (attendues : {', '.join(COLUMN_FIELDS)})")
+            if "position" not in columns or "designation" not in columns:
+                raise ValueError("Les colonnes position et designation sont obligatoires")
+            self.columns = {field: (float(x0), float(x1)) for field, (x0, x1) in columns.items()}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "ExtractionPlan":
+        """
+        Construit un plan à partir de sa description JSON (voir l'entête du module).
+        """
+        return cls(**{key: data.get(key) for key in cls.__slots__})
+
+    def column_of(self, x0: float, x1: float) -> Union[str, None]:
+        """
+        Retourne la colonne qui contient le centre d'un mot.
+
+        Args:
+            x0, x1 (float): Abscisses du mot.
+
+        Returns:
+            str|None: Champ de la colonne, None hors colonnes.
+        """
+        center = (x0 + x1) / 2
+        for field, (left, right) in self.columns.items():
+            if left <= center < right:
+                return field
+        return None
+
+class LayoutTemplate:
+    """
+    Modèle de mise en page d'un émetteur : empreinte de la première page et plan d'extraction.
+
+    Attributs :
+        name (str) : Nom du modèle (étiquette des statistiques).
+        keywords (tuple[str]) : Mots-clés tous présents en page 1 (en minuscules).
+        page_size (tuple[float, float]|None) : Dimensions attendues de la page 1.
+        fonts (frozenset[str]) : Polices toutes présentes en page 1.
+        plan (ExtractionPlan) : Plan d'extraction.
+    """
+
+    __slots__ = ("name", "keywords", "page_size", "fonts", "plan")
+
+    def __init__(self, name: str, keywords: Iterable[str], plan: ExtractionPlan,
+                 page_size: Tuple[float, float] = None, fonts: Iterable[str] = ()):
+        self.name = name
+        self.keywords = tuple(keyword.lower() for keyword in keywords)
+        self.page_size = tuple(page_size) if page_size else None
+        self.fonts = frozenset(fonts)
+        self.plan = plan
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "LayoutTemplate":
+        """
+        Construit un modèle à partir de sa description JSON (voir l'entête du module).
+
+        Raises:
+            ValueError: Si le nom ou les mots-clés manquent.
+        """
+        if not data.get("name") or not data.get("keywords"):
+            raise ValueError("Un modèle doit avoir un nom et au moins un mot-clé")
+        return cls(data["name"], data["keywords"], ExtractionPlan.from_dict(data.get("plan", {})),
+                   page_size=data.get("page_size"), fonts=data.get("fonts", ()))
+
+    def matches(self, fingerprint: PageFingerprint) -> bool:
+        """
+        Indique si une première page correspond au modèle. Les critères sont testés du moins
+        coûteux au plus coûteux : mots-clés, format de page, puis polices.
+
+        Args:
+            fingerprint (PageFingerprint): Empreinte de la page 1.
+
+        Returns:
+            bool: True si tous les critères sont remplis.
+        """
+        if not all(keyword in fingerprint.text for keyword in self.keywords):
+            return False
+        if self.page_size is not None:
+            width, height = self.page_size
+            if (abs(fingerprint.width - width) > PAGE_SIZE_TOLERANCE
+                    or abs(fingerprint.height - height) > PAGE_SIZE_TOLERANCE):
+                return False
+        return not self.fonts or self.fonts <= fingerprint.fonts
+
+    def __repr__(self) -> str:
+        return f"LayoutTemplate({self.name!r})"
+
+class TemplateRegistry:
+    """
+    Modèles connus, testés dans l'ordre d'enregistrement (le premier qui correspond l'emporte),
+    et statistiques de durée par modèle. Partagé entre threads ; utilisable dans un processus
+    issu d'un fork (le verrou y est recréé).
+    """
+
+    # Registres du processus, dont le verrou est recréé après un fork
+    _instances: "weakref.WeakSet[TemplateRegistry]" = weakref.WeakSet()
+
+    def __init__(self, templates: Iterable[LayoutTemplate] = ()):
+        self._templates: List[LayoutTemplate] = []
+        # Par modèle : [documents, durée totale, durée maximale]
+        self._stats: Dict[str, list] = {}
+        self._lock = threading.Lock()
+        TemplateRegistry._instances.add(self)
+        for template in templates:
+            self.register(template)
+
+    def register(self, template: LayoutTemplate, first: bool = False) -> LayoutTemplate:
+        """
+        Ajoute un modèle ; un modèle de même nom est remplacé.
+
+        Args:
+            template (LayoutTemplate): Modèle à ajouter.
+            first (bool): Place le modèle avant les autres (modèles spécifiques avant les génériques).
+
+        Returns:
+            LayoutTemplate: Le modèle enregistré.
+        """
+        with self._lock:
+            self._templates = [known for known in self._templates if known.name != template.name]
+            if first:
+                self._templates.insert(0, template)
+            else:
+                self._templates.append(template)
+        return template
+
+    def load_json(self, path: str) -> List[LayoutTemplate]:
+        """
+        Charge des modèles depuis un fichier JSON (un modèle ou une liste de modèles).
+        Les modèles chargés passent avant les modèles déjà enregistrés.
+
+        Args:
+            path (str): Chemin du fichier.
+
+        Returns:
+            list[LayoutTemplate]: Modèles chargés.
+        """
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        templates = [LayoutTemplate.from_dict(entry) for entry in (data if isinstance(data, list) else [data])]
+        for template in reversed(templates):
+            self.register(template, first=True)
+        return templates
+
+    @property
+    def templates(self) -> List[LayoutTemplate]:
+        """
+        Modèles enregistrés, dans l'ordre de détection.
+        """
+        with self._lock:
+            return list(self._templates)
+
+    def detect(self, fingerprint: PageFingerprint) -> Union[LayoutTemplate, None]:
+        """
+        Retourne le premier modèle qui correspond à la première page, ou None.
+
+        Args:
+            fingerprint (PageFingerprint): Empreinte de la page 1.
+
+        Returns:
+            LayoutTemplate|None: Modèle reconnu.
+        """
+        for template in self.templates:
+            if template.matches(fingerprint):
+                return template
+        return None
+
+    def record(self, name: str, seconds: float) -> None:
+        """
+        Enregistre la durée d'analyse d'un document.
+
+        Args:
+            name (str): Nom du modèle (GENERIC_TEMPLATE pour un document inconnu).
+            seconds (float): Durée, en secondes.
+        """
+        with self._lock:
+            state = self._stats.get(name)
+            if state is None:
+                state = self._stats[name] = [0, 0.0, 0.0]
+            state[0] += 1
+            state[1] += seconds
+            state[2] = max(state[2], seconds)
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        """
+        Retourne les statistiques de durée par modèle.
+
+        Returns:
+            dict: {nom: {"documents", "total_s", "moyenne_s", "max_s"}}.
+        """
+        with self._lock:
+            return {name: {"documents": count, "total_s": total, "moyenne_s": total / count, "max_s": longest}
+                    for name, (count, total, longest) in self._stats.items()}
+
+    def reset_stats(self) -> None:
+        """
+        Remet à zéro les statistiques de durée (les modèles enregistrés sont conservés).
+        """
+        with self._lock:
+            self._stats.clear()
+
+def _reset_locks_after_fork() -> None:
+    """
+    Recrée le verrou des registres dans un processus issu d'un fork (analyse isolée, pool de
+    traitement par lot) : un verrou tenu par un autre thread au moment du fork ne serait
+    jamais relâché dans l'enfant.
+    """
+    for registry in list(TemplateRegistry._instances):
+        registry._lock = threading.Lock()
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_locks_after_fork)
+
+# Bon de commande standard : zone, entête et mots-clés jusqu'ici codés en dur dans InvoiceParser.
+# Pas de colonnes : les lignes d'items de ce format tiennent dans une seule chaîne de texte,
+# l'heuristique reste utilisée pour les items.
+STANDARD_TEMPLATE = LayoutTemplate(
+    "bon_de_commande_standard",
+    keywords=("objet", "contrat n", "adresse de livraison"),
+    plan=ExtractionPlan(
+        delivery_zone=(20, 425, 228, 514),
+        delivery_header=r"Adresse de livraison, lieu de\s*réception ou d'exécution\s*:",
+        objet_keywords=("objet", "contrat n"),
+    ),
+)
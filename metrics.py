@@ -0,0 +1,357 @@
+"""
+metrics.py
+
+Métriques de l'API au format texte Prometheus (exposées par /metrics).
+
+Fonctionnalités principales :
+- Compteurs, histogrammes et métriques calculées à la lecture (caches, file d'attente).
+- Histogramme de durée par étape du traitement d'un PDF (décodage base64, ouverture du PDF,
+  extraction du texte, heuristique, nettoyage, sérialisation).
+- Nombre de pages et d'items par document, compteurs d'erreurs.
+- Durée d'analyse par modèle de mise en page (layout_templates).
+- Mémoire résidente du processus (process_rss_bytes, aussi utilisée par le plafond mémoire du parser).
+- Rendu au format d'exposition texte de Prometheus (version 0.0.4).
+
+Les métriques sont propres à chaque processus : avec plusieurs workers gunicorn, chaque
+worker expose les siennes, et les étapes exécutées dans le pool de /upload/batch ou /jobs
+ne sont pas remontées au processus de l'API.
+
+Auteur  : Lam Clément
+Date    : 2024-06
+Licence : Usage interne VINCI Energies
+
+Dépendances :
+- Aucune (bibliothèque standard)
+"""
+
+import os
+import sys
+import threading
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Tuple
+
+# Bornes par défaut des histogrammes de durée, en secondes
+DEFAULT_TIME_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Taille d'une page mémoire (unité de /proc/self/statm)
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+# Échantillon : (suffixe du nom, étiquettes, valeur)
+Sample = Tuple[str, Dict[str, str], float]
+
+def _escape(value: str) -> str:
+    """
+    Échappe une valeur d'étiquette (antislash, guillemet, retour à la ligne).
+    """
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _format_value(value: float) -> str:
+    """
+    Formate une valeur numérique (entiers sans décimale, +Inf).
+    """
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+class Metric:
+    """
+    Base commune des métriques : nom, description, type et noms d'étiquettes.
+
+    Attributs :
+        name (str) : Nom de la métrique.
+        documentation (str) : Description (ligne HELP).
+        labelnames (tuple[str]) : Noms des étiquettes.
+    """
+
+    metric_type = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _label_key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        """
+        Retourne les valeurs d'étiquettes dans l'ordre de labelnames.
+
+        Raises:
+            ValueError: Si les étiquettes ne correspondent pas à labelnames.
+        """
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"Étiquettes attendues pour {self.name} : {self.labelnames}, reçues : {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def samples(self) -> List[Sample]:
+        """
+        Retourne les échantillons courants de la métrique.
+        """
+        raise NotImplementedError
+
+    def reset(self) -> None:
+        """
+        Remet la métrique à zéro (sans effet pour une métrique calculée à la lecture).
+        """
+
+class Counter(Metric):
+    """
+    Compteur croissant, éventuellement ventilé par étiquettes.
+    """
+
+    metric_type = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        """
+        Incrémente le compteur.
+
+        Args:
+            amount (float): Valeur ajoutée.
+            **labels (str): Valeurs des étiquettes.
+        """
+        key = self._label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self) -> List[Sample]:
+        with self._lock:
+            return [("", dict(zip(self.labelnames, key)), value) for key, value in self._values.items()]
+
+    def reset(self) -> None:
+        with self._lock:
+            self._values.clear()
+
+class _Timer:
+    """
+    Gestionnaire de contexte qui observe la durée de son bloc dans un histogramme.
+    """
+
+    __slots__ = ("histogram", "labels", "start")
+
+    def __init__(self, histogram: "Histogram", labels: Dict[str, str]):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self) -> "_Timer":
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.histogram.observe(time.perf_counter() - self.start, **self.labels)
+
+class Histogram(Metric):
+    """
+    Histogramme à bornes fixes (compte par borne, somme et nombre d'observations).
+
+    Attributs :
+        buckets (tuple[float]) : Bornes supérieures des intervalles, croissantes.
+    """
+
+    metric_type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (),
+                 buckets: Iterable[float] = DEFAULT_TIME_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Par étiquettes : [comptes par intervalle (dernier : au-delà de la dernière borne), somme]
+        self._values: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        """
+        Enregistre une observation.
+
+        Args:
+            value (float): Valeur observée.
+            **labels (str): Valeurs des étiquettes.
+        """
+        key = self._label_key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            state[0][index] += 1
+            state[1] += value
+
+    def time(self, **labels: str) -> _Timer:
+        """
+        Retourne un gestionnaire de contexte qui observe la durée du bloc, en secondes.
+
+            with STAGE_SECONDS.time(stage="heuristique"):
+                ...
+        """
+        return _Timer(self, labels)
+
+    def samples(self) -> List[Sample]:
+        samples: List[Sample] = []
+        with self._lock:
+            for key, (counts, total) in self._values.items():
+                labels = dict(zip(self.labelnames, key))
+                cumulative = 0
+                for bound, count in zip(self.buckets + (float("inf"),), counts):
+                    cumulative += count
+                    samples.append(("_bucket", {**labels, "le": _format_value(bound)}, cumulative))
+                samples.append(("_sum", labels, total))
+                samples.append(("_count", labels, cumulative))
+        return samples
+
+    def reset(self) -> None:
+        with self._lock:
+            self._values.clear()
+
+class CallbackMetric(Metric):
+    """
+    Métrique calculée à chaque lecture (compteurs des caches, occupation de la file...).
+    La fonction retourne une liste de couples (étiquettes, valeur).
+    """
+
+    def __init__(self, name: str, documentation: str, callback: Callable[[], List[Tuple[Dict[str, str], float]]],
+                 metric_type: str = "gauge"):
+        super().__init__(name, documentation)
+        self.callback = callback
+        self.metric_type = metric_type
+
+    def samples(self) -> List[Sample]:
+        return [("", labels, value) for labels, value in self.callback()]
+
+class MetricsRegistry:
+    """
+    Ensemble des métriques exposées par /metrics.
+    """
+
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: Metric) -> Metric:
+        """
+        Ajoute une métrique (une métrique de même nom est remplacée).
+
+        Args:
+            metric (Metric): Métrique à exposer.
+
+        Returns:
+            Metric: La métrique enregistrée.
+        """
+        with self._lock:
+            self._metrics[metric.name] = metric
+        return metric
+
+    def reset(self) -> None:
+        """
+        Remet toutes les métriques à zéro (par exemple après le préchauffage d'un processus,
+        dont le document ne doit pas apparaître dans /metrics).
+        """
+        with self._lock:
+            metrics = list(self._metrics.values())
+        for metric in metrics:
+            metric.reset()
+
+    def render(self) -> str:
+        """
+        Produit le texte d'exposition Prometheus de toutes les métriques.
+
+        Returns:
+            str: Texte au format 0.0.4.
+        """
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.metric_type}")
+            for suffix, labels, value in metric.samples():
+                label_text = ",".join(f'{name}="{_escape(val)}"' for name, val in labels.items())
+                label_text = "{" + label_text + "}" if label_text else ""
+                lines.append(f"{metric.name}{suffix}{label_text} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+# Registre du processus et métriques du traitement des PDF
+REGISTRY = MetricsRegistry()
+
+def _reset_locks_after_fork() -> None:
+    """
+    Recrée les verrous dans un processus issu d'un fork : un verrou tenu par un autre thread
+    au moment du fork ne serait jamais relâché dans l'enfant.
+    """
+    REGISTRY._lock = threading.Lock()
+    for metric in REGISTRY._metrics.values():
+        metric._lock = threading.Lock()
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_locks_after_fork)
+
+STAGE_SECONDS = REGISTRY.register(Histogram(
+    "facture_stage_seconds",
+    "Durée des étapes du traitement d'un PDF, en secondes",
+    labelnames=("stage",),
+))
+PDF_PAGES = REGISTRY.register(Histogram(
+    "facture_pdf_pages",
+    "Nombre de pages des PDF analysés",
+    buckets=(1, 2, 5, 10, 20, 50, 100, 200, 500),
+))
+PDF_ITEMS = REGISTRY.register(Histogram(
+    "facture_pdf_items",
+    "Nombre d'items extraits par PDF",
+    buckets=(0, 1, 5, 10, 50, 100, 500, 1000, 5000),
+))
+ERRORS = REGISTRY.register(Counter(
+    "facture_errors_total",
+    "Erreurs rencontrées, par source",
+    labelnames=("source",),
+))
+REQUESTS = REGISTRY.register(Counter(
+    "facture_http_requests_total",
+    "Requêtes HTTP traitées, par route et code de statut",
+    labelnames=("endpoint", "status"),
+))
+REQUEST_SECONDS = REGISTRY.register(Histogram(
+    "facture_http_request_seconds",
+    "Durée des requêtes HTTP, en secondes",
+    labelnames=("endpoint",),
+))
+TEMPLATE_SECONDS = REGISTRY.register(Histogram(
+    "facture_template_seconds",
+    "Durée d'analyse d'un PDF par modèle de mise en page détecté, en secondes",
+    labelnames=("template",),
+))
+
+def process_rss_bytes() -> int:
+    """
+    Retourne la mémoire résidente (RSS) courante du processus, en octets.
+    Hors Linux (/proc indisponible), retourne le pic de RSS du processus.
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except (OSError, IndexError, ValueError):
+        import resource
+        # ru_maxrss est en kilo-octets sous Linux, en octets sous macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+
+REGISTRY.register(CallbackMetric(
+    "facture_process_resident_bytes",
+    "Mémoire résidente du processus, en octets",
+    lambda: [({}, process_rss_bytes())],
+))
+
+def time_stage(stage: str) -> _Timer:
+    """
+    Mesure la durée d'une étape du traitement dans STAGE_SECONDS.
+
+    Args:
+        stage (str): Nom de l'étape (decodage_base64, lecture_corps, ouverture_pdf, extraction_texte,
+            detection_modele, heuristique, nettoyage, serialisation).
+
+    Returns:
+        _Timer: Gestionnaire de contexte.
+    """
+    return STAGE_SECONDS.time(stage=stage)
@@ -0,0 +1,228 @@
+"""
+page_layout.py
+
+Moteur de mise en page au niveau des mots : une page est lue une seule fois (extract_words)
+et toutes les requêtes géométriques sont ensuite servies par un index spatial.
+
+Fonctionnalités principales :
+- Conserve les boîtes des mots d'une page, triées par ordonnée (index interrogé par bisection).
+- Regroupe les mots en lignes comme pdfplumber.extract_text (même tolérance verticale, mots
+  consécutifs d'un même groupe d'ordonnées) : le texte reconstitué est identique à celui
+  d'extract_text, y compris sur les pages à colonnes décalées et polices mélangées.
+- Répond aux requêtes de zone (texte d'un rectangle) sans découpe ni nouvelle extraction ;
+  un mot à cheval sur le bord de la zone est coupé au caractère près, comme avec
+  page.crop(bbox).extract_text().
+- Retourne les lignes comprises entre deux mots-clés (ex. OBJET ... CONTRAT N°).
+
+Auteur  : Lam Clément
+Date    : 2024-06
+Licence : Usage interne VINCI Energies
+
+Dépendances :
+- Aucune (les mots sont fournis par pdfplumber via PageLayout.from_page)
+"""
+
+from bisect import bisect_left, bisect_right
+from itertools import groupby
+from typing import Any, Dict, Iterable, List, Tuple
+
+# Caractère d'un mot : (texte, x0, top, x1, bottom)
+WordChar = Tuple[str, float, float, float, float]
+# Mot positionné : (texte, x0, top, x1, bottom, caractères), en points depuis le coin haut gauche
+Word = Tuple[str, float, float, float, float, Tuple[WordChar, ...]]
+
+# Tolérance verticale de regroupement en lignes (valeur par défaut de pdfplumber)
+LINE_TOLERANCE = 3
+
+def _cluster_tops(tops: Iterable[float], tolerance: float = LINE_TOLERANCE) -> Dict[float, int]:
+    """
+    Numérote les groupes d'ordonnées comme pdfplumber (cluster_objects) : les ordonnées
+    distinctes, triées, sont chaînées tant que l'écart reste dans la tolérance.
+
+    Args:
+        tops (Iterable[float]): Ordonnées hautes à regrouper.
+        tolerance (float): Écart vertical maximal entre deux ordonnées d'un même groupe.
+
+    Returns:
+        dict: Numéro de groupe de chaque ordonnée, de haut en bas.
+    """
+    group_of_top = {}
+    group = 0
+    last = None
+    for top in sorted(set(tops)):
+        if last is not None and top > last + tolerance:
+            group += 1
+        group_of_top[top] = group
+        last = top
+    return group_of_top
+
+def _group_lines(words: List[Word], tolerance: float = LINE_TOLERANCE) -> List[List[Word]]:
+    """
+    Regroupe des mots en lignes comme pdfplumber.extract_text (WordMap.to_textmap sur des mots
+    déjà ordonnés par l'extraction) : chaque suite de mots consécutifs d'un même groupe
+    d'ordonnées forme une ligne. Les mots ne sont pas retriés : deux mots d'un même groupe
+    séparés par un mot d'un autre groupe (colonnes décalées, polices de tailles différentes)
+    restent sur des lignes distinctes, exactement comme dans le texte d'extract_text.
+
+    Args:
+        words (list[Word]): Mots dans l'ordre de lecture de pdfplumber.
+        tolerance (float): Écart vertical maximal entre deux ordonnées d'une même ligne.
+
+    Returns:
+        list[list[Word]]: Mots de chaque ligne, dans l'ordre de lecture.
+    """
+    group_of_top = _cluster_tops((word[2] for word in words), tolerance)
+    return [list(line) for _, line in groupby(words, key=lambda word: group_of_top[word[2]])]
+
+def _reading_order(words: List[Word], tolerance: float = LINE_TOLERANCE) -> List[Word]:
+    """
+    Remet des mots dans l'ordre de lecture de pdfplumber.extract_words, qui regroupe les
+    caractères (et non les mots) par ordonnée puis les lit de gauche à droite : un mot prend
+    le groupe de son premier caractère. Sert aux mots recoupés d'une zone, dont les ordonnées
+    ramenées à la zone peuvent changer de groupe.
+
+    Args:
+        words (list[Word]): Mots à ordonner (caractères ramenés à la zone).
+        tolerance (float): Écart vertical maximal entre deux ordonnées d'un même groupe.
+
+    Returns:
+        list[Word]: Mots dans l'ordre de lecture.
+    """
+    def first_top(word: Word) -> float:
+        return word[5][0][2] if word[5] else word[2]
+
+    group_of_top = _cluster_tops([char[2] for word in words for char in word[5]]
+                                 + [first_top(word) for word in words], tolerance)
+    return sorted(words, key=lambda word: (group_of_top[first_top(word)], word[1]))
+
+def _overlaps(x0: float, top: float, x1: float, bottom: float,
+              zone_x0: float, zone_top: float, zone_x1: float, zone_bottom: float) -> bool:
+    """
+    Indique si une boîte intersecte une zone, selon la règle de pdfplumber (get_bbox_overlap) :
+    recouvrement de largeur et de hauteur positives ou nulles, mais pas toutes deux nulles.
+    """
+    width = min(x1, zone_x1) - max(x0, zone_x0)
+    height = min(bottom, zone_bottom) - max(top, zone_top)
+    return width >= 0 and height >= 0 and width + height > 0
+
+class PageLayout:
+    """
+    Mots d'une page et index spatial associé.
+
+    Attributs :
+        words (list[Word]) : Mots de la page, dans l'ordre de lecture de pdfplumber.
+        lines (list[list[Word]]) : Mots regroupés en lignes, dans l'ordre de lecture.
+        line_texts (list[str]) : Texte de chaque ligne (mots séparés par une espace).
+        text (str) : Texte de la page, identique à extract_text.
+    """
+
+    def __init__(self, words: List[Word]):
+        """
+        Construit l'index à partir des mots d'une page.
+
+        Args:
+            words (list[Word]): Mots dans l'ordre de lecture.
+        """
+        self.words = words
+        self.lines = _group_lines(words)
+        self.line_texts = [" ".join(word[0] for word in line) for line in self.lines]
+        self.text = "\n".join(self.line_texts)
+        # Index spatial : mots triés par ordonnée haute, interrogé par bisection
+        self._by_top = sorted(words, key=lambda word: word[2])
+        self._tops = [word[2] for word in self._by_top]
+        self._max_height = max((word[4] - word[2] for word in words), default=0.0)
+
+    @classmethod
+    def from_page(cls, page: Any) -> "PageLayout":
+        """
+        Lit les mots d'une page pdfplumber (un seul appel à extract_words).
+
+        Args:
+            page (pdfplumber.page.Page): Page à indexer.
+
+        Returns:
+            PageLayout: Mise en page de la page.
+        """
+        return cls([(word["text"], word["x0"], word["top"], word["x1"], word["bottom"],
+                     tuple((char["text"], char["x0"], char["top"], char["x1"], char["bottom"])
+                           for char in word["chars"]))
+                    for word in page.extract_words(return_chars=True)])
+
+    def words_in_bbox(self, x0: float, top: float, x1: float, bottom: float) -> List[Word]:
+        """
+        Retourne les mots qui intersectent un rectangle (bords compris, comme pdfplumber),
+        dans l'ordre de lecture.
+
+        Args:
+            x0, top, x1, bottom (float): Coordonnées du rectangle.
+
+        Returns:
+            list[Word]: Mots de la zone.
+        """
+        # Seuls les mots dont le haut est dans [top - hauteur max, bottom] peuvent intersecter la zone
+        start = bisect_left(self._tops, top - self._max_height)
+        stop = bisect_right(self._tops, bottom)
+        selected = {id(word) for word in self._by_top[start:stop]
+                    if _overlaps(word[1], word[2], word[3], word[4], x0, top, x1, bottom)}
+        return [word for word in self.words if id(word) in selected]
+
+    def zone_text(self, x0: float, top: float, x1: float, bottom: float) -> str:
+        """
+        Retourne le texte d'un rectangle, lignes séparées par des retours à la ligne.
+        Équivaut à page.crop(bbox).extract_text() : les mots à cheval sur le bord de la zone
+        ne gardent que leurs caractères qui l'intersectent, et leur hauteur est ramenée à la
+        zone pour le regroupement en lignes, puis les mots sont remis dans l'ordre où
+        extract_words les lirait dans la zone recadrée. Seule différence : deux mots accolés
+        (moins de 3 pt) de hauteurs différentes que le recadrage ramène à la même hauteur
+        restent séparés, alors que pdfplumber les fusionne.
+
+        Args:
+            x0, top, x1, bottom (float): Coordonnées de la zone.
+
+        Returns:
+            str: Texte de la zone ("" si vide).
+        """
+        clipped: List[Word] = []
+        for word in self.words_in_bbox(x0, top, x1, bottom):
+            text, word_x0, word_top, word_x1, word_bottom, chars = word
+            if word_x0 < x0 or word_top < top or word_x1 > x1 or word_bottom > bottom:
+                # Un mot peut réunir des caractères de hauteurs différentes : chacun est testé
+                # Comme page.crop, le mot est réduit à ses caractères, ramenés à la zone
+                chars = tuple((char[0], max(char[1], x0), max(char[2], top), min(char[3], x1),
+                               min(char[4], bottom))
+                              for char in chars if _overlaps(char[1], char[2], char[3], char[4],
+                                                             x0, top, x1, bottom))
+                if not chars:
+                    continue
+                text = "".join(char[0] for char in chars)
+                word_x0 = chars[0][1]
+                word_top = min(char[2] for char in chars)
+                word_bottom = max(char[4] for char in chars)
+            clipped.append((text, word_x0, word_top, word_x1, word_bottom, chars))
+        lines = _group_lines(_reading_order(clipped))
+        return "\n".join(" ".join(word[0] for word in line) for line in lines)
+
+    def lines_between(self, start_keyword: str, stop_keyword: str) -> List[str]:
+        """
+        Retourne les lignes non vides qui suivent la première ligne contenant start_keyword,
+        jusqu'à la première ligne contenant stop_keyword (exclue). La comparaison ignore la casse.
+
+        Args:
+            start_keyword (str): Mot-clé de début (en minuscules).
+            stop_keyword (str): Mot-clé de fin (en minuscules).
+
+        Returns:
+            list[str]: Lignes trouvées (vide si start_keyword est absent).
+        """
+        found = []
+        started = False
+        for line in self.line_texts:
+            lowered = line.lower()
+            if not started:
+                started = start_keyword in lowered
+                continue
+            if stop_keyword in lowered:
+                break
+            if line.strip():
+                found.append(line.strip())
+        return found
@@ -0,0 +1,245 @@
+"""
+parse_guard.py
+
+Analyse d'un PDF dans un processus dédié, interrompue au-delà d'un délai.
+
+Un PDF malformé ou démesuré peut bloquer pdfplumber indéfiniment : un thread ne peut pas être
+interrompu, un processus si. L'analyse tourne donc dans un processus enfant qui transmet les
+événements de InvoiceParser.iter_parse_pdf au fil de l'eau ; à l'échéance, l'enfant est tué
+et ParseTimeoutError est levée avec le résultat partiel (entête et items des pages analysées).
+
+Fonctionnalités principales :
+- iter_parse_pdf_isolated : événements de iter_parse_pdf, avec délai global (réponses en flux).
+- parse_pdf_isolated : résultat de parse_pdf ; résultat partiel joint à l'erreur de délai.
+- extract_fields_isolated : extraction sélective (pas de résultat partiel).
+- profile_pdf_isolated : analyse profilée (profiling.profile_call) dans le processus dédié.
+- Les erreurs de l'analyse (PDF illisible, limite de pages, plafond mémoire) sont relevées
+  telles quelles dans le processus appelant.
+- L'analyse isolée reste séquentielle, même avec PARSER_PARALLEL=1 (voir _run_child).
+
+Les processus sont créés par fork : ils héritent du parser déjà chargé et démarrent en
+quelques millisecondes. Les verrous des métriques sont réinitialisés dans l'enfant (voir metrics),
+et les durées par étape mesurées dans l'enfant ne remontent pas dans /metrics du worker.
+
+Auteur  : Lam Clément
+Date    : 2024-06
+Licence : Usage interne VINCI Energies
+
+Dépendances :
+- facture_to_excel (InvoiceParser)
+- metrics (compteur d'erreurs)
+- profiling (analyse profilée)
+"""
+
+import io
+import logging
+import multiprocessing
+import time
+from typing import Any, Dict, Iterable, Iterator, Tuple
+
+import metrics
+from facture_to_excel import InvoiceParser, PageTextCache, collect_parse_event, new_parse_result
+from profiling import profile_call
+
+logger = logging.getLogger(__name__)
+
+# Processus créés par fork quand c'est possible (comme le pool de /upload/batch) : l'enfant hérite
+# des modules déjà chargés et démarre en quelques millisecondes
+_context = multiprocessing.get_context("fork" if "fork" in multiprocessing.get_all_start_methods() else None)
+
+# Taille du cache de pages de l'enfant (une seule analyse par processus)
+_CHILD_PAGE_CACHE_SIZE = 16
+
+class ParseTimeoutError(TimeoutError):
+    """
+    Levée quand l'analyse dépasse le délai accordé.
+
+    Attributs :
+        partial (dict|None) : Résultat partiel (format de parse_pdf, total_ht à None).
+        pages_done (int) : Nombre de pages analysées avant l'interruption.
+    """
+
+    def __init__(self, message: str, partial: Dict[str, Any] = None, pages_done: int = 0):
+        super().__init__(message)
+        self.partial = partial
+        self.pages_done = pages_done
+
+def _run_child(connection: Any, pdf_bytes: bytes, selective: bool, fields: list, pages: tuple,
+               parser_options: Dict[str, Any], profile_label: str = None) -> None:
+    """
+    Point d'entrée du processus enfant : analyse le PDF et envoie les messages au parent.
+        - ("evenement", événement de iter_parse_pdf) pour une analyse complète ;
+        - ("resultat", résultat de extract_fields) pour une extraction sélective ;
+        - ("resultat", (résultat, rapport)) pour une analyse profilée (profile_label donné) ;
+        - ("fin", None) en fin d'analyse, ou ("erreur", exception).
+    """
+    try:
+        # Analyse séquentielle (PARSER_PARALLEL ignoré) : les processus d'un pool créé ici
+        # survivraient à l'enfant tué à l'échéance
+        parser = InvoiceParser(page_cache=PageTextCache(_CHILD_PAGE_CACHE_SIZE), **parser_options)
+        source = io.BytesIO(pdf_bytes)
+        if profile_label is not None:
+            if selective:
+                profiled = profile_call(parser.extract_fields, source, fields, pages, label=profile_label)
+            else:
+                profiled = profile_call(parser.parse_pdf, source, parallel=False, label=profile_label)
+            connection.send(("resultat", profiled))
+        elif selective:
+            connection.send(("resultat", parser.extract_fields(source, fields, pages)))
+        else:
+            for event in parser.iter_parse_pdf(source, parallel=False):
+                connection.send(("evenement", event))
+        connection.send(("fin", None))
+    except Exception as e:
+        try:
+            connection.send(("erreur", e))
+        except Exception:
+            # Exception impossible à transmettre (non sérialisable) : on en garde le type et le message
+            connection.send(("erreur", RuntimeError(f"{type(e).__name__} : {e}")))
+    finally:
+        connection.close()
+
+def _run_isolated(pdf_bytes: bytes, timeout: float, selective: bool = False, fields: Iterable[str] = None,
+                  pages: tuple = None, profile_label: str = None, **parser_options: Any) -> Iterator[Tuple[str, Any]]:
+    """
+    Lance l'analyse dans un processus enfant et produit ses messages jusqu'à la fin de l'analyse.
+    L'enfant est tué à l'échéance, à la fermeture du générateur ou en cas d'erreur.
+
+    Args:
+        pdf_bytes (bytes): Contenu du PDF.
+        timeout (float): Délai global, en secondes.
+        selective (bool): Extraction sélective (extract_fields) plutôt qu'analyse complète (iter_parse_pdf).
+        fields (Iterable[str], optional): Champs de l'extraction sélective.
+        pages (tuple(int, int), optional): Plage de pages de l'extraction sélective.
+        profile_label (str, optional): Profile l'analyse sous ce libellé (voir profiling.profile_call).
+        **parser_options: Paramètres de InvoiceParser (max_pages, memory_limit_mb...).
+
+    Yields:
+        tuple: (type de message, contenu) : "evenement" ou "resultat".
+
+    Raises:
+        ParseTimeoutError: Si le délai est dépassé (sans résultat partiel : ajouté par l'appelant).
+    """
+    receiver, sender = _context.Pipe(duplex=False)
+    process = _context.Process(target=_run_child, daemon=True,
+                               args=(sender, bytes(pdf_bytes), selective, list(fields) if fields else None, pages,
+                                     parser_options, profile_label))
+    deadline = time.monotonic() + timeout
+    process.start()
+    sender.close()
+    try:
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or not receiver.poll(remaining):
+                metrics.ERRORS.inc(source="delai")
+                logger.warning("Analyse interrompue après %.1f s (processus %s)", timeout, process.pid)
+                raise ParseTimeoutError(f"Délai d'analyse dépassé ({timeout:g} s)")
+            try:
+                kind, payload = receiver.recv()
+            except EOFError:
+                process.join(1)
+                raise RuntimeError(f"Le processus d'analyse s'est arrêté sans résultat (code {process.exitcode})")
+            if kind == "fin":
+                return
+            if kind == "erreur":
+                raise payload
+            yield kind, payload
+    finally:
+        if process.is_alive():
+            process.kill()
+        process.join()
+        receiver.close()
+
+def iter_parse_pdf_isolated(pdf_bytes: bytes, timeout: float, **parser_options: Any) -> Iterator[Dict[str, Any]]:
+    """
+    Équivalent de InvoiceParser.iter_parse_pdf exécuté dans un processus dédié, avec délai global.
+
+    Args:
+        pdf_bytes (bytes): Contenu du PDF.
+        timeout (float): Délai global, en secondes.
+        **parser_options: Paramètres de InvoiceParser.
+
+    Yields:
+        dict: Événement d'analyse (entete, items, total).
+
+    Raises:
+        ParseTimeoutError: Si le délai est dépassé.
+    """
+    for _, event in _run_isolated(pdf_bytes, timeout, **parser_options):
+        yield event
+
+def parse_pdf_isolated(pdf_bytes: bytes, timeout: float, **parser_options: Any) -> Dict[str, Any]:
+    """
+    Équivalent de InvoiceParser.parse_pdf exécuté dans un processus dédié, avec délai global.
+
+    Args:
+        pdf_bytes (bytes): Contenu du PDF.
+        timeout (float): Délai global, en secondes.
+        **parser_options: Paramètres de InvoiceParser.
+
+    Returns:
+        dict: Résultat au format de parse_pdf.
+
+    Raises:
+        ParseTimeoutError: Si le délai est dépassé ; partial contient l'entête et les items
+            des pages déjà analysées.
+    """
+    result = new_parse_result()
+    pages_done = 0
+    try:
+        for event in iter_parse_pdf_isolated(pdf_bytes, timeout, **parser_options):
+            collect_parse_event(result, event)
+            if event["type"] == "items":
+                pages_done = event["page"]
+    except ParseTimeoutError as e:
+        e.partial = result
+        e.pages_done = pages_done
+        raise
+    return result
+
+def extract_fields_isolated(pdf_bytes: bytes, timeout: float, fields: Iterable[str] = None, pages: tuple = None,
+                            **parser_options: Any) -> Dict[str, Any]:
+    """
+    Équivalent de InvoiceParser.extract_fields exécuté dans un processus dédié, avec délai global.
+
+    Args:
+        pdf_bytes (bytes): Contenu du PDF.
+        timeout (float): Délai global, en secondes.
+        fields (Iterable[str], optional): Champs voulus.
+        pages (tuple(int, int), optional): Plage de pages analysée pour les items.
+        **parser_options: Paramètres de InvoiceParser.
+
+    Returns:
+        dict: Résultat au format de extract_fields.
+
+    Raises:
+        ParseTimeoutError: Si le délai est dépassé (sans résultat partiel).
+    """
+    for _, result in _run_isolated(pdf_bytes, timeout, selective=True, fields=fields, pages=pages, **parser_options):
+        return result
+    raise RuntimeError("Le processus d'analyse n'a retourné aucun résultat")
+
+def profile_pdf_isolated(pdf_bytes: bytes, timeout: float, label: str = "analyse", fields: Iterable[str] = None,
+                         pages: tuple = None, **parser_options: Any) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """
+    Analyse profilée (profiling.profile_call) exécutée dans un processus dédié, avec délai global.
+    Le profil brut est écrit par l'enfant (PROFILE_DIR) ; le rapport est retourné au parent.
+
+    Args:
+        pdf_bytes (bytes): Contenu du PDF.
+        timeout (float): Délai global, en secondes.
+        label (str): Libellé du profil (nom du document).
+        fields (Iterable[str], optional): Champs voulus (extraction sélective si fields ou pages est donné).
+        pages (tuple(int, int), optional): Plage de pages analysée pour les items.
+        **parser_options: Paramètres de InvoiceParser.
+
+    Returns:
+        tuple(dict, dict): Résultat (format de parse_pdf ou de extract_fields) et rapport de profilage.
+
+    Raises:
+        ParseTimeoutError: Si le délai est dépassé (sans résultat partiel).
+    """
+    for _, profiled in _run_isolated(pdf_bytes, timeout, selective=bool(fields or pages), fields=fields,
+                                     pages=pages, profile_label=label, **parser_options):
+        return profiled
+    raise RuntimeError("Le processus d'analyse n'a retourné aucun résultat")
@@ -0,0 +1,85 @@
+"""
+pdf_builder.py
+
+Construction en mémoire de PDF texte minimaux, sans dépendance externe.
+
+Fonctionnalités principales :
+- build_pdf : assemble un PDF (police Helvetica, encodage WinAnsi, format A4) à partir de
+  lignes de texte positionnées, page par page.
+- Flux binaire optionnel non référencé, qui augmente la taille du document sans changer
+  le texte extrait (simulation d'un document scanné lourd).
+
+Utilisé par le préchauffage des workers (wsgi.py) et par les générateurs de documents
+des benchmarks (benchmarks/synthetic_pdf.py).
+
+Auteur  : Lam Clément
+Date    : 2024-06
+Licence : Usage interne VINCI Energies
+
+Dépendances :
+- Aucune (bibliothèque standard)
+"""
+
+from typing import List, Tuple
+
+PAGE_WIDTH, PAGE_HEIGHT = 595, 842
+
+# Texte positionné : (x, top, taille de police, texte), top en points depuis le haut de la page
+TextLine = Tuple[float, float, int, str]
+
+def _escape(text: str) -> str:
+    """
+    Échappe une chaîne pour un opérateur Tj.
+    """
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+def build_pdf(pages: List[List[TextLine]], filler: bytes = b"") -> bytes:
+    """
+    Assemble un PDF minimal (police Helvetica, encodage WinAnsi) à partir de lignes positionnées.
+
+    Args:
+        pages (list[list[TextLine]]): Lignes de texte de chaque page.
+        filler (bytes): Contenu d'un flux binaire non référencé ajouté au document, qui en augmente
+            la taille sans changer le texte extrait (comme les images d'un document scanné).
+
+    Returns:
+        bytes: Contenu du PDF.
+    """
+    objects: List[bytes] = [
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>",
+        b"",  # /Pages, complété une fois les pages connues
+    ]
+    font_id, pages_id = 1, 2
+    kids = []
+    for lines in pages:
+        operators = []
+        for x, top, size, text in lines:
+            y = PAGE_HEIGHT - top - size
+            operators.append(f"BT /F1 {size} Tf {x:.2f} {y:.2f} Td ({_escape(text)}) Tj ET")
+        stream = "\n".join(operators).encode("cp1252")
+        objects.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+        content_id = len(objects)
+        objects.append(
+            b"<< /Type /Page /Parent %d 0 R /MediaBox [0 0 %d %d] /Resources << /Font << /F1 %d 0 R >> >> "
+            b"/Contents %d 0 R >>" % (pages_id, PAGE_WIDTH, PAGE_HEIGHT, font_id, content_id)
+        )
+        kids.append(len(objects))
+    objects[pages_id - 1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (
+        b" ".join(b"%d 0 R" % kid for kid in kids), len(kids))
+    objects.append(b"<< /Type /Catalog /Pages %d 0 R >>" % pages_id)
+    catalog_id = len(objects)
+    if filler:
+        objects.append(b"<< /Length %d >>\nstream\n" % len(filler) + filler + b"\nendstream")
+
+    output = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(output))
+        output += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+    xref_offset = len(output)
+    output += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for offset in offsets:
+        output += b"%010d 00000 n \n" % offset
+    output += b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (
+        len(objects) + 1, catalog_id, xref_offset)
+    return bytes(output)
@@ -0,0 +1,191 @@
+"""
+profiling.py
+
+Profilage à la demande d'une analyse de PDF (cProfile), pour comprendre où passe le temps
+sur le document d'un fournisseur donné.
+
+Fonctionnalités principales :
+- profile_call : exécute une fonction sous cProfile et retourne son résultat et un rapport.
+- Rapport ventilé par méthode de InvoiceParser, ParsingSession et PageTextCache (appels, temps
+  cumulé, temps propre), par bibliothèque (pdfminer, pdfplumber, modules du projet...) et liste
+  des fonctions les plus coûteuses. Les fichiers sources y sont désignés par des chemins
+  relatifs (au projet ou au paquet installé) : le rapport ne révèle pas l'arborescence du serveur.
+- Écriture optionnelle du profil brut (.prof, lisible par pstats, snakeviz...) et du rapport
+  texte dans un répertoire (PROFILE_DIR ou paramètre).
+
+Le profilage n'est actif que pour l'appel demandé : sans demande, aucun code de ce module
+n'est exécuté et l'analyse n'a aucun surcoût.
+
+Auteur  : Lam Clément
+Date    : 2024-06
+Licence : Usage interne VINCI Energies
+
+Dépendances :
+- facture_to_excel (classes dont les méthodes sont ventilées)
+"""
+
+import cProfile
+import itertools
+import os
+import pstats
+import re
+import time
+from typing import Any, Callable, Dict, List, Tuple
+
+from facture_to_excel import InvoiceParser, PageTextCache, ParsingSession
+
+# Répertoire où écrire les profils (vide : rapport retourné uniquement)
+PROFILE_DIR = os.environ.get("PROFILE_DIR") or None
+# Nombre de fonctions listées dans le rapport
+PROFILE_TOP = int(os.environ.get("PROFILE_TOP", 25))
+
+# Classes dont les méthodes sont ventilées dans le rapport
+PROFILED_CLASSES = (InvoiceParser, ParsingSession, PageTextCache)
+
+# Caractères retirés des noms de fichiers de profil
+_UNSAFE_FILENAME_CHARS = re.compile(r"[^\w.-]+")
+# Numéro de profil du processus (deux profils d'une même seconde ne s'écrasent pas)
+_profile_numbers = itertools.count(1)
+
+def _method_names() -> Dict[Tuple[str, int, str], str]:
+    """
+    Associe la clé pstats (fichier, ligne, nom) de chaque méthode des classes profilées
+    à son nom qualifié (ex. "InvoiceParser.parse_pdf").
+    """
+    names = {}
+    for cls in PROFILED_CLASSES:
+        for name, attr in vars(cls).items():
+            code = getattr(getattr(attr, "__func__", attr), "__code__", None)
+            if code is not None:
+                names[(code.co_filename, code.co_firstlineno, code.co_name)] = f"{cls.__name__}.{name}"
+    return names
+
+def _short_path(filename: str) -> str:
+    """
+    Chemin d'un fichier source sans l'arborescence du serveur : relatif au paquet installé
+    (pdfminer/pdfparser.py), au projet (facture_to_excel.py) ou nom du fichier seul (bibliothèque standard).
+    """
+    if filename.startswith("~") or filename.startswith("<"):
+        return filename
+    parts = filename.replace("\\", "/").split("/")
+    if "site-packages" in parts or "dist-packages" in parts:
+        index = max(i for i, part in enumerate(parts) if part in ("site-packages", "dist-packages"))
+        return "/".join(parts[index + 1:])
+    return parts[-1]
+
+def _library_of(filename: str) -> str:
+    """
+    Regroupe un fichier source par bibliothèque : paquet installé (pdfminer, pdfplumber...),
+    module du projet, ou "python" pour la bibliothèque standard et les fonctions natives.
+    """
+    if filename.startswith("~") or filename.startswith("<"):
+        return "python"
+    parts = filename.replace("\\", "/").split("/")
+    if "site-packages" in parts or "dist-packages" in parts:
+        index = max(i for i, part in enumerate(parts) if part in ("site-packages", "dist-packages"))
+        return parts[index + 1].split(".")[0] if index + 1 < len(parts) else "python"
+    project_dir = os.path.dirname(os.path.abspath(__file__))
+    if os.path.abspath(filename).startswith(project_dir + os.sep):
+        return os.path.splitext(os.path.basename(filename))[0]
+    return "python"
+
+def build_report(stats: pstats.Stats, top: int = PROFILE_TOP) -> Dict[str, Any]:
+    """
+    Construit le rapport de profilage à partir des statistiques cProfile.
+
+    Args:
+        stats (pstats.Stats): Statistiques de l'appel profilé.
+        top (int): Nombre de fonctions listées par temps cumulé.
+
+    Returns:
+        dict: methodes (par méthode des classes profilées, par temps cumulé décroissant),
+              bibliotheques (temps propre par bibliothèque) et fonctions (les top fonctions
+              par temps cumulé : fonction, appels, cumul_s, propre_s).
+    """
+    method_names = _method_names()
+    methods: List[Dict[str, Any]] = []
+    libraries: Dict[str, float] = {}
+    for key, (_, calls, own_time, cumulative_time, _) in stats.stats.items():
+        library = _library_of(key[0])
+        libraries[library] = libraries.get(library, 0.0) + own_time
+        if key in method_names:
+            methods.append({"methode": method_names[key], "appels": calls,
+                            "cumul_s": round(cumulative_time, 6), "propre_s": round(own_time, 6)})
+    methods.sort(key=lambda entry: entry["cumul_s"], reverse=True)
+
+    functions = [
+        {"fonction": f"{_short_path(filename)}:{line}({name})" if line else name,
+         "appels": calls, "cumul_s": round(cumulative_time, 6), "propre_s": round(own_time, 6)}
+        for (filename, line, name), (_, calls, own_time, cumulative_time, _)
+        in sorted(stats.stats.items(), key=lambda entry: entry[1][3], reverse=True)[:top]
+    ]
+    return {
+        "methodes": methods,
+        "bibliotheques": {name: round(seconds, 6)
+                          for name, seconds in sorted(libraries.items(), key=lambda item: item[1], reverse=True)},
+        "fonctions": functions,
+    }
+
+def profile_call(func: Callable[..., Any], *args: Any, label: str = "analyse", output_dir: str = None,
+                 top: int = PROFILE_TOP, **kwargs: Any) -> Tuple[Any, Dict[str, Any]]:
+    """
+    Exécute func(*args, **kwargs) sous cProfile.
+
+    Args:
+        func (Callable): Fonction à profiler (ex. InvoiceParser().parse_pdf).
+        label (str): Libellé du profil (nom du document), repris dans les noms de fichiers.
+        output_dir (str, optional): Répertoire où écrire <label>-<horodatage>.prof et .txt
+            (PROFILE_DIR par défaut ; rien n'est écrit si aucun répertoire n'est configuré).
+            Les noms sont complétés par le pid et un numéro d'ordre.
+        top (int): Nombre de fonctions listées dans le rapport.
+
+    Returns:
+        tuple: (résultat de func, rapport). Le rapport contient libelle, duree_s, methodes,
+               bibliotheques, fonctions et, si le profil est écrit, fichier_profil et fichier_rapport.
+    """
+    profiler = cProfile.Profile()
+    start = time.perf_counter()
+    profiler.enable()
+    try:
+        result = func(*args, **kwargs)
+    finally:
+        profiler.disable()
+    duration = time.perf_counter() - start
+
+    stats = pstats.Stats(profiler)
+    report = {"libelle": label, "duree_s": round(duration, 6), **build_report(stats, top)}
+
+    output_dir = output_dir or PROFILE_DIR
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+        base = os.path.join(output_dir, f"{_UNSAFE_FILENAME_CHARS.sub('_', label)}-{time.strftime('%Y%m%d-%H%M%S')}"
+                                        f"-{os.getpid()}-{next(_profile_numbers)}")
+        stats.dump_stats(base + ".prof")
+        with open(base + ".txt", "w", encoding="utf-8") as f:
+            f.write(format_report(report))
+        report["fichier_profil"] = base + ".prof"
+        report["fichier_rapport"] = base + ".txt"
+    return result, report
+
+def format_report(report: Dict[str, Any]) -> str:
+    """
+    Met en forme un rapport de profilage pour la console ou un fichier texte.
+
+    Args:
+        report (dict): Rapport retourné par profile_call.
+
+    Returns:
+        str: Rapport lisible (méthodes, bibliothèques, fonctions les plus coûteuses).
+    """
+    lines = [f"Profil : {report['libelle']} ({report['duree_s']:.3f} s)", "", "Méthodes (temps cumulé / propre) :"]
+    for entry in report["methodes"]:
+        lines.append(f"  {entry['methode']:<50} {entry['appels']:>7} appels  {entry['cumul_s']:9.4f} s  "
+                     f"{entry['propre_s']:9.4f} s")
+    lines += ["", "Temps propre par bibliothèque :"]
+    for name, seconds in report["bibliotheques"].items():
+        lines.append(f"  {name:<50} {seconds:9.4f} s")
+    lines += ["", "Fonctions les plus coûteuses (temps cumulé / propre) :"]
+    for entry in report["fonctions"]:
+        lines.append(f"  {entry['fonction']:<70} {entry['appels']:>7} appels  {entry['cumul_s']:9.4f} s  "
+                     f"{entry['propre_s']:9.4f} s")
+    return "\n".join(lines)
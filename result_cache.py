@@ -0,0 +1,253 @@
+"""
+result_cache.py
+
+Cache des résultats d'analyse, indexé par le contenu du PDF.
+
+Fonctionnalités principales :
+- Calcule une clé à partir d'un hash SHA-256 des octets du PDF et de la version du parser.
+- Conserve les derniers résultats en mémoire (LRU borné).
+- Peut aussi les conserver sur disque (SQLite), avec durée de vie et nombre d'entrées maximal,
+  pour les partager entre processus et redémarrages.
+
+Un PDF renvoyé à l'identique (relance après timeout, doublon côté amont) est ainsi servi
+sans être rouvert par pdfplumber.
+
+Auteur  : Lam Clément
+Date    : 2024-06
+Licence : Usage interne VINCI Energies
+
+Dépendances :
+- facture_to_excel (PARSER_VERSION)
+- invoice_items (sérialisation JSON des items)
+"""
+
+import hashlib
+import io
+import json
+import os
+import sqlite3
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from typing import Any, Dict, Union
+
+from facture_to_excel import PARSER_VERSION, PdfSource
+from invoice_items import json_default
+
+# Taille des blocs lus pour hasher un fichier sans le charger entièrement
+_HASH_CHUNK_SIZE = 1 << 20
+
+def document_digest(source: PdfSource, namespace: str = "") -> str:
+    """
+    Calcule la clé de cache d'un PDF : SHA-256 de la version du parser, d'un espace de noms
+    (type de résultat mis en cache) et des octets du document.
+
+    Args:
+        source (PdfSource): Chemin, contenu brut ou flux binaire du PDF.
+        namespace (str): Distingue les résultats de natures différentes pour un même PDF.
+
+    Returns:
+        str: Empreinte hexadécimale.
+    """
+    digest = hashlib.sha256(f"{PARSER_VERSION}\0{namespace}\0".encode())
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, 'rb') as f:
+            for chunk in iter(lambda: f.read(_HASH_CHUNK_SIZE), b""):
+                digest.update(chunk)
+    elif isinstance(source, io.BytesIO):
+        # getbuffer évite une copie du contenu
+        with source.getbuffer() as view:
+            digest.update(view)
+    elif hasattr(source, "read"):
+        position = source.tell()
+        source.seek(0)
+        for chunk in iter(lambda: source.read(_HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+        source.seek(position)
+    else:
+        digest.update(source)
+    return digest.hexdigest()
+
+def _reset_locks_after_fork() -> None:
+    """
+    Recrée le verrou des caches de résultats dans un processus issu d'un fork (pool de
+    traitement par lot, analyse isolée) : un verrou tenu par un autre thread au moment du
+    fork ne serait jamais relâché dans l'enfant.
+    """
+    for cache in list(ResultCache._instances):
+        cache._lock = threading.Lock()
+
+class ResultCache:
+    """
+    Cache à deux niveaux des résultats d'analyse : LRU en mémoire, puis SQLite optionnel.
+    Les valeurs sont stockées sérialisées en JSON : chaque lecture retourne une copie
+    que l'appelant peut modifier sans altérer le cache. Dans un processus issu d'un fork,
+    le verrou est recréé et une nouvelle connexion SQLite est ouverte.
+
+    Les clés incluent PARSER_VERSION : toute modification du résultat d'analyse (clés,
+    types, valeurs) doit s'accompagner d'une incrémentation de facture_to_excel.PARSER_VERSION,
+    sans quoi les entrées déjà enregistrées (notamment sur disque) restent servies.
+
+    Attributs :
+        max_entries (int) : Nombre maximal d'entrées en mémoire.
+        db_path (str|None) : Fichier SQLite du niveau disque (None pour le désactiver).
+        ttl (float|None) : Durée de vie d'une entrée disque en secondes (None : illimitée).
+        max_disk_entries (int) : Nombre maximal d'entrées sur disque.
+        hits (int) : Lectures servies par le cache (mémoire ou disque).
+        misses (int) : Lectures sans résultat.
+    """
+
+    # Caches du processus, dont le verrou est recréé après un fork
+    _instances: "weakref.WeakSet[ResultCache]" = weakref.WeakSet()
+
+    def __init__(self, max_entries: int = 128, db_path: str = None, ttl: float = None,
+                 max_disk_entries: int = 10000):
+        """
+        Initialise le cache et crée la table SQLite si un fichier est fourni.
+
+        Args:
+            max_entries (int): Nombre maximal d'entrées en mémoire.
+            db_path (str, optional): Fichier SQLite du niveau disque.
+            ttl (float, optional): Durée de vie d'une entrée disque en secondes.
+            max_disk_entries (int): Nombre maximal d'entrées sur disque.
+        """
+        self.max_entries = max_entries
+        self.db_path = db_path
+        self.ttl = ttl
+        self.max_disk_entries = max_disk_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._connection = None
+        self._connection_pid = None
+        ResultCache._instances.add(self)
+
+    @property
+    def _db(self) -> Union[sqlite3.Connection, None]:
+        """
+        Connexion SQLite du processus courant (None si le niveau disque est désactivé).
+        Une connexion héritée d'un fork n'est jamais réutilisée : chaque processus ouvre la sienne.
+        """
+        if not self.db_path:
+            return None
+        if self._connection is None or self._connection_pid != os.getpid():
+            self._connection = sqlite3.connect(self.db_path, check_same_thread=False, timeout=30)
+            self._connection_pid = os.getpid()
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS results ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, created REAL NOT NULL, accessed REAL NOT NULL)"
+            )
+            self._connection.execute("CREATE INDEX IF NOT EXISTS results_accessed ON results (accessed)")
+            self._connection.commit()
+        return self._connection
+
+    def _remember(self, key: str, payload: str) -> None:
+        """
+        Ajoute une entrée au niveau mémoire en évinçant les plus anciennes (appel sous verrou).
+        """
+        self._entries[key] = payload
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def key_for(self, source: PdfSource, namespace: str = "") -> str:
+        """
+        Calcule la clé de cache d'un PDF (voir document_digest).
+
+        Args:
+            source (PdfSource): Chemin, contenu brut ou flux binaire du PDF.
+            namespace (str): Type de résultat mis en cache.
+
+        Returns:
+            str: Clé de cache.
+        """
+        return document_digest(source, namespace)
+
+    def get(self, key: str) -> Union[Dict[str, Any], None]:
+        """
+        Retourne le résultat mis en cache pour la clé, ou None.
+
+        Args:
+            key (str): Clé calculée par document_digest.
+
+        Returns:
+            dict|None: Copie du résultat, ou None si absent ou expiré.
+        """
+        with self._lock:
+            payload = self._entries.get(key)
+            db = self._db
+            if payload is not None:
+                self._entries.move_to_end(key)
+            elif db is not None:
+                now = time.time()
+                row = db.execute("SELECT value, created FROM results WHERE key = ?", (key,)).fetchone()
+                if row and self.ttl is not None and now - row[1] > self.ttl:
+                    db.execute("DELETE FROM results WHERE key = ?", (key,))
+                    db.commit()
+                    row = None
+                if row:
+                    payload = row[0]
+                    db.execute("UPDATE results SET accessed = ? WHERE key = ?", (now, key))
+                    db.commit()
+                    self._remember(key, payload)
+            if payload is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return json.loads(payload)
+
+    def set(self, key: str, value: Dict[str, Any]) -> None:
+        """
+        Enregistre un résultat dans les deux niveaux du cache.
+
+        Args:
+            key (str): Clé calculée par document_digest.
+            value (dict): Résultat sérialisable en JSON.
+        """
+        payload = json.dumps(value, ensure_ascii=False, default=json_default)
+        with self._lock:
+            self._remember(key, payload)
+            db = self._db
+            if db is not None:
+                now = time.time()
+                db.execute(
+                    "INSERT OR REPLACE INTO results (key, value, created, accessed) VALUES (?, ?, ?, ?)",
+                    (key, payload, now, now),
+                )
+                if self.ttl is not None:
+                    db.execute("DELETE FROM results WHERE created < ?", (now - self.ttl,))
+                # Au-delà de la taille maximale, on supprime les entrées les moins récemment lues
+                db.execute(
+                    "DELETE FROM results WHERE key IN ("
+                    "SELECT key FROM results ORDER BY accessed DESC LIMIT -1 OFFSET ?)",
+                    (self.max_disk_entries,),
+                )
+                db.commit()
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Retourne les compteurs du cache.
+
+        Returns:
+            dict: hits, misses et nombre d'entrées en mémoire.
+        """
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "entries": len(self._entries)}
+
+    def clear(self) -> None:
+        """
+        Vide les deux niveaux du cache et remet les compteurs à zéro.
+        """
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+            db = self._db
+            if db is not None:
+                db.execute("DELETE FROM results")
+                db.commit()
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_locks_after_fork)
@@ -0,0 +1,51 @@
+"""
+conftest.py
+
+Configuration commune des tests pytest.
+
+Fonctionnalités principales :
+- Rend importables les modules du projet et le générateur de PDF synthétiques des benchmarks.
+- Neutralise l'environnement avant l'import de l'API : pas de base /jobs partagée, pas de délai
+  d'analyse ni de cache disque hérités du shell.
+- Fixture invoice_pdf : bons de commande synthétiques (benchmarks/synthetic_pdf.make_invoice_pdf).
+
+Usage :
+    python -m pytest -q
+
+Auteur  : Lam Clément
+Date    : 2024-06
+Licence : Usage interne VINCI Energies
+"""
+
+import os
+import sys
+from typing import Callable, Dict, Tuple
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(REPO_DIR, "benchmarks"))
+sys.path.insert(0, REPO_DIR)
+
+# Lu à l'import des modules : doit précéder tout import du projet
+os.environ["JOBS_DB"] = ""
+os.environ["WARMUP"] = "0"
+for _name in ("PARSE_TIMEOUT_S", "RESULT_CACHE_DB", "PARSER_TEMPLATES", "PARSER_MAX_PAGES", "PROFILE_REQUESTS"):
+    os.environ.pop(_name, None)
+
+import pytest  # noqa: E402
+
+from synthetic_pdf import make_invoice_pdf  # noqa: E402
+
+@pytest.fixture(scope="session")
+def invoice_pdf() -> Callable[..., bytes]:
+    """
+    Fabrique de bons de commande synthétiques : invoice_pdf(pages, seed) retourne le contenu
+    du PDF, généré une seule fois par couple (pages, graine) pour toute la session.
+    """
+    generated: Dict[Tuple[int, int], bytes] = {}
+
+    def make(pages: int = 3, seed: int = 0) -> bytes:
+        if (pages, seed) not in generated:
+            generated[(pages, seed)] = make_invoice_pdf(pages, seed=seed)
+        return generated[(pages, seed)]
+
+    return make
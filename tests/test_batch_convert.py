@@ -0,0 +1,91 @@
+"""
+test_batch_convert.py
+
+Tests de la ligne de commande batch_convert : conversion d'un répertoire, reprise (--resume)
+des PDF dont la sortie est à jour selon la date de modification ou le hash du contenu (--check),
+et emplacement du fichier de suivi des hash, avec ou sans --output-dir.
+
+Auteur  : Lam Clément
+Date    : 2024-06
+Licence : Usage interne VINCI Energies
+"""
+
+import json
+import os
+import re
+
+import pytest
+
+import batch_convert
+from batch_convert import MANIFEST_NAME
+
+@pytest.fixture()
+def archives(tmp_path, invoice_pdf, monkeypatch):
+    """
+    Répertoire de deux bons de commande, et répertoire courant placé ailleurs.
+    """
+    directory = tmp_path / "archives"
+    directory.mkdir()
+    (directory / "a.pdf").write_bytes(invoice_pdf(1, seed=0))
+    (directory / "b.pdf").write_bytes(invoice_pdf(1, seed=1))
+    elsewhere = tmp_path / "ailleurs"
+    elsewhere.mkdir()
+    monkeypatch.chdir(elsewhere)
+    return directory
+
+def run(capsys, *argv) -> dict:
+    """
+    Lance un lot au format JSON sur un processus et retourne le décompte affiché.
+    """
+    assert batch_convert.main([*argv, "--format", "json", "--jobs", "1"]) == 0
+    found, skipped, converted = re.search(r"(\d+) PDF trouvés, (\d+) déjà à jour, (\d+) à convertir",
+                                          capsys.readouterr().out).groups()
+    return {"trouves": int(found), "ignores": int(skipped), "convertis": int(converted)}
+
+def make_older(path) -> None:
+    """
+    Recule la date de modification d'un fichier d'une heure.
+    """
+    stat = os.stat(path)
+    os.utime(path, (stat.st_atime - 3600, stat.st_mtime - 3600))
+
+def test_resume_by_mtime_skips_up_to_date_outputs(archives, capsys):
+    assert run(capsys, str(archives)) == {"trouves": 2, "ignores": 0, "convertis": 2}
+    with open(archives / "a.json", encoding="utf-8") as f:
+        assert json.load(f)["items"]
+
+    assert run(capsys, str(archives), "--resume") == {"trouves": 2, "ignores": 2, "convertis": 0}
+    # PDF plus récent que sa sortie : reconverti
+    make_older(archives / "a.json")
+    assert run(capsys, str(archives), "--resume") == {"trouves": 2, "ignores": 1, "convertis": 1}
+    # Sans --resume, tout est reconverti
+    assert run(capsys, str(archives)) == {"trouves": 2, "ignores": 0, "convertis": 2}
+    # Pas de fichier de suivi en mode mtime
+    assert not (archives / MANIFEST_NAME).exists()
+
+def test_resume_by_hash_ignores_mtime_and_detects_new_content(archives, capsys, invoice_pdf):
+    assert run(capsys, str(archives), "--check", "hash") == {"trouves": 2, "ignores": 0, "convertis": 2}
+    # Sans --output-dir : fichier de suivi à côté des sorties, pas dans le répertoire courant
+    assert not os.path.exists(MANIFEST_NAME)
+    with open(archives / MANIFEST_NAME, encoding="utf-8") as f:
+        assert sorted(json.load(f)) == ["a.json", "b.json"]
+
+    # Même contenu malgré une sortie plus ancienne que le PDF : conservée
+    make_older(archives / "a.json")
+    assert run(capsys, str(archives), "--resume", "--check", "hash") == {"trouves": 2, "ignores": 2, "convertis": 0}
+    # Contenu modifié : reconverti
+    (archives / "b.pdf").write_bytes(invoice_pdf(1, seed=2))
+    assert run(capsys, str(archives), "--resume", "--check", "hash") == {"trouves": 2, "ignores": 1, "convertis": 1}
+    assert run(capsys, str(archives), "--resume", "--check", "hash") == {"trouves": 2, "ignores": 2, "convertis": 0}
+
+def test_hash_manifest_in_output_dir(archives, capsys, tmp_path):
+    output_dir = tmp_path / "sorties"
+    argv = (str(archives), "--output-dir", str(output_dir), "--check", "hash")
+    assert run(capsys, *argv) == {"trouves": 2, "ignores": 0, "convertis": 2}
+
+    assert sorted(os.listdir(output_dir)) == sorted([MANIFEST_NAME, "a.json", "b.json"])
+    assert not (archives / MANIFEST_NAME).exists()
+    assert run(capsys, *argv, "--resume") == {"trouves": 2, "ignores": 2, "convertis": 0}
+    # Sortie supprimée : reconvertie même si le hash est connu
+    (output_dir / "a.json").unlink()
+    assert run(capsys, *argv, "--resume") == {"trouves": 2, "ignores": 1, "convertis": 1}
@@ -0,0 +1,112 @@
+"""
+test_fr_numbers.py
+
+Tests de la normalisation des nombres au format français (fr_numbers) : séparateurs de milliers
+(point, espace, espaces insécables), nombres négatifs, valeurs non numériques, traitement par
+colonne et contrôle de cohérence des totaux.
+
+Auteur  : Lam Clément
+Date    : 2024-06
+Licence : Usage interne VINCI Energies
+"""
+
+from decimal import Decimal
+
+import pytest
+
+from fr_numbers import (AMOUNT_FIELDS, check_totals, clean_fr_number, normalize_amount, normalize_items,
+                        strip_thousands, to_decimal, to_float)
+from invoice_items import ItemTable
+
+NBSP, NNBSP = "\u00a0", "\u202f"  # espace insécable, espace fine insécable
+
+# (texte, clean_fr_number, strip_thousands, to_decimal)
+NUMBERS = [
+    ("1234,56", "1234,56", "1234,56", Decimal("1234.56")),
+    ("1 234,56", "1234,56", "1234,56", Decimal("1234.56")),
+    ("1.234,56", "1234,56", "1234,56", Decimal("1234.56")),
+    (f"1{NBSP}234,56", "1234,56", "1234,56", Decimal("1234.56")),
+    (f"1{NNBSP}234{NNBSP}567,80", "1234567,8", "1234567,80", Decimal("1234567.80")),
+    ("1.000,00", "1000", "1000,00", Decimal("1000.00")),
+    ("12,50", "12,5", "12,50", Decimal("12.50")),
+    ("3", "3", "3", Decimal("3")),
+    ("-1.234,56", "-1234,56", "-1234,56", Decimal("-1234.56")),
+    ("-0,50", "-0,5", "-0,50", Decimal("-0.50")),
+    (" 7,00 ", "7", "7,00", Decimal("7.00")),
+]
+
+# Valeurs non numériques : clean_fr_number les laisse (presque) intactes, to_decimal retourne None
+NOT_NUMBERS = [
+    ("PCE", "PCE"),
+    ("", ""),
+    ("1,2,3", "1,2,3"),
+    ("12 mois", "12mois"),
+    ("NaN", "NaN"),
+    ("Infinity", "Infinity"),
+]
+
+@pytest.mark.parametrize("text, cleaned, stripped, number", NUMBERS, ids=[row[0] for row in NUMBERS])
+def test_french_numbers(text, cleaned, stripped, number):
+    assert clean_fr_number(text.strip()) == cleaned
+    assert strip_thousands(text.strip()) == stripped
+    assert to_decimal(text) == number
+    assert to_float(text) == float(number)
+
+@pytest.mark.parametrize("text, cleaned", NOT_NUMBERS, ids=[row[0] or "vide" for row in NOT_NUMBERS])
+def test_non_numbers(text, cleaned):
+    assert clean_fr_number(text) == cleaned
+    assert to_decimal(text) is None
+    assert to_float(text) is None
+
+@pytest.mark.parametrize("value", [None, 3, 2.5, Decimal("1.5")])
+def test_non_text_values(value):
+    assert clean_fr_number(value) == value
+    assert to_decimal(value) == (None if value is None else Decimal(str(value)))
+
+@pytest.mark.parametrize("numeric, expected", [(None, "1234,5"), ("decimal", Decimal("1234.50")),
+                                               ("float", 1234.5)])
+def test_normalize_amount(numeric, expected):
+    assert normalize_amount("1.234,50", numeric) == expected
+    assert normalize_amount(None, numeric) is None
+
+def test_normalize_amount_rejects_unknown_type():
+    with pytest.raises(ValueError):
+        normalize_amount("1,00", "int")
+
+def test_normalize_items_list_and_table_agree():
+    records = [{"position": "10", "quantite": "1.000", "prix_unitaire": "12,50", "unite": "PCE"},
+               {"position": "20", "quantite": "2", "prix_unitaire": "1.100,00", "unite": "M"}]
+    table = normalize_items(ItemTable(records), "decimal")
+    listed = normalize_items([dict(record) for record in records], "decimal")
+
+    assert AMOUNT_FIELDS == ("quantite", "prix_unitaire")
+    assert table.to_records() == [{**record, **listed[i]} for i, record in enumerate(table.to_records())]
+    assert [item["quantite"] for item in listed] == [Decimal("1000"), Decimal("2")]
+    assert [item["unite"] for item in listed] == ["PCE", "M"]
+
+@pytest.mark.parametrize("items, total_ht, expected", [
+    # Somme exacte : 3 x 12,50 + 2 x 1.100,00 = 2.237,50
+    ([("3", "12,50"), ("2", "1.100,00")], "2.237,50",
+     {"somme_lignes": Decimal("2237.50"), "ecart": Decimal("0.00"), "lignes_incompletes": 0, "coherent": True}),
+    # Arrondi de chaque ligne au centime, écart dans la tolérance
+    ([("3", "0,333")], "1,00",
+     {"somme_lignes": Decimal("1.00"), "ecart": Decimal("0.00"), "lignes_incompletes": 0, "coherent": True}),
+    # Écart supérieur au centime
+    ([("1", "10,00")], "10,02",
+     {"somme_lignes": Decimal("10.00"), "ecart": Decimal("-0.02"), "lignes_incompletes": 0, "coherent": False}),
+    # Ligne sans quantité : incohérent même si la somme tombe juste
+    ([("1", "10,00"), (None, "5,00")], "10,00",
+     {"somme_lignes": Decimal("10.00"), "ecart": Decimal("0.00"), "lignes_incompletes": 1, "coherent": False}),
+    # Total HT absent
+    ([("1", "10,00")], None,
+     {"somme_lignes": Decimal("10.00"), "ecart": None, "lignes_incompletes": 0, "coherent": False}),
+    # Séparateurs espaces et montant négatif (avoir)
+    ([("1", f"1{NBSP}000,00"), ("1", "-250,00")], "750,00",
+     {"somme_lignes": Decimal("750.00"), "ecart": Decimal("0.00"), "lignes_incompletes": 0, "coherent": True}),
+])
+def test_check_totals(items, total_ht, expected):
+    records = [{"quantite": quantity, "prix_unitaire": unit_price} for quantity, unit_price in items]
+    for source in (records, ItemTable(records)):
+        result = check_totals(source, total_ht)
+        assert {key: result[key] for key in expected} == expected
+        assert result["total_ht"] == to_decimal(total_ht)
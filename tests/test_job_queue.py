@@ -0,0 +1,198 @@
+"""
+test_job_queue.py
+
+Tests de la file de traitements asynchrones (job_queue.JobQueue) et des routes /jobs :
+soumission, suivi des statuts (en attente, en cours, terminé, erreur), file pleine, statuts
+partagés par le fichier SQLite et traitements abandonnés par un processus arrêté (bail expiré).
+
+Auteur  : Lam Clément
+Date    : 2024-06
+Licence : Usage interne VINCI Energies
+"""
+
+import base64
+import sqlite3
+import threading
+import time
+
+import pytest
+
+import api_pdf_convert
+from job_queue import (JobQueue, QueueFullError, STATUS_DONE, STATUS_FAILED, STATUS_PENDING,
+                       STATUS_RUNNING)
+
+def wait_for(jobs: JobQueue, job_id: str, statuses, timeout: float = 30.0) -> dict:
+    """
+    Interroge la file jusqu'à ce que le traitement atteigne l'un des statuts attendus.
+    """
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = jobs.get(job_id)
+        if job is not None and job["status"] in statuses:
+            return job
+        time.sleep(0.01)
+    raise AssertionError(f"Statut {statuses} non atteint : {jobs.get(job_id)}")
+
+@pytest.fixture(params=["memoire", "sqlite"])
+def db_path(request, tmp_path):
+    """
+    Statuts en mémoire (None) ou dans un fichier SQLite partagé.
+    """
+    return None if request.param == "memoire" else str(tmp_path / "jobs.sqlite3")
+
+def test_submit_then_poll_until_done(db_path):
+    jobs = JobQueue(lambda payload: {"double": payload * 2}, workers=1, db_path=db_path)
+    job_id = jobs.submit(21)
+
+    job = wait_for(jobs, job_id, (STATUS_DONE,))
+    assert job["result"] == {"double": 42}
+    assert job["submitted_at"] <= job["started_at"] <= job["finished_at"]
+    assert "error" not in job
+    assert jobs.get("inconnu") is None
+
+def test_handler_exception_gives_error_status(db_path):
+    def handler(payload):
+        raise ValueError(f"PDF illisible : {payload}")
+
+    jobs = JobQueue(handler, workers=1, db_path=db_path)
+    job_id = jobs.submit("commande.pdf")
+
+    job = wait_for(jobs, job_id, (STATUS_FAILED,))
+    assert job["error"] == "PDF illisible : commande.pdf"
+    assert "result" not in job
+    assert "finished_at" in job
+
+def test_pending_and_running_statuses(db_path):
+    release = threading.Event()
+    jobs = JobQueue(lambda payload: release.wait(10) and payload, workers=1, db_path=db_path)
+    first, second = jobs.submit("a"), jobs.submit("b")
+
+    assert wait_for(jobs, first, (STATUS_RUNNING,))["status"] == STATUS_RUNNING
+    # Un seul thread : le second attend que le premier se termine
+    assert jobs.get(second)["status"] == STATUS_PENDING
+    assert "started_at" not in jobs.get(second)
+
+    release.set()
+    assert wait_for(jobs, first, (STATUS_DONE,))["result"] == "a"
+    assert wait_for(jobs, second, (STATUS_DONE,))["result"] == "b"
+
+def test_full_queue_refuses_submission():
+    release = threading.Event()
+    jobs = JobQueue(lambda payload: release.wait(10), workers=1, max_queue=1)
+    running = jobs.submit("a")
+    wait_for(jobs, running, (STATUS_RUNNING,))
+    jobs.submit("b")
+
+    with pytest.raises(QueueFullError):
+        jobs.submit("c")
+    assert jobs.stats() == {"queued": 1, "workers": 1, "max_queue": 1}
+    release.set()
+
+def test_status_shared_through_sqlite(tmp_path):
+    db_path = str(tmp_path / "jobs.sqlite3")
+    worker = JobQueue(lambda payload: payload.upper(), workers=1, db_path=db_path)
+    # Autre worker gunicorn : ne fait que consulter le fichier partagé
+    other = JobQueue(lambda payload: None, db_path=db_path)
+
+    job_id = worker.submit("commande")
+    assert wait_for(other, job_id, (STATUS_DONE,))["result"] == "COMMANDE"
+
+def test_finished_jobs_are_bounded(db_path):
+    jobs = JobQueue(lambda payload: payload, workers=1, max_finished=2, db_path=db_path)
+    job_ids = [jobs.submit(index) for index in range(4)]
+    wait_for(jobs, job_ids[-1], (STATUS_DONE,))
+
+    assert [jobs.get(job_id) is not None for job_id in job_ids] == [False, False, True, True]
+
+def _insert_job(db_path: str, job_id: str, status: str, lease_until) -> None:
+    """
+    Écrit un traitement comme l'aurait laissé un worker arrêté en cours de traitement.
+    """
+    with sqlite3.connect(db_path) as connection:
+        connection.execute(
+            "INSERT INTO jobs (job_id, status, submitted_at, started_at, owner, lease_until) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (job_id, status, time.time() - 120, time.time() - 110, "hote:4242:disparu", lease_until),
+        )
+
+@pytest.mark.parametrize("status", [STATUS_PENDING, STATUS_RUNNING])
+def test_expired_lease_moves_job_to_error(tmp_path, status):
+    db_path = str(tmp_path / "jobs.sqlite3")
+    # Première consultation : crée la table
+    assert JobQueue(lambda payload: None, db_path=db_path).get("absent") is None
+    _insert_job(db_path, "abandonne", status, time.time() - 1)
+    _insert_job(db_path, "actif", status, time.time() + 60)
+
+    # Nouveau worker (redémarrage) : le traitement sans bail valide n'est plus attendu
+    jobs = JobQueue(lambda payload: None, db_path=db_path)
+    job = jobs.get("abandonne")
+    assert job["status"] == STATUS_FAILED
+    assert "processus" in job["error"]
+    assert "finished_at" in job
+    # Bail encore valide : détenu par un worker vivant
+    assert jobs.get("actif")["status"] == status
+
+def test_jobs_from_database_without_lease_expire_at_startup(tmp_path):
+    db_path = str(tmp_path / "jobs.sqlite3")
+    with sqlite3.connect(db_path) as connection:
+        connection.execute(
+            "CREATE TABLE jobs (job_id TEXT PRIMARY KEY, status TEXT NOT NULL, submitted_at REAL NOT NULL, "
+            "started_at REAL, finished_at REAL, result TEXT, error TEXT)"
+        )
+        connection.execute("INSERT INTO jobs (job_id, status, submitted_at, started_at) VALUES (?, ?, ?, ?)",
+                           ("ancien", STATUS_RUNNING, time.time() - 120, time.time() - 110))
+        connection.execute("INSERT INTO jobs (job_id, status, submitted_at, finished_at, result) "
+                           "VALUES (?, ?, ?, ?, ?)", ("fini", STATUS_DONE, time.time() - 120, time.time() - 100, "1"))
+
+    jobs = JobQueue(lambda payload: None, db_path=db_path)
+    assert jobs.get("ancien")["status"] == STATUS_FAILED
+    # Traitement terminé : inchangé
+    assert jobs.get("fini")["status"] == STATUS_DONE
+    assert jobs.get("fini")["result"] == 1
+
+def test_lease_renewed_while_running(tmp_path):
+    db_path = str(tmp_path / "jobs.sqlite3")
+    release = threading.Event()
+    jobs = JobQueue(lambda payload: release.wait(10) and payload, workers=1, db_path=db_path, lease=0.3)
+    other = JobQueue(lambda payload: None, db_path=db_path, lease=0.3)
+    job_id = jobs.submit("long")
+    wait_for(other, job_id, (STATUS_RUNNING,))
+
+    # Plusieurs durées de bail : le worker vivant le renouvelle
+    time.sleep(1.0)
+    assert other.get(job_id)["status"] == STATUS_RUNNING
+    release.set()
+    assert wait_for(other, job_id, (STATUS_DONE,))["result"] == "long"
+
+def test_jobs_routes(invoice_pdf, monkeypatch):
+    monkeypatch.setattr(api_pdf_convert, "JOB_QUEUE", JobQueue(api_pdf_convert.run_job, workers=1,
+                                                               json_default=api_pdf_convert.json_default))
+    api_pdf_convert.RESULT_CACHE.clear()
+    client = api_pdf_convert.app.test_client()
+    payload = {"filename": "commande.pdf", "filecontent": base64.b64encode(invoice_pdf(2, seed=5)).decode()}
+
+    response = client.post("/jobs", json=payload)
+    assert response.status_code == 202
+    job_id = response.get_json()["job_id"]
+    assert response.headers["Location"] == f"/jobs/{job_id}"
+    assert response.get_json()["status"] in (STATUS_PENDING, STATUS_RUNNING)
+
+    wait_for(api_pdf_convert.JOB_QUEUE, job_id, (STATUS_DONE, STATUS_FAILED), timeout=120)
+    response = client.get(f"/jobs/{job_id}")
+    assert response.status_code == 200
+    assert response.get_json()["status"] == STATUS_DONE
+    assert response.get_json()["result"] == client.post("/upload", json=payload).get_json()
+
+    assert client.post("/jobs", json={"filename": "vide.pdf"}).status_code == 400
+    assert client.get("/jobs/inconnu").status_code == 404
+
+def test_jobs_route_reports_unreadable_pdf(monkeypatch):
+    monkeypatch.setattr(api_pdf_convert, "JOB_QUEUE", JobQueue(api_pdf_convert.run_job, workers=1))
+    client = api_pdf_convert.app.test_client()
+    filecontent = base64.b64encode(b"pas un PDF").decode()
+
+    job_id = client.post("/jobs", json={"filename": "x.pdf", "filecontent": filecontent}).get_json()["job_id"]
+    wait_for(api_pdf_convert.JOB_QUEUE, job_id, (STATUS_DONE, STATUS_FAILED), timeout=120)
+    job = client.get(f"/jobs/{job_id}").get_json()
+    assert job["status"] == STATUS_FAILED
+    assert job["error"]
@@ -0,0 +1,155 @@
+"""
+test_layout_templates.py
+
+Tests des modèles de mise en page (layout_templates) et de l'extraction des items par
+colonnes (InvoiceParser._column_parse).
+
+Auteur  : Lam Clément
+Date    : 2024-06
+Licence : Usage interne VINCI Energies
+"""
+
+import io
+from typing import List, Tuple
+
+import pytest
+
+from facture_to_excel import InvoiceParser
+from layout_templates import GENERIC_TEMPLATE, STANDARD_TEMPLATE, LayoutTemplate, TemplateRegistry
+from pdf_builder import TextLine, build_pdf
+
+# Modèle d'un fournisseur dont les colonnes d'items sont connues
+SUPPLIER_TEMPLATE = {
+    "name": "fournisseur_x",
+    "keywords": ["fournisseur x"],
+    "page_size": [595, 842],
+    "fonts": ["Helvetica"],
+    "plan": {
+        "delivery_zone": [290, 295, 500, 340],
+        "delivery_header": "Livrer à\\s*:",
+        "order_number": "Réf commande\\s*:\\s*(\\S+)",
+        "objet_keywords": ["sujet", "fin sujet"],
+        "columns": {"position": [30, 70], "designation": [70, 150], "quantite": [290, 340],
+                    "unite": [340, 375], "prix_unitaire": [375, 440]},
+    },
+}
+
+# Lignes d'items : (position, article, quantité, unité, prix unitaire, nom du produit)
+Row = Tuple[str, str, str, str, str, str]
+
+def _supplier_page(rows: List[Row], first: bool, footer: str) -> List[TextLine]:
+    """
+    Lignes positionnées d'une page du fournisseur : chaque valeur est placée dans sa colonne.
+    """
+    lines: List[TextLine] = []
+    if first:
+        lines += [(40, 40, 14, "FOURNISSEUR X"), (330, 70, 9, "Réf commande : CX-778"),
+                  (40, 160, 9, "SUJET"), (40, 175, 9, "Travaux lot 4"), (40, 190, 9, "FIN SUJET"),
+                  (300, 300, 8, "Livrer à :"), (300, 312, 8, "5 avenue Foch"), (300, 324, 8, "69000 LYON")]
+    top = 400 if first else 430
+    for position, article, quantity, unit, unit_price, name in rows:
+        for x, value in ((40, position), (80, article), (300, quantity), (345, unit), (380, unit_price)):
+            if value:
+                lines.append((x, top, 8, value))
+        if name:
+            lines.append((40, top + 11, 8, name))
+        top += 26
+    lines.append((480, 810, 8, footer))
+    return lines
+
+@pytest.fixture(scope="module")
+def supplier_pdf() -> bytes:
+    """
+    Commande de deux pages du fournisseur : quantité absente sur la ligne 20, désignation de
+    la ligne 30 reportée en haut de la page 2.
+    """
+    page_1 = _supplier_page([("10", "555", "3", "PCE", "12,50", "Vis inox M6"),
+                             ("20", "556", "", "M", "1.100,00", "Cable"),
+                             ("30", "557", "2", "KG", "7,00", "")], True, "Page 1 / 2")
+    page_2 = [(40, 390, 8, "Montant HT"), (40, 402, 8, "Colle spéciale")]
+    page_2 += _supplier_page([("40", "558", "9", "UN", "1,00", "Gaine")], False, "Page 2 / 2")
+    return build_pdf([page_1, page_2])
+
+@pytest.fixture()
+def registry() -> TemplateRegistry:
+    return TemplateRegistry([LayoutTemplate.from_dict(SUPPLIER_TEMPLATE), STANDARD_TEMPLATE])
+
+def test_column_plan_reads_items_by_column(supplier_pdf, registry):
+    result = InvoiceParser(templates=registry, layout=True).parse_pdf(io.BytesIO(supplier_pdf))
+
+    assert result["modele"] == "fournisseur_x"
+    assert result["numero_commande"] == "CX-778"
+    assert result["objet"] == "Travaux lot 4"
+    assert result["lieu_livraison"] == "5 avenue Foch\n69000 LYON"
+    assert result["items"].to_records() == [
+        {"position": "10", "designation": "555", "nom_produit": "Vis inox M6", "quantite": "3",
+         "unite": "PCE", "prix_unitaire": "12,50", "date_livraison": None},
+        {"position": "20", "designation": "556", "nom_produit": "Cable", "quantite": None,
+         "unite": "M", "prix_unitaire": "1.100,00", "date_livraison": None},
+        {"position": "30", "designation": "557", "nom_produit": "Colle spéciale", "quantite": "2",
+         "unite": "KG", "prix_unitaire": "7,00", "date_livraison": None},
+        {"position": "40", "designation": "558", "nom_produit": "Gaine", "quantite": "9",
+         "unite": "UN", "prix_unitaire": "1,00", "date_livraison": None},
+    ]
+
+def test_column_plan_is_used_only_with_layout_engine(supplier_pdf, registry, monkeypatch):
+    calls = []
+    original = InvoiceParser._column_parse
+    monkeypatch.setattr(InvoiceParser, "_column_parse",
+                        lambda self, *args, **kwargs: calls.append(args) or original(self, *args, **kwargs))
+
+    InvoiceParser(templates=registry, layout=True).parse_pdf(io.BytesIO(supplier_pdf))
+    assert len(calls) == 2
+
+    calls.clear()
+    # Sans index des mots, l'heuristique ne sait pas placer les valeurs d'une ligne incomplète
+    result = InvoiceParser(templates=registry, layout=False).parse_pdf(io.BytesIO(supplier_pdf))
+    assert calls == []
+    assert result["modele"] == "fournisseur_x"
+    assert result["items"][1]["unite"] is None
+
+def test_unknown_document_keeps_generic_heuristic(invoice_pdf):
+    pdf = invoice_pdf(3)
+    registry = TemplateRegistry([LayoutTemplate.from_dict(SUPPLIER_TEMPLATE)])
+
+    result = InvoiceParser(templates=registry).parse_pdf(io.BytesIO(pdf))
+    reference = InvoiceParser(templates=TemplateRegistry()).parse_pdf(io.BytesIO(pdf))
+
+    assert result["modele"] == GENERIC_TEMPLATE
+    assert result["items"] == reference["items"]
+    assert registry.stats()[GENERIC_TEMPLATE]["documents"] == 1
+
+def test_template_requires_all_keywords_and_page_size():
+    template = LayoutTemplate.from_dict(SUPPLIER_TEMPLATE)
+    registry = TemplateRegistry([template])
+    page = _supplier_page([], True, "Page 1 / 1")
+    pdf = build_pdf([page])
+
+    assert InvoiceParser(templates=registry).parse_pdf(io.BytesIO(pdf))["modele"] == "fournisseur_x"
+    other = build_pdf([[line for line in page if line[3] != "FOURNISSEUR X"]])
+    assert InvoiceParser(templates=registry).parse_pdf(io.BytesIO(other))["modele"] == GENERIC_TEMPLATE
+
+@pytest.mark.parametrize("page_end, carried", [
+    ("Page 1 / 2", "Colle spéciale"),               # pied de page : désignation reportée
+    ("Montant total HT 33,50 EUR", "Colle spéciale"),  # ligne de total : désignation reportée
+    ("", None),                                      # dernière ligne de la page : rien à reporter
+])
+def test_column_plan_carries_name_across_pages_like_heuristic(registry, page_end, carried):
+    page_1 = _supplier_page([("10", "555", "3", "PCE", "12,50", "Vis inox M6"),
+                             ("30", "557", "2", "KG", "7,00", "")], True, page_end)
+    page_2 = [(40, 390, 8, "Montant HT"), (40, 402, 8, "Colle spéciale")]
+    page_2 += _supplier_page([("40", "558", "9", "UN", "1,00", "Gaine")], False, "Page 2 / 2")
+    pdf = build_pdf([page_1, page_2])
+
+    by_columns = InvoiceParser(templates=registry, layout=True).parse_pdf(io.BytesIO(pdf))
+    by_heuristic = InvoiceParser(templates=TemplateRegistry(), layout=True).parse_pdf(io.BytesIO(pdf))
+
+    assert by_columns["items"][1]["nom_produit"] == carried
+    assert by_heuristic["items"][1]["nom_produit"] == carried
+
+def test_column_plan_keeps_name_empty_when_next_page_has_none(registry):
+    page_1 = _supplier_page([("30", "557", "2", "KG", "7,00", "")], True, "Page 1 / 2")
+    page_2 = _supplier_page([("40", "558", "9", "UN", "1,00", "Gaine")], False, "Page 2 / 2")
+
+    result = InvoiceParser(templates=registry, layout=True).parse_pdf(io.BytesIO(build_pdf([page_1, page_2])))
+    assert result["items"][0]["nom_produit"] is None
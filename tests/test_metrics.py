@@ -0,0 +1,94 @@
+"""
+test_metrics.py
+
+Tests de /metrics : après un envoi sur /upload, les histogrammes de durée par étape, de pages
+et d'items et les compteurs de requêtes et de caches exposés au format Prometheus reflètent
+cette analyse.
+
+Auteur  : Lam Clément
+Date    : 2024-06
+Licence : Usage interne VINCI Energies
+"""
+
+import re
+from typing import Dict, FrozenSet, Tuple
+
+import api_pdf_convert
+import facture_to_excel
+
+# Ligne d'échantillon : nom{étiquettes} valeur
+_SAMPLE = re.compile(r'^(?P<name>[a-z_]+)(?:\{(?P<labels>[^}]*)\})? (?P<value>\S+)$')
+
+Samples = Dict[Tuple[str, FrozenSet[Tuple[str, str]]], float]
+
+def scrape(client) -> Samples:
+    """
+    Lit /metrics et retourne les échantillons par (nom, étiquettes).
+    """
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.mimetype == "text/plain"
+    samples: Samples = {}
+    for line in response.get_data(as_text=True).splitlines():
+        match = _SAMPLE.match(line)
+        if match:
+            labels = frozenset(re.findall(r'(\w+)="([^"]*)"', match["labels"] or ""))
+            samples[(match["name"], labels)] = float(match["value"])
+    return samples
+
+def delta(before: Samples, after: Samples, name: str, **labels: str) -> float:
+    """
+    Variation d'un échantillon entre deux lectures (absent : 0).
+    """
+    key = (name, frozenset(labels.items()))
+    return after.get(key, 0.0) - before.get(key, 0.0)
+
+def test_metrics_after_one_upload(invoice_pdf):
+    api_pdf_convert.RESULT_CACHE.clear()
+    facture_to_excel.PAGE_TEXT_CACHE.clear()
+    client = api_pdf_convert.app.test_client()
+    before = scrape(client)
+
+    response = client.post("/upload", data=invoice_pdf(2, seed=5), content_type="application/pdf")
+    assert response.status_code == 200
+    item_count = len(response.get_json()["items"])
+    after = scrape(client)
+
+    # Une observation par étape du traitement, deux extractions de texte (une par page)
+    for stage in ("lecture_corps", "ouverture_pdf", "detection_modele", "nettoyage", "serialisation"):
+        assert delta(before, after, "facture_stage_seconds_count", stage=stage) == 1, stage
+        assert delta(before, after, "facture_stage_seconds_sum", stage=stage) > 0, stage
+        assert delta(before, after, "facture_stage_seconds_bucket", stage=stage, le="+Inf") == 1, stage
+    assert delta(before, after, "facture_stage_seconds_count", stage="extraction_texte") == 2
+
+    assert delta(before, after, "facture_pdf_pages_count") == 1
+    assert delta(before, after, "facture_pdf_pages_sum") == 2
+    assert delta(before, after, "facture_pdf_pages_bucket", le="2") == 1
+    assert delta(before, after, "facture_pdf_pages_bucket", le="1") == 0
+    assert delta(before, after, "facture_pdf_items_count") == 1
+    assert delta(before, after, "facture_pdf_items_sum") == item_count
+
+    assert delta(before, after, "facture_http_requests_total", endpoint="/upload", status="200") == 1
+    assert delta(before, after, "facture_http_request_seconds_count", endpoint="/upload") == 1
+    # La lecture précédente de /metrics est elle-même comptée
+    assert delta(before, after, "facture_http_requests_total", endpoint="/metrics", status="200") == 1
+    assert after[("facture_cache_misses_total", frozenset({("cache", "reponses")}))] == 1
+    assert after[("facture_cache_hits_total", frozenset({("cache", "reponses")}))] == 0
+
+    # Même document : servi par le cache de réponses, sans nouvelle analyse
+    client.post("/upload", data=invoice_pdf(2, seed=5), content_type="application/pdf")
+    again = scrape(client)
+    assert again[("facture_cache_hits_total", frozenset({("cache", "reponses")}))] == 1
+    assert delta(after, again, "facture_pdf_pages_count") == 0
+    assert delta(after, again, "facture_http_requests_total", endpoint="/upload", status="200") == 1
+
+def test_errors_counted_by_source():
+    client = api_pdf_convert.app.test_client()
+    before = scrape(client)
+
+    response = client.post("/upload", json={"filename": "x.pdf", "filecontent": "pas du base64 !"})
+    assert response.status_code == 422
+    after = scrape(client)
+
+    assert delta(before, after, "facture_errors_total", source="upload") == 1
+    assert delta(before, after, "facture_http_requests_total", endpoint="/upload", status="422") == 1
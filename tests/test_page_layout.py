@@ -0,0 +1,85 @@
+"""
+test_page_layout.py
+
+Tests différentiels du moteur de mise en page : le texte d'une page et celui d'une zone doivent
+être identiques à ceux de pdfplumber (extract_text, crop(bbox).extract_text) sur des pages
+à plusieurs colonnes, ordonnées irrégulières et polices de tailles mélangées.
+
+Auteur  : Lam Clément
+Date    : 2024-06
+Licence : Usage interne VINCI Energies
+"""
+
+import io
+import random
+
+import pdfplumber
+import pytest
+from pdfminer.fontmetrics import FONT_METRICS
+
+from page_layout import PageLayout
+from pdf_builder import build_pdf
+
+WORDS = ["Ref", "Désignation", "Qté", "1.234,56", "Montant", "EUR", "Lot A", "Total HT"]
+SIZES = [7, 8, 9, 10, 12, 14]
+HELVETICA_WIDTHS = FONT_METRICS["Helvetica"][1]
+
+def _width(text, size):
+    """
+    Largeur d'un texte en Helvetica (métriques standard utilisées par pdfminer).
+    """
+    return sum(HELVETICA_WIDTHS.get(char, 556) for char in text) * size / 1000
+
+def jittered_pages(n_pages, seed, row_gap, word_gap=(0, 2)):
+    """
+    Pages de 2 à 4 colonnes par rangée ; chaque cellule est écrite en un ou deux morceaux
+    de polices différentes (7 à 14 pt), décalés verticalement (±2,5 pt), dans un ordre
+    aléatoire. row_gap (min, max) règle l'écart entre rangées et word_gap (min, max) celui
+    entre les deux morceaux d'une cellule (moins de 3 pt : pdfplumber en fait un seul mot).
+    """
+    rng = random.Random(seed)
+    pages = []
+    for _ in range(n_pages):
+        lines = []
+        top = 40.0
+        while top < 780:
+            for column in range(rng.randint(2, 4)):
+                x = 40 + column * 130 + rng.uniform(-4, 4)
+                for _ in range(rng.randint(1, 2)):
+                    size, text = rng.choice(SIZES), rng.choice(WORDS)
+                    lines.append((x, top + rng.uniform(-2.5, 2.5), size, text))
+                    x += _width(text, size) + rng.uniform(*word_gap)
+            top += rng.uniform(*row_gap)
+        rng.shuffle(lines)
+        pages.append(lines)
+    return pages
+
+@pytest.mark.parametrize("row_gap", [(8, 20), (20, 30)])
+def test_page_text_matches_extract_text(row_gap):
+    pdf = build_pdf(jittered_pages(40, seed=0, row_gap=row_gap))
+    with pdfplumber.open(io.BytesIO(pdf)) as document:
+        differing = [page.page_number for page in document.pages
+                     if PageLayout.from_page(page).text != (page.extract_text() or "")]
+    assert differing == []
+
+def test_zone_text_matches_crop():
+    # Morceaux séparés : deux morceaux accolés de hauteurs différentes, ramenés à la même
+    # hauteur par le recadrage, seraient fusionnés en un mot par pdfplumber (voir zone_text)
+    pdf = build_pdf(jittered_pages(20, seed=1, row_gap=(20, 30), word_gap=(4, 8)))
+    rng = random.Random(2)
+    differing = []
+    with pdfplumber.open(io.BytesIO(pdf)) as document:
+        for page in document.pages:
+            layout = PageLayout.from_page(page)
+            for _ in range(20):
+                x0, top = rng.uniform(0, 400), rng.uniform(0, 700)
+                bbox = (x0, top, x0 + rng.uniform(20, 195), top + rng.uniform(10, 140))
+                if layout.zone_text(*bbox) != (page.crop(bbox).extract_text() or ""):
+                    differing.append((page.page_number, bbox))
+    assert differing == []
+
+def test_words_of_one_row_split_by_another_row_stay_apart():
+    # Ordre de lecture : a (top 100), b (top 104, autre groupe), c (top 101, même groupe que a)
+    words = [(text, x0, top, x0 + 10, top + 8, ()) for text, x0, top in
+             [("a", 10, 100.0), ("b", 30, 104.5), ("c", 50, 101.0)]]
+    assert PageLayout(words).text == "a\nb\nc"
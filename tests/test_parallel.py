@@ -0,0 +1,88 @@
+"""
+test_parallel.py
+
+Tests de l'extraction parallèle du texte des pages (ParallelPageTexts) : pool partagé entre
+les analyses, page 1 lue par la session, pages envoyées par plages dans l'ordre, activation
+par PARSER_PARALLEL et reprise séquentielle si le pool casse.
+
+Auteur  : Lam Clément
+Date    : 2024-06
+Licence : Usage interne VINCI Energies
+"""
+
+import io
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+
+import facture_to_excel
+from facture_to_excel import InvoiceParser
+
+class SpyPool:
+    """
+    Pool qui note les plages demandées avant de les confier au pool partagé.
+    """
+
+    def __init__(self, pool=None):
+        self.pool = pool
+        self.ranges = []
+
+    def submit(self, func, source, start, stop):
+        self.ranges.append((start, stop))
+        return self.pool.submit(func, source, start, stop)
+
+class BrokenPool(SpyPool):
+    """
+    Pool dont chaque plage échoue comme après la mort brutale d'un processus.
+    """
+
+    def submit(self, func, source, start, stop):
+        self.ranges.append((start, stop))
+        future = Future()
+        future.set_exception(BrokenProcessPool("processus tué"))
+        return future
+
+    def shutdown(self, wait=True, cancel_futures=False):
+        pass
+
+@pytest.fixture()
+def spy_pool(monkeypatch):
+    spy = SpyPool(facture_to_excel.get_page_pool())
+    monkeypatch.setattr(facture_to_excel, "get_page_pool", lambda: spy)
+    return spy
+
+def test_pool_is_shared_between_documents():
+    assert facture_to_excel.get_page_pool() is facture_to_excel.get_page_pool()
+
+@pytest.mark.parametrize("layout", [False, True], ids=["extract_text", "index_mots"])
+def test_pages_are_sent_in_order_without_the_first_one(invoice_pdf, spy_pool, monkeypatch, layout):
+    monkeypatch.setattr(facture_to_excel, "PARALLEL_CHUNK_PAGES", 4)
+    pdf = invoice_pdf(10, seed=4)
+
+    parallel = InvoiceParser(layout=layout).parse_pdf(io.BytesIO(pdf), parallel=True, workers=1)
+
+    # Page 1 lue une seule fois, par la session ; les autres par plages contiguës
+    assert spy_pool.ranges == [(1, 5), (5, 9), (9, 10)]
+    assert parallel == InvoiceParser(layout=layout).parse_pdf(io.BytesIO(pdf), parallel=False)
+
+def test_environment_switch_enables_parallel_mode(invoice_pdf, spy_pool, monkeypatch):
+    pdf = invoice_pdf(6, seed=4)
+    monkeypatch.setattr(facture_to_excel, "PARALLEL_PAGES", True)
+    monkeypatch.setattr(facture_to_excel, "PARALLEL_MIN_PAGES", 10)
+    InvoiceParser().parse_pdf(io.BytesIO(pdf))
+    assert spy_pool.ranges == []
+
+    monkeypatch.setattr(facture_to_excel, "PARALLEL_MIN_PAGES", 5)
+    InvoiceParser().parse_pdf(io.BytesIO(pdf))
+    assert spy_pool.ranges != []
+
+def test_broken_pool_falls_back_to_session(invoice_pdf, monkeypatch):
+    broken = BrokenPool()
+    monkeypatch.setattr(facture_to_excel, "get_page_pool", lambda: broken)
+    pdf = invoice_pdf(6, seed=4)
+
+    result = InvoiceParser().parse_pdf(io.BytesIO(pdf), parallel=True)
+
+    assert len(broken.ranges) == 1
+    assert result == InvoiceParser().parse_pdf(io.BytesIO(pdf), parallel=False)
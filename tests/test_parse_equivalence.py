@@ -0,0 +1,112 @@
+"""
+test_parse_equivalence.py
+
+Non-régression de l'analyse : les différents chemins (analyse complète, générateur d'événements,
+mode mémoire bornée, moteur de mise en page, extraction parallèle, extraction sélective, /upload classique et en flux
+NDJSON) doivent produire le même résultat que le parser d'origine.
+
+La référence (fixtures/baseline_outputs.json) a été produite par le parser et l'API d'avant
+la série d'optimisations, sur les bons de commande synthétiques make_invoice_pdf(pages, seed)
+dont les paramètres sont enregistrés avec chaque résultat. Elle ne doit être régénérée que
+pour une modification volontaire du résultat (avec incrémentation de PARSER_VERSION).
+
+Auteur  : Lam Clément
+Date    : 2024-06
+Licence : Usage interne VINCI Energies
+"""
+
+import base64
+import io
+import json
+import os
+from typing import Any, Dict
+
+import pytest
+
+import api_pdf_convert
+from facture_to_excel import PAGE_TEXT_CACHE, InvoiceParser, collect_parse_event, new_parse_result
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "baseline_outputs.json")
+with open(BASELINE_PATH, encoding="utf-8") as _f:
+    BASELINE: Dict[str, Dict[str, Any]] = json.load(_f)
+
+# Champs du résultat de parse_pdf présents dans la référence
+BASELINE_FIELDS = ("items", "total_ht", "numero_commande", "objet", "lieu_livraison")
+
+def _comparable(result: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Champs de référence d'un résultat de parse_pdf, au format JSON (items en liste de dicts).
+    """
+    return json.loads(json.dumps({field: result[field] for field in BASELINE_FIELDS},
+                                 default=api_pdf_convert.json_default))
+
+@pytest.fixture(params=sorted(BASELINE), ids=sorted(BASELINE))
+def document(request, invoice_pdf):
+    """
+    (PDF, référence) de chaque bon de commande de la référence ; caches vidés avant chaque test.
+    """
+    expected = BASELINE[request.param]
+    PAGE_TEXT_CACHE.clear()
+    api_pdf_convert.RESULT_CACHE.clear()
+    return invoice_pdf(expected["pages"], expected["seed"]), expected
+
+def test_parse_pdf_matches_baseline(document):
+    pdf, expected = document
+    assert _comparable(InvoiceParser().parse_pdf(io.BytesIO(pdf))) == expected["parse_pdf"]
+
+@pytest.mark.parametrize("options", [{"bounded_memory": True}, {"bounded_memory": False},
+                                     {"layout": False}, {"layout": True}],
+                         ids=["memoire_bornee", "memoire_libre", "extract_text", "index_mots"])
+def test_parser_modes_match_baseline(document, options):
+    pdf, expected = document
+    assert _comparable(InvoiceParser(**options).parse_pdf(io.BytesIO(pdf))) == expected["parse_pdf"]
+
+@pytest.mark.parametrize("layout", [False, True], ids=["extract_text", "index_mots"])
+def test_parallel_extraction_matches_baseline(document, layout):
+    pdf, expected = document
+    result = InvoiceParser(layout=layout).parse_pdf(io.BytesIO(pdf), parallel=True, workers=2)
+    assert _comparable(result) == expected["parse_pdf"]
+
+def test_streamed_events_match_eager_parse(document):
+    pdf, expected = document
+    eager = InvoiceParser().parse_pdf(io.BytesIO(pdf))
+
+    streamed = new_parse_result()
+    events = list(InvoiceParser(bounded_memory=True).iter_parse_pdf(io.BytesIO(pdf)))
+    for event in events:
+        collect_parse_event(streamed, event)
+
+    assert [event["type"] for event in events] == ["entete"] + ["items"] * expected["pages"] + ["total"]
+    assert streamed == eager
+    assert _comparable(streamed) == expected["parse_pdf"]
+
+def test_extract_fields_matches_parse_pdf(document):
+    pdf, expected = document
+    fields = InvoiceParser().extract_fields(io.BytesIO(pdf))
+    assert _comparable(fields) == expected["parse_pdf"]
+
+def test_upload_matches_baseline(document):
+    pdf, expected = document
+    client = api_pdf_convert.app.test_client()
+    response = client.post("/upload", json={"filename": "commande.pdf",
+                                            "filecontent": base64.b64encode(pdf).decode()})
+    assert response.status_code == 200
+    assert response.get_json() == expected["upload"]
+
+def test_ndjson_stream_matches_baseline(document):
+    pdf, expected = document
+    client = api_pdf_convert.app.test_client()
+    response = client.post("/upload?stream=1", data=pdf, content_type="application/pdf")
+    assert response.status_code == 200
+    assert response.mimetype == "application/x-ndjson"
+
+    lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    header, pages, footer = lines[0], lines[1:-1], lines[-1]
+    assert [line["page"] for line in pages] == list(range(1, expected["pages"] + 1))
+    rebuilt = {
+        "globalite": footer["globalite"],
+        "objet": header["objet"],
+        "lieu_livraison": header["lieu_livraison"],
+        "items": [item for line in pages for item in line["items"]],
+    }
+    assert rebuilt == expected["upload"]
@@ -0,0 +1,112 @@
+"""
+test_parse_guard.py
+
+Tests de l'analyse isolée avec délai (parse_guard) : résultat identique à l'analyse en
+processus, interruption à l'échéance avec résultat partiel, erreurs transmises au parent,
+et codes HTTP correspondants sur /upload.
+
+Pour rendre l'échéance déterministe, l'analyse des pages au-delà de la deuxième est ralentie
+dans le processus courant : l'enfant, créé par fork, hérite de ce ralentissement.
+
+Auteur  : Lam Clément
+Date    : 2024-06
+Licence : Usage interne VINCI Energies
+"""
+
+import io
+import json
+import multiprocessing
+import time
+
+import pytest
+
+import api_pdf_convert
+from facture_to_excel import InvoiceParser, PageLimitError
+from parse_guard import ParseTimeoutError, extract_fields_isolated, parse_pdf_isolated
+
+pytestmark = pytest.mark.skipif("fork" not in multiprocessing.get_all_start_methods(),
+                                reason="le ralentissement n'est hérité que par un enfant créé par fork")
+
+# Pages analysées normalement avant le ralentissement
+FAST_PAGES = 2
+# Délai accordé à l'analyse : large pour deux pages, bien inférieur au ralentissement
+TIMEOUT_S = 3.0
+
+@pytest.fixture()
+def slow_after_second_page(monkeypatch):
+    """
+    Bloque l'analyse des items à partir de la page FAST_PAGES + 1.
+    """
+    original = InvoiceParser._parse_page_items
+
+    def slow(self, page_num, *args, **kwargs):
+        if page_num > FAST_PAGES:
+            time.sleep(60)
+        return original(self, page_num, *args, **kwargs)
+
+    monkeypatch.setattr(InvoiceParser, "_parse_page_items", slow)
+
+def test_isolated_parse_matches_in_process(invoice_pdf):
+    pdf = invoice_pdf(3)
+    assert parse_pdf_isolated(pdf, TIMEOUT_S * 10) == InvoiceParser().parse_pdf(io.BytesIO(pdf))
+
+def test_isolated_extract_fields_matches_in_process(invoice_pdf):
+    pdf = invoice_pdf(3)
+    fields = ["numero_commande", "total_ht"]
+    assert (extract_fields_isolated(pdf, TIMEOUT_S * 10, fields)
+            == InvoiceParser().extract_fields(io.BytesIO(pdf), fields))
+
+def test_timeout_returns_partial_result(invoice_pdf, slow_after_second_page):
+    pdf = invoice_pdf(4)
+    start = time.monotonic()
+    with pytest.raises(ParseTimeoutError) as raised:
+        parse_pdf_isolated(pdf, TIMEOUT_S)
+    elapsed = time.monotonic() - start
+
+    # L'enfant est tué à l'échéance : l'appel ne dure pas les 60 s du ralentissement
+    assert elapsed < TIMEOUT_S + 5
+    error = raised.value
+    assert error.pages_done == FAST_PAGES
+    assert error.partial["total_ht"] is None
+
+    complete = InvoiceParser().extract_fields(io.BytesIO(pdf), ["numero_commande", "items"], pages=(1, FAST_PAGES))
+    assert error.partial["numero_commande"] == complete["numero_commande"]
+    assert error.partial["items"] == complete["items"]
+
+def test_timeout_without_partial_for_selective_extraction(invoice_pdf, slow_after_second_page):
+    with pytest.raises(ParseTimeoutError) as raised:
+        extract_fields_isolated(invoice_pdf(4), TIMEOUT_S, ["items"])
+    assert raised.value.partial is None
+
+def test_child_errors_are_raised_in_parent(invoice_pdf):
+    with pytest.raises(PageLimitError):
+        parse_pdf_isolated(invoice_pdf(3), TIMEOUT_S * 10, max_pages=2)
+
+def test_upload_timeout_status_and_partial(invoice_pdf, slow_after_second_page, monkeypatch):
+    monkeypatch.setattr(api_pdf_convert, "PARSE_TIMEOUT_S", TIMEOUT_S)
+    api_pdf_convert.RESULT_CACHE.clear()
+    client = api_pdf_convert.app.test_client()
+    pdf = invoice_pdf(4, seed=3)
+
+    response = client.post("/upload", data=pdf, content_type="application/pdf")
+    assert response.status_code == 504
+    assert "partiel" not in response.get_json()
+
+    response = client.post("/upload?partial=1", data=pdf, content_type="application/pdf")
+    body = response.get_json()
+    assert response.status_code == 504
+    assert body["partiel"] is True
+    assert body["pages_analysees"] == FAST_PAGES
+    assert body["items"]
+    assert body["globalite"]["total_ht"] is None
+
+def test_stream_timeout_reported_in_last_line(invoice_pdf, slow_after_second_page, monkeypatch):
+    monkeypatch.setattr(api_pdf_convert, "PARSE_TIMEOUT_S", TIMEOUT_S)
+    api_pdf_convert.RESULT_CACHE.clear()
+    client = api_pdf_convert.app.test_client()
+
+    response = client.post("/upload?stream=1", data=invoice_pdf(4, seed=4), content_type="application/pdf")
+    lines = response.get_data(as_text=True).splitlines()
+    assert response.status_code == 200
+    assert len(lines) == 1 + FAST_PAGES + 1
+    assert json.loads(lines[-1])["status"] == 504
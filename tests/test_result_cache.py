@@ -0,0 +1,144 @@
+"""
+test_result_cache.py
+
+Tests du cache de résultats (result_cache.ResultCache) : clé dépendant du contenu du PDF et de
+PARSER_VERSION, niveaux mémoire et SQLite (relu après redémarrage), expiration des entrées
+disque et résultat servi par le cache identique à une nouvelle analyse, y compris le flux
+NDJSON rejoué page par page.
+
+Auteur  : Lam Clément
+Date    : 2024-06
+Licence : Usage interne VINCI Energies
+"""
+
+import io
+import json
+
+import pytest
+
+import api_pdf_convert
+import result_cache
+from facture_to_excel import InvoiceParser
+from result_cache import ResultCache, document_digest
+
+@pytest.fixture()
+def db_path(tmp_path):
+    return str(tmp_path / "resultats.sqlite3")
+
+def test_key_depends_on_pdf_bytes_and_parser_version(invoice_pdf, monkeypatch, tmp_path):
+    pdf, other = invoice_pdf(1, seed=0), invoice_pdf(1, seed=1)
+    path = tmp_path / "commande.pdf"
+    path.write_bytes(pdf)
+
+    key = document_digest(pdf, "upload")
+    # Même contenu, quelle que soit sa forme : même clé
+    assert document_digest(io.BytesIO(pdf), "upload") == key
+    assert document_digest(str(path), "upload") == key
+    assert document_digest(memoryview(pdf), "upload") == key
+    assert document_digest(other, "upload") != key
+    assert document_digest(pdf, "parse_pdf") != key
+
+    monkeypatch.setattr(result_cache, "PARSER_VERSION", "0.0")
+    assert document_digest(pdf, "upload") != key
+
+def test_memory_hit_returns_a_copy():
+    cache = ResultCache(max_entries=2)
+    cache.set("a", {"items": [{"position": "10"}]})
+
+    first = cache.get("a")
+    first["items"].clear()
+    assert cache.get("a") == {"items": [{"position": "10"}]}
+    assert cache.get("b") is None
+    assert cache.stats() == {"hits": 2, "misses": 1, "entries": 1}
+
+def test_memory_tier_evicts_least_recently_used():
+    cache = ResultCache(max_entries=2)
+    cache.set("a", {"n": 1})
+    cache.set("b", {"n": 2})
+    cache.get("a")
+    cache.set("c", {"n": 3})
+    assert cache.get("b") is None
+    assert cache.get("a") == {"n": 1}
+
+def test_sqlite_hit_after_restart(db_path):
+    ResultCache(db_path=db_path).set("a", {"total_ht": "1.000,00"})
+
+    # Nouveau cache sur le même fichier (redémarrage du worker) : mémoire vide, disque conservé
+    restarted = ResultCache(db_path=db_path)
+    assert restarted.stats()["entries"] == 0
+    assert restarted.get("a") == {"total_ht": "1.000,00"}
+    assert restarted.stats() == {"hits": 1, "misses": 0, "entries": 1}
+
+def test_disk_entries_expire_after_ttl(db_path, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(result_cache.time, "time", lambda: now[0])
+    ResultCache(db_path=db_path, ttl=60).set("a", {"n": 1})
+
+    now[0] += 59
+    assert ResultCache(db_path=db_path, ttl=60).get("a") == {"n": 1}
+    now[0] += 2
+    assert ResultCache(db_path=db_path, ttl=60).get("a") is None
+    # L'entrée expirée est supprimée du disque : un cache sans durée de vie ne la retrouve plus
+    assert ResultCache(db_path=db_path).get("a") is None
+
+def test_cached_parse_matches_fresh_parse(invoice_pdf, db_path):
+    pdf = invoice_pdf(3, seed=2)
+    fresh = InvoiceParser().parse_pdf(io.BytesIO(pdf))
+
+    parser = InvoiceParser(result_cache=ResultCache(db_path=db_path))
+    assert parser.parse_pdf(io.BytesIO(pdf)) == fresh
+    from_memory = parser.parse_pdf(io.BytesIO(pdf))
+    from_disk = InvoiceParser(result_cache=ResultCache(db_path=db_path)).parse_pdf(io.BytesIO(pdf))
+
+    assert parser.result_cache.stats()["hits"] == 1
+    for cached in (from_memory, from_disk):
+        assert cached == fresh
+        assert type(cached["items"]) is type(fresh["items"])
+        assert cached["items"].to_records() == fresh["items"].to_records()
+
+def test_cached_upload_matches_fresh_upload(invoice_pdf):
+    api_pdf_convert.RESULT_CACHE.clear()
+    client = api_pdf_convert.app.test_client()
+    pdf = invoice_pdf(3, seed=2)
+
+    fresh = client.post("/upload", data=pdf, content_type="application/pdf")
+    cached = client.post("/upload", data=pdf, content_type="application/pdf")
+
+    assert fresh.status_code == cached.status_code == 200
+    assert cached.get_json() == fresh.get_json()
+    assert api_pdf_convert.RESULT_CACHE.stats()["hits"] == 1
+
+def test_cached_stream_matches_fresh_stream(invoice_pdf, monkeypatch):
+    api_pdf_convert.RESULT_CACHE.clear()
+    client = api_pdf_convert.app.test_client()
+    pdf = invoice_pdf(3, seed=2)
+
+    fresh = client.post("/upload?stream=1", data=pdf, content_type="application/pdf")
+    # Flux lu jusqu'au bout : la réponse complète est mise en cache
+    fresh_lines = fresh.get_data(as_text=True)
+    # Rejeu : aucune nouvelle analyse
+    monkeypatch.setattr(api_pdf_convert.InvoiceParser, "iter_parse_pdf",
+                        lambda *args, **kwargs: pytest.fail("document relu malgré le cache"))
+    cached = client.post("/upload?stream=1", data=pdf, content_type="application/pdf")
+
+    assert fresh.status_code == cached.status_code == 200
+    # Mêmes lignes, page par page
+    assert cached.get_data(as_text=True) == fresh_lines
+    assert [json.loads(line).get("page") for line in cached.get_data(as_text=True).splitlines()] == [None, 1, 2, 3, None]
+    # La réponse mise en cache par le flux sert aussi /upload classique
+    assert client.post("/upload", data=pdf, content_type="application/pdf").get_json() \
+        == api_pdf_convert.convert_pdf_buffer(io.BytesIO(pdf))
+
+def test_stream_after_classic_upload_is_parsed_again(invoice_pdf):
+    api_pdf_convert.RESULT_CACHE.clear()
+    client = api_pdf_convert.app.test_client()
+    pdf = invoice_pdf(3, seed=2)
+
+    classic = client.post("/upload", data=pdf, content_type="application/pdf").get_json()
+    streamed = client.post("/upload?stream=1", data=pdf, content_type="application/pdf")
+
+    # Découpage par page absent du cache : nouvelle analyse, les items restent ceux de /upload
+    lines = [json.loads(line) for line in streamed.get_data(as_text=True).splitlines()]
+    assert [line["page"] for line in lines[1:-1]] == [1, 2, 3]
+    assert [item for line in lines[1:-1] for item in line["items"]] == classic["items"]
+    assert lines[-1]["globalite"] == classic["globalite"]
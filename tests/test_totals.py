@@ -0,0 +1,78 @@
+"""
+test_totals.py
+
+Tests de la sélection du total HT : la dernière ligne 'total' portant un montant du document
+est retenue, par toutes les analyses (parse_pdf, iter_parse_pdf, extract_fields, mode parallèle).
+
+Auteur  : Lam Clément
+Date    : 2024-06
+Licence : Usage interne VINCI Energies
+"""
+
+import io
+
+import pytest
+
+from facture_to_excel import InvoiceParser, PageTextCache, collect_parse_event, new_parse_result
+from pdf_builder import build_pdf
+from synthetic_pdf import invoice_pages
+
+# Sous-total ajouté en bas de la première page, avant le total HT de la dernière page
+SUBTOTAL_LINE = (300, 770, 9, "Sous-total page 1 1.000,00 EUR")
+
+@pytest.fixture(scope="module")
+def two_totals_pdf():
+    """
+    (PDF, total attendu) d'un bon de commande de 3 pages portant une ligne 'total' en page 1
+    (sous-total) et en page 3 (total HT).
+    """
+    pages = invoice_pages(3, seed=11)
+    pages[0].append(SUBTOTAL_LINE)
+    last_total = next(text for _, _, _, text in pages[-1] if text.startswith("Montant total HT"))
+    return build_pdf(pages), last_total.split()[3]
+
+def test_parse_pdf_keeps_last_total(two_totals_pdf):
+    pdf, expected = two_totals_pdf
+    assert InvoiceParser().parse_pdf(io.BytesIO(pdf))["total_ht"] == expected
+
+def test_streamed_total_matches_parse_pdf(two_totals_pdf):
+    pdf, expected = two_totals_pdf
+    result = new_parse_result()
+    for event in InvoiceParser(bounded_memory=True).iter_parse_pdf(io.BytesIO(pdf)):
+        collect_parse_event(result, event)
+    assert result["total_ht"] == expected
+
+def test_extract_fields_total_matches_parse_pdf(two_totals_pdf):
+    pdf, expected = two_totals_pdf
+    assert InvoiceParser().extract_fields(io.BytesIO(pdf), ["total_ht"]) == {"total_ht": expected}
+
+def test_last_total_line_of_a_page_wins():
+    text = "Total lot 1 100,00\nTotal lot 2 200,00\nMontant total HT 300,00 EUR\nPage 1 / 1"
+    assert InvoiceParser()._extract_total(text) == "300,00"
+
+def test_page_without_total_keeps_previous_total():
+    parser = InvoiceParser()
+    assert parser._update_total("1.000,00", "Conditions générales\nPage 3 / 3") == "1.000,00"
+    assert parser._update_total("1.000,00", "Montant total HT 2.000,00") == "2.000,00"
+    assert parser._update_total(None, "") is None
+
+def test_extract_fields_reads_pages_backward_until_total(invoice_pdf):
+    cache = PageTextCache()
+    parser = InvoiceParser(page_cache=cache)
+    fields = parser.extract_fields(io.BytesIO(invoice_pdf(40, seed=3)), ["numero_commande", "total_ht"])
+    assert fields["total_ht"] is not None
+    # Page 1 (entête) et dernière page (total) : les 38 autres pages ne sont jamais extraites
+    assert cache.stats()["misses"] == 2
+
+def test_extract_fields_total_on_earlier_page():
+    pages = invoice_pages(3, seed=11)
+    pages[0].append(SUBTOTAL_LINE)
+    # Sans ligne 'total' en dernière page, la lecture remonte jusqu'au sous-total de la page 1
+    pages[-1] = [line for line in pages[-1] if "total" not in line[3].lower()]
+    pdf = build_pdf(pages)
+    cache = PageTextCache()
+    fields = InvoiceParser(page_cache=cache).extract_fields(io.BytesIO(pdf), ["total_ht"])
+    assert fields == {"total_ht": "1.000,00"}
+    assert fields["total_ht"] == InvoiceParser().parse_pdf(io.BytesIO(pdf))["total_ht"]
+    # Pages 3 et 2 lues sans succès, la page 1 déjà extraite pour la détection du modèle
+    assert cache.stats()["misses"] == 3
@@ -0,0 +1,91 @@
+"""
+test_upload.py
+
+Tests des modes d'envoi de /upload (JSON base64, corps PDF brut, formulaire multipart)
+et des codes HTTP de ses erreurs.
+
+Auteur  : Lam Clément
+Date    : 2024-06
+Licence : Usage interne VINCI Energies
+"""
+
+import base64
+import io
+
+import pytest
+
+import api_pdf_convert
+import facture_to_excel
+
+@pytest.fixture()
+def client():
+    """
+    Client de test Flask, caches vidés : chaque requête refait l'analyse.
+    """
+    api_pdf_convert.RESULT_CACHE.clear()
+    facture_to_excel.PAGE_TEXT_CACHE.clear()
+    return api_pdf_convert.app.test_client()
+
+@pytest.fixture(scope="module")
+def reference(invoice_pdf):
+    """
+    (PDF, réponse de /upload en JSON base64) du document utilisé par les tests.
+    """
+    pdf = invoice_pdf(2, seed=5)
+    api_pdf_convert.RESULT_CACHE.clear()
+    response = api_pdf_convert.app.test_client().post(
+        "/upload", json={"filename": "commande.pdf", "filecontent": base64.b64encode(pdf).decode()})
+    assert response.status_code == 200
+    return pdf, response.get_json()
+
+@pytest.mark.parametrize("content_type", ["application/pdf", "application/octet-stream"])
+def test_raw_body_matches_base64(client, reference, content_type):
+    pdf, expected = reference
+    response = client.post("/upload?filename=commande.pdf", data=pdf, content_type=content_type)
+    assert response.status_code == 200
+    assert response.get_json() == expected
+
+@pytest.mark.parametrize("field", ["file", "document"])
+def test_multipart_matches_base64(client, reference, field):
+    pdf, expected = reference
+    response = client.post("/upload", data={field: (io.BytesIO(pdf), "commande.pdf")},
+                           content_type="multipart/form-data")
+    assert response.status_code == 200
+    assert response.get_json() == expected
+
+def test_raw_body_supports_selective_fields(client, reference):
+    pdf, expected = reference
+    response = client.post("/upload?fields=numero_commande,total_ht", data=pdf, content_type="application/pdf")
+    assert response.status_code == 200
+    assert response.get_json()["globalite"] == expected["globalite"]
+
+@pytest.mark.parametrize("kwargs, status", [
+    ({"data": b"", "content_type": "application/pdf"}, 400),
+    ({"data": {"champ": "valeur"}, "content_type": "multipart/form-data"}, 400),
+    ({"data": {"file": (io.BytesIO(b""), "vide.pdf")}, "content_type": "multipart/form-data"}, 400),
+    ({"json": {"filename": "commande.pdf"}}, 400),
+    ({"data": b"ceci n'est pas un PDF", "content_type": "application/pdf"}, 422),
+    ({"data": {"file": (io.BytesIO(b"ceci n'est pas un PDF"), "faux.pdf")}, "content_type": "multipart/form-data"}, 422),
+    ({"json": {"filecontent": base64.b64encode(b"ceci n'est pas un PDF").decode()}}, 422),
+    ({"data": b"texte", "content_type": "text/plain"}, 415),
+], ids=["brut_vide", "multipart_sans_fichier", "multipart_fichier_vide", "json_sans_contenu",
+        "brut_illisible", "multipart_illisible", "base64_illisible", "type_non_pris_en_charge"])
+def test_error_status(client, kwargs, status):
+    response = client.post("/upload", **kwargs)
+    assert response.status_code == status
+    assert response.get_json()["error"]
+
+def test_body_too_large(client, reference, monkeypatch):
+    pdf, _ = reference
+    monkeypatch.setitem(api_pdf_convert.app.config, "MAX_CONTENT_LENGTH", len(pdf) // 2)
+    assert client.post("/upload", data=pdf, content_type="application/pdf").status_code == 413
+    response = client.post("/upload", data={"file": (io.BytesIO(pdf), "commande.pdf")},
+                           content_type="multipart/form-data")
+    assert response.status_code == 413
+
+def test_page_limit(client, reference, monkeypatch):
+    pdf, _ = reference
+    monkeypatch.setattr(facture_to_excel, "MAX_PAGES", 1)
+    response = client.post("/upload", data=pdf, content_type="application/pdf")
+    assert response.status_code == 413
+    assert "pages" in response.get_json()["error"]
@@ -0,0 +1,91 @@
+"""
+test_upload_batch.py
+
+Tests de /upload/batch : un résultat par document dans l'ordre reçu, identique à /upload,
+erreur propre à un document (base64 invalide, PDF illisible, délai dépassé) sans interrompre
+le lot, et corps de requête invalide.
+
+Les processus du pool sont créés par fork : chaque test qui modifie le module (délai d'analyse,
+ralentissement) part d'un pool neuf et l'abandonne à la fin, pour que ses processus en héritent
+sans le transmettre aux tests suivants.
+
+Auteur  : Lam Clément
+Date    : 2024-06
+Licence : Usage interne VINCI Energies
+"""
+
+import base64
+import multiprocessing
+import time
+
+import pytest
+
+import api_pdf_convert
+from facture_to_excel import InvoiceParser
+
+def encode(pdf: bytes) -> str:
+    return base64.b64encode(pdf).decode()
+
+@pytest.fixture()
+def client():
+    """
+    Client de test Flask avec un pool de traitement par lot neuf, abandonné après le test.
+    """
+    api_pdf_convert.RESULT_CACHE.clear()
+    api_pdf_convert.discard_batch_pool(api_pdf_convert.get_batch_pool())
+    yield api_pdf_convert.app.test_client()
+    api_pdf_convert.discard_batch_pool(api_pdf_convert.get_batch_pool())
+
+def test_batch_returns_one_result_per_document(client, invoice_pdf):
+    documents = [
+        {"filename": "a.pdf", "filecontent": encode(invoice_pdf(2, seed=5))},
+        {"filename": "invalide.pdf", "filecontent": "pas du base64 !"},
+        {"filename": "illisible.pdf", "filecontent": encode(b"%PDF-1.4 tronque")},
+        {"filecontent": encode(invoice_pdf(1, seed=1))},
+    ]
+    response = client.post("/upload/batch", json=documents)
+    assert response.status_code == 200
+    results = response.get_json()["results"]
+
+    assert [result["filename"] for result in results] == ["a.pdf", "invalide.pdf", "illisible.pdf", "fichier.pdf"]
+    for result, document in zip((results[0], results[3]), (documents[0], documents[3])):
+        expected = client.post("/upload", json=document).get_json()
+        assert {key: value for key, value in result.items() if key != "filename"} == expected
+    # Erreurs propres aux documents, avec le code qu'aurait renvoyé /upload
+    assert results[1]["status"] == results[2]["status"] == 422
+    assert results[1]["error"] and results[2]["error"]
+    assert "items" not in results[1] and "items" not in results[2]
+
+def test_batch_requires_a_list(client):
+    response = client.post("/upload/batch", json={"filename": "a.pdf", "filecontent": "..."})
+    assert response.status_code == 400
+    assert "error" in response.get_json()
+
+@pytest.mark.skipif("fork" not in multiprocessing.get_all_start_methods(),
+                    reason="le ralentissement n'est hérité que par des processus créés par fork")
+def test_batch_reports_timeout_per_document(client, invoice_pdf, monkeypatch):
+    original = InvoiceParser._parse_page_items
+
+    def slow(self, page_num, *args, **kwargs):
+        # Seul le document de quatre pages atteint la page 3
+        if page_num > 2:
+            time.sleep(60)
+        return original(self, page_num, *args, **kwargs)
+
+    # Hérités par les processus du pool, créés à la première requête
+    monkeypatch.setattr(InvoiceParser, "_parse_page_items", slow)
+    monkeypatch.setattr(api_pdf_convert, "PARSE_TIMEOUT_S", 3.0)
+
+    documents = [{"filename": "lent.pdf", "filecontent": encode(invoice_pdf(4, seed=4))},
+                 {"filename": "rapide.pdf", "filecontent": encode(invoice_pdf(2, seed=5))}]
+    start = time.monotonic()
+    response = client.post("/upload/batch", json=documents)
+    assert time.monotonic() - start < 30
+
+    assert response.status_code == 200
+    slow_result, fast_result = response.get_json()["results"]
+    assert slow_result["status"] == 504
+    assert slow_result["filename"] == "lent.pdf"
+    assert "items" not in slow_result
+    assert fast_result["filename"] == "rapide.pdf"
+    assert fast_result["items"]
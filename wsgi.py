@@ -0,0 +1,90 @@
+"""
+wsgi.py
+
+Point d'entrée WSGI de production de l'API (gunicorn -c gunicorn.conf.py wsgi:app).
+
+Fonctionnalités principales :
+- Expose l'application Flask de api_pdf_convert sous le nom app.
+- Préchauffe le processus avant le fork des workers (preload_app de gunicorn) : modules de
+  pdfplumber/pdfminer chargés, motifs de l'heuristique compilés, police standard lue et
+  chemin complet /upload (parsing, nettoyage, sérialisation JSON) exécuté une fois.
+  Les workers héritent de cet état en copie sur écriture : la première requête de chaque
+  worker ne paie plus ces imports et initialisations.
+- Le préchauffage utilise un petit bon de commande PDF construit en mémoire (pdf_builder), ou
+  le fichier désigné par WARMUP_PDF ; WARMUP=0 le désactive. Les métriques et statistiques
+  par modèle sont remises à zéro ensuite : /metrics ne compte que les vrais documents.
+
+Le pool de processus de /upload/batch, les threads de /jobs et la connexion SQLite du cache
+de réponses ne sont créés qu'à la première utilisation : aucun n'existe au moment du fork.
+
+Auteur  : Lam Clément
+Date    : 2024-06
+Licence : Usage interne VINCI Energies
+
+Dépendances :
+- api_pdf_convert (application Flask)
+- facture_to_excel (InvoiceParser, PageTextCache, TEMPLATES)
+- metrics (remise à zéro après le préchauffage)
+- pdf_builder (PDF de préchauffage)
+"""
+
+import io
+import logging
+import os
+import time
+
+import metrics
+from api_pdf_convert import app, build_response
+from facture_to_excel import TEMPLATES, InvoiceParser, PageTextCache
+from pdf_builder import build_pdf
+
+logger = logging.getLogger(__name__)
+
+# Lignes du PDF de préchauffage : (x, ordonnée depuis le haut, taille de police, texte)
+_WARMUP_LINES = (
+    (330, 70, 9, "Commande N° 4500000000/WARM"),
+    (330, 85, 9, "Date de livraison : 15.04.2024"),
+    (40, 160, 9, "OBJET :"),
+    (40, 175, 9, "Préchauffage des workers"),
+    (40, 190, 9, "CONTRAT N° 1"),
+    (22, 430, 9, "Adresse de livraison, lieu de"),
+    (22, 441, 9, "réception ou d'exécution :"),
+    (22, 455, 9, "12 rue des Lilas"),
+    (40, 530, 9, "Pos. Article Quantité Unité Prix unitaire Montant HT"),
+    (40, 542, 9, "10 100010 2 PCE 1.234,50 2.469,00 20.05.2024"),
+    (40, 553, 9, "Produit 10 cable rigide U1000"),
+    (300, 580, 9, "Montant total HT 2.469,00 EUR"),
+    (480, 810, 9, "Page 1 / 1"),
+)
+
+def warm_up(pdf_path: str = None) -> float:
+    """
+    Exécute une fois le chemin de /upload (parsing, nettoyage, sérialisation) pour charger
+    les modules et initialiser les structures partagées avant le fork des workers.
+    Le document de préchauffage ne laisse aucune trace : les caches de l'API ne sont pas
+    utilisés, et les métriques et statistiques par modèle sont remises à zéro ensuite.
+
+    Args:
+        pdf_path (str, optional): PDF à utiliser (PDF construit en mémoire par défaut).
+
+    Returns:
+        float: Durée du préchauffage, en secondes.
+    """
+    start = time.perf_counter()
+    source = pdf_path if pdf_path else io.BytesIO(build_pdf([_WARMUP_LINES]))
+    parser = InvoiceParser(page_cache=PageTextCache(max_entries=8))
+    try:
+        result = parser.parse_pdf(source)
+        with app.app_context():
+            app.json.dumps(build_response(result))
+    finally:
+        metrics.REGISTRY.reset()
+        TEMPLATES.reset_stats()
+    return time.perf_counter() - start
+
+if os.environ.get("WARMUP", "1") != "0":
+    try:
+        logger.info("Préchauffage terminé en %.3f s", warm_up(os.environ.get("WARMUP_PDF") or None))
+    except Exception as e:
+        # Un échec du préchauffage ne doit pas empêcher le démarrage : les workers restent fonctionnels
+        logger.warning("Échec du préchauffage : %s", e)